@@ -0,0 +1,126 @@
+#!/usr/bin/python
+# Batch Kickstart Generator
+#
+# Headless counterpart of menu.py: renders one complete, flattened
+# kickstart per host listed in a CSV/JSON inventory using a process pool.
+#
+# License: GPLv2
+
+import os
+import sys
+import time
+import optparse
+import multiprocessing
+
+import fragments
+import inventory
+import kickstart
+import kstemplate
+import pwhash
+
+# Worker state (set once per worker process by init_worker; TEMPLATE is the
+# compiled kstemplate.Template)
+TEMPLATE = None
+OUTPUT = None
+PASSWORD = None
+ROUNDS = pwhash.ROUNDS
+CHECK = False
+
+
+# Initialize Worker Process
+def init_worker(template, output, password, rounds, check=False):
+    global TEMPLATE, OUTPUT, PASSWORD, ROUNDS, CHECK
+    TEMPLATE = template
+    OUTPUT = output
+    PASSWORD = password
+    ROUNDS = rounds
+    CHECK = check
+
+
+# Render and write the kickstart for a single host record
+def render_host(record):
+    try:
+        config = inventory.host_config(record, PASSWORD, ROUNDS)
+        if CHECK:
+            return (config['hostname'], None)
+        data = TEMPLATE.render(kickstart.render_fragments(config))
+        path = os.path.join(OUTPUT, config['hostname'] + '.ks')
+        fragments.write_atomic(path, data)
+        return (config['hostname'], None)
+    except inventory.InventoryError as e:
+        # Inventory errors already name the host
+        return (record.get('hostname'), str(e))
+    except (kstemplate.TemplateError, IOError, OSError) as e:
+        return (record.get('hostname'), '%s: %s' % (record.get('hostname'), e))
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [options] inventory.{csv,json}")
+    parser.add_option("-t", "--template",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stig-fix.cfg'),
+        help="Kickstart template (default: stig-fix.cfg next to this script)")
+    parser.add_option("-o", "--output", default="kickstarts",
+        help="Output directory for the rendered kickstarts")
+    parser.add_option("-p", "--password-file",
+        help="File containing the default root/LUKS password")
+    parser.add_option("-j", "--jobs", type="int", default=multiprocessing.cpu_count(),
+        help="Number of worker processes (default: number of CPUs)")
+    parser.add_option("-r", "--rounds", default=str(pwhash.ROUNDS),
+        help="SHA-512 crypt rounds, or 'auto' to benchmark this host (default: %d)" % pwhash.ROUNDS)
+    parser.add_option("-n", "--check", action="store_true", default=False,
+        help="Only validate the inventory (including LVM layouts)")
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error("an inventory file is required")
+
+    try:
+        rounds = pwhash.rounds_setting(options.rounds)
+    except ValueError as e:
+        parser.error(str(e))
+    password = None
+    if options.password_file:
+        f = open(options.password_file)
+        password = f.readline().rstrip('\n')
+        f.close()
+    f = open(options.template)
+    text = f.read()
+    f.close()
+    try:
+        template = kstemplate.Template(text, kickstart.FRAGMENTS, options.template)
+    except kstemplate.TemplateError as e:
+        sys.stderr.write("ERROR: %s\n" % e)
+        sys.exit(1)
+    try:
+        records = inventory.load(args[0])
+    except (inventory.InventoryError, ValueError) as e:
+        sys.stderr.write("ERROR: %s\n" % e)
+        sys.exit(1)
+    if not options.check and not os.path.isdir(options.output):
+        os.makedirs(options.output)
+
+    start = time.time()
+    errors = 0
+    pool = multiprocessing.Pool(options.jobs, init_worker, (template, options.output, password, rounds, options.check))
+    chunksize = max(1, len(records) // (options.jobs * 4))
+    try:
+        for hostname, error in pool.imap_unordered(render_host, records, chunksize):
+            if error:
+                errors += 1
+                sys.stderr.write("ERROR: %s\n" % error)
+    finally:
+        pool.close()
+        pool.join()
+
+    if options.check:
+        print("Validated %d of %d hosts in %.2fs" %
+            (len(records) - errors, len(records), time.time() - start))
+    else:
+        print("Rendered %d of %d kickstarts in %.2fs [%s]" %
+            (len(records) - errors, len(records), time.time() - start, options.output))
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+#!/usr/bin/python
+# Classification Banner Client
+#
+# Per-session client of the banner daemon (classification-banner.py
+# --daemon) for multi-user terminal servers. It draws the top and bottom
+# banner of every monitor with Xlib and Xft through ctypes instead of
+# loading PyGTK, so a session only costs a small interpreter; the daemon
+# holds the configuration and pushes changes. While the daemon restarts the
+# banners stay up and the client reconnects. Without a reachable daemon (or
+# without Xft) the full banner, classification-banner.py, is run instead.
+#
+#   classification-banner-client.py [--socket /var/run/classification-banner/banner.sock]
+#
+# License: GPLv2
+
+import os
+import sys
+import json
+import time
+import ctypes
+import select
+import socket
+import optparse
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+BANNER = os.path.join(DIR, 'classification-banner.py')
+SOCKET = "/var/run/classification-banner/banner.sock"
+# Seconds between reconnection attempts while the daemon is away
+RETRY = 5
+
+# Pango size names (classification-banner.py markup) in points
+SIZES = {'xx-small': 6, 'x-small': 7, 'small': 8, 'medium': 10, 'large': 12, 'x-large': 14, 'xx-large': 17}
+
+# Xlib event types and masks
+EXPOSE = 12
+UNMAP_NOTIFY = 18
+CONFIGURE_NOTIFY = 22
+EXPOSURE_MASK = 1 << 15
+STRUCTURE_NOTIFY_MASK = 1 << 17
+# Property formats and types (XA_ATOM, XA_CARDINAL)
+ATOM = 4
+CARDINAL = 6
+PROP_MODE_REPLACE = 0
+
+
+class ClientError(Exception):
+    """No X display or missing libraries."""
+
+
+class XAnyEvent(ctypes.Structure):
+    _fields_ = [('type', ctypes.c_int), ('serial', ctypes.c_ulong), ('send_event', ctypes.c_int),
+        ('display', ctypes.c_void_p), ('window', ctypes.c_ulong)]
+
+
+class XEvent(ctypes.Union):
+    _fields_ = [('type', ctypes.c_int), ('xany', XAnyEvent), ('pad', ctypes.c_long * 24)]
+
+
+class XineramaScreenInfo(ctypes.Structure):
+    _fields_ = [('screen_number', ctypes.c_int), ('x_org', ctypes.c_short), ('y_org', ctypes.c_short),
+        ('width', ctypes.c_short), ('height', ctypes.c_short)]
+
+
+class XftFont(ctypes.Structure):
+    _fields_ = [('ascent', ctypes.c_int), ('descent', ctypes.c_int), ('height', ctypes.c_int),
+        ('max_advance_width', ctypes.c_int), ('charset', ctypes.c_void_p), ('pattern', ctypes.c_void_p)]
+
+
+class XftColor(ctypes.Structure):
+    _fields_ = [('pixel', ctypes.c_ulong), ('red', ctypes.c_ushort), ('green', ctypes.c_ushort),
+        ('blue', ctypes.c_ushort), ('alpha', ctypes.c_ushort)]
+
+
+class XGlyphInfo(ctypes.Structure):
+    _fields_ = [('width', ctypes.c_ushort), ('height', ctypes.c_ushort), ('x', ctypes.c_short),
+        ('y', ctypes.c_short), ('xOff', ctypes.c_short), ('yOff', ctypes.c_short)]
+
+
+# Prototypes: library -> [(function, result, arguments)] (Display * and
+# pointers as c_void_p, XIDs as c_ulong)
+P = ctypes.c_void_p
+XID = ctypes.c_ulong
+INT = ctypes.c_int
+PROTOTYPES = {
+    'libX11.so.6': [
+        ('XOpenDisplay', P, [ctypes.c_char_p]),
+        ('XDefaultScreen', INT, [P]),
+        ('XRootWindow', XID, [P, INT]),
+        ('XDisplayWidth', INT, [P, INT]),
+        ('XDisplayHeight', INT, [P, INT]),
+        ('XDefaultVisual', P, [P, INT]),
+        ('XDefaultColormap', XID, [P, INT]),
+        ('XConnectionNumber', INT, [P]),
+        ('XCreateSimpleWindow', XID, [P, XID, INT, INT, ctypes.c_uint, ctypes.c_uint, ctypes.c_uint,
+            ctypes.c_ulong, ctypes.c_ulong]),
+        ('XDestroyWindow', INT, [P, XID]),
+        ('XSelectInput', INT, [P, XID, ctypes.c_long]),
+        ('XMapRaised', INT, [P, XID]),
+        ('XMoveResizeWindow', INT, [P, XID, INT, INT, ctypes.c_uint, ctypes.c_uint]),
+        ('XClearWindow', INT, [P, XID]),
+        ('XStoreName', INT, [P, XID, ctypes.c_char_p]),
+        ('XInternAtom', XID, [P, ctypes.c_char_p, INT]),
+        ('XChangeProperty', INT, [P, XID, XID, XID, INT, INT, P, INT]),
+        ('XPending', INT, [P]),
+        ('XNextEvent', INT, [P, ctypes.POINTER(XEvent)]),
+        ('XFlush', INT, [P]),
+        ('XFree', INT, [P]),
+    ],
+    'libXft.so.2': [
+        ('XftFontOpenName', ctypes.POINTER(XftFont), [P, INT, ctypes.c_char_p]),
+        ('XftFontClose', None, [P, ctypes.POINTER(XftFont)]),
+        ('XftColorAllocName', INT, [P, P, XID, ctypes.c_char_p, ctypes.POINTER(XftColor)]),
+        ('XftColorFree', None, [P, P, XID, ctypes.POINTER(XftColor)]),
+        ('XftDrawCreate', P, [P, XID, P, XID]),
+        ('XftDrawDestroy', None, [P]),
+        ('XftDrawStringUtf8', None, [P, ctypes.POINTER(XftColor), ctypes.POINTER(XftFont), INT, INT,
+            ctypes.c_char_p, INT]),
+        ('XftTextExtentsUtf8', None, [P, ctypes.POINTER(XftFont), ctypes.c_char_p, INT,
+            ctypes.POINTER(XGlyphInfo)]),
+    ],
+    'libXinerama.so.1': [
+        ('XineramaIsActive', INT, [P]),
+        ('XineramaQueryScreens', ctypes.POINTER(XineramaScreenInfo), [P, ctypes.POINTER(INT)]),
+    ],
+}
+
+
+# Load a library and declare its prototypes (None if it is not installed)
+def load_library(name):
+    try:
+        library = ctypes.CDLL(name)
+    except OSError:
+        return None
+    for function, result, arguments in PROTOTYPES[name]:
+        prototype = getattr(library, function)
+        prototype.restype = result
+        prototype.argtypes = arguments
+    return library
+
+
+# Xft font name for the banner font settings ('liberation-sans', 'bold', 'small')
+def font_name(face, weight, size):
+    try:
+        points = float(size) / 1024
+    except ValueError:
+        points = SIZES.get(size, SIZES['medium'])
+    return '%s:%s:size=%g' % (face.replace('-', ' '), weight == 'bold' and 'bold' or 'regular', points)
+
+
+class Banners:
+    """Top and bottom banner windows of every monitor of one X display."""
+
+    def __init__(self, display=None):
+        self.x = load_library('libX11.so.6')
+        self.xft = load_library('libXft.so.2')
+        self.xinerama = load_library('libXinerama.so.1')
+        if self.x is None or self.xft is None:
+            raise ClientError('libX11 or libXft is not installed')
+        self.display = self.x.XOpenDisplay(display and display.encode('utf-8'))
+        if not self.display:
+            raise ClientError("cannot open display '%s'" % (display or os.environ.get('DISPLAY', '')))
+        self.screen = self.x.XDefaultScreen(self.display)
+        self.root = self.x.XRootWindow(self.display, self.screen)
+        self.visual = self.x.XDefaultVisual(self.display, self.screen)
+        self.colormap = self.x.XDefaultColormap(self.display, self.screen)
+        # Screen size changes (RandR) arrive as ConfigureNotify on the root
+        self.x.XSelectInput(self.display, self.root, STRUCTURE_NOTIFY_MASK)
+        self.atoms = {}
+        self.windows = {}
+        self.font = None
+        self.colors = None
+        self.config = None
+
+    def fileno(self):
+        return self.x.XConnectionNumber(self.display)
+
+    def atom(self, name):
+        if name not in self.atoms:
+            self.atoms[name] = self.x.XInternAtom(self.display, name.encode('ascii'), 0)
+        return self.atoms[name]
+
+    # Set a 32 bit property (values are C longs)
+    def set_property(self, window, name, kind, values):
+        data = (ctypes.c_ulong * len(values))(*values)
+        self.x.XChangeProperty(self.display, window, self.atom(name), kind, 32, PROP_MODE_REPLACE,
+            ctypes.cast(data, ctypes.c_void_p), len(values))
+
+    # Monitor geometries as (x, y, width, height)
+    def monitors(self):
+        if self.xinerama is not None and self.xinerama.XineramaIsActive(self.display):
+            count = INT()
+            screens = self.xinerama.XineramaQueryScreens(self.display, ctypes.byref(count))
+            if screens:
+                try:
+                    return [(screens[i].x_org, screens[i].y_org, screens[i].width, screens[i].height)
+                        for i in range(count.value)]
+                finally:
+                    self.x.XFree(screens)
+        return [(0, 0, self.x.XDisplayWidth(self.display, self.screen),
+            self.x.XDisplayHeight(self.display, self.screen))]
+
+    # Undecorated dock window on every desktop, above the others
+    def create_window(self):
+        window = self.x.XCreateSimpleWindow(self.display, self.root, 0, 0, 1, 1, 0, 0, self.colors[1].pixel)
+        self.x.XStoreName(self.display, window, b'Classification Banner')
+        self.set_property(window, '_NET_WM_WINDOW_TYPE', ATOM, [self.atom('_NET_WM_WINDOW_TYPE_DOCK')])
+        self.set_property(window, '_NET_WM_STATE', ATOM, [self.atom(name) for name in ('_NET_WM_STATE_ABOVE',
+            '_NET_WM_STATE_STICKY', '_NET_WM_STATE_SKIP_TASKBAR', '_NET_WM_STATE_SKIP_PAGER')])
+        self.set_property(window, '_NET_WM_DESKTOP', CARDINAL, [0xFFFFFFFF])
+        # Motif hints: decorations flag set, no decorations
+        self.set_property(window, '_MOTIF_WM_HINTS', self.atom('_MOTIF_WM_HINTS'), [2, 0, 0, 0, 0])
+        self.x.XSelectInput(self.display, window, EXPOSURE_MASK | STRUCTURE_NOTIFY_MASK)
+        self.x.XMapRaised(self.display, window)
+        return window
+
+    # Destroy the windows and free the font and colors
+    def clear(self):
+        for window, (draw, width) in self.windows.items():
+            self.xft.XftDrawDestroy(draw)
+            self.x.XDestroyWindow(self.display, window)
+        self.windows = {}
+        if self.font:
+            self.xft.XftFontClose(self.display, self.font)
+            self.font = None
+        if self.colors:
+            for color in self.colors:
+                self.xft.XftColorFree(self.display, self.visual, self.colormap, ctypes.byref(color))
+            self.colors = None
+
+    # Show a configuration (the daemon's full configuration dictionary)
+    def show(self, config):
+        self.clear()
+        self.config = config
+        self.font = self.xft.XftFontOpenName(self.display, self.screen,
+            font_name(config['face'], config['weight'], config['size']).encode('utf-8'))
+        if not self.font:
+            self.font = self.xft.XftFontOpenName(self.display, self.screen, b'sans')
+        self.colors = (XftColor(), XftColor())
+        for color, name in zip(self.colors, (config['fgcolor'], config['bgcolor'])):
+            if not self.xft.XftColorAllocName(self.display, self.visual, self.colormap,
+                    name.encode('utf-8'), ctypes.byref(color)):
+                self.xft.XftColorAllocName(self.display, self.visual, self.colormap,
+                    color is self.colors[0] and b'black' or b'white', ctypes.byref(color))
+        self.layout()
+
+    # Match the windows to the monitors and move them into place
+    def layout(self):
+        if self.config is None:
+            return
+        height = self.font.contents.height
+        edges = []
+        for x, y, width, monitor_height in self.monitors():
+            if self.config['show_top']:
+                edges.append((x, y, width))
+            if self.config['show_bottom']:
+                edges.append((x, y + monitor_height - height, width))
+        windows = list(self.windows)
+        while len(windows) < len(edges):
+            window = self.create_window()
+            self.windows[window] = (self.xft.XftDrawCreate(self.display, window, self.visual, self.colormap), 0)
+            windows.append(window)
+        while len(windows) > len(edges):
+            window = windows.pop()
+            self.xft.XftDrawDestroy(self.windows.pop(window)[0])
+            self.x.XDestroyWindow(self.display, window)
+        for window, (x, y, width) in zip(windows, edges):
+            self.windows[window] = (self.windows[window][0], width)
+            self.x.XMoveResizeWindow(self.display, window, x, y, width, height)
+            self.draw(window)
+
+    # Draw the centered message
+    def draw(self, window):
+        draw, width = self.windows[window]
+        text = self.config['message'].encode('utf-8')
+        extents = XGlyphInfo()
+        self.xft.XftTextExtentsUtf8(self.display, self.font, text, len(text), ctypes.byref(extents))
+        font = self.font.contents
+        self.x.XClearWindow(self.display, window)
+        self.xft.XftDrawStringUtf8(draw, ctypes.byref(self.colors[0]), self.font,
+            (width - extents.xOff) // 2, (font.height - font.ascent - font.descent) // 2 + font.ascent,
+            text, len(text))
+
+    # Handle the pending X events
+    def dispatch(self):
+        event = XEvent()
+        while self.x.XPending(self.display):
+            self.x.XNextEvent(self.display, ctypes.byref(event))
+            window = event.xany.window
+            if event.type == CONFIGURE_NOTIFY and window == self.root:
+                self.layout()
+            elif event.type == EXPOSE and window in self.windows:
+                self.draw(window)
+            elif event.type == UNMAP_NOTIFY and window in self.windows:
+                # Restore a minimized banner
+                self.x.XMapRaised(self.display, window)
+        self.x.XFlush(self.display)
+
+
+# Connect to the banner daemon, returning the socket or None
+def connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        sock.close()
+        return None
+    return sock
+
+
+# Run the full banner in place of this client
+def run_banner(args):
+    os.execv(sys.executable, [sys.executable, BANNER] + args)
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [--socket path]")
+    parser.add_option("--socket", default=SOCKET,
+        help="Banner daemon socket (default: %s)" % SOCKET)
+    options, args = parser.parse_args()
+    if not os.environ.get('DISPLAY'):
+        print("Error: DISPLAY environment variable not set.")
+        sys.exit(1)
+
+    sock = connect(options.socket)
+    if sock is None:
+        run_banner(sys.argv[1:])
+    try:
+        banners = Banners()
+    except ClientError as e:
+        sys.stderr.write("%s, running the full banner\n" % e)
+        sock.close()
+        run_banner(sys.argv[1:])
+
+    buffer = b''
+    retry = 0
+    while True:
+        banners.dispatch()
+        sources = [banners]
+        if sock is not None:
+            sources.append(sock)
+        readable = select.select(sources, [], [], RETRY)[0]
+        if sock is None:
+            if time.time() >= retry:
+                sock = connect(options.socket)
+                retry = time.time() + RETRY
+            continue
+        if sock not in readable:
+            continue
+        try:
+            data = sock.recv(65536)
+        except socket.error:
+            data = b''
+        if not data:
+            # Daemon restarting: keep the banners up and reconnect
+            sock.close()
+            sock = None
+            buffer = b''
+            retry = time.time() + RETRY
+            continue
+        lines = (buffer + data).split(b'\n')
+        buffer = lines.pop()
+        if lines:
+            try:
+                config = json.loads(lines[-1].decode('utf-8'))
+            except ValueError:
+                continue
+            if config != banners.config:
+                banners.show(config)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,15 +7,222 @@
 
 import sys
 import os
+import json
+import errno
+import select
+import socket
+import struct
 import optparse
 
 try:
     os.environ['DISPLAY']
     import pygtk
     import gtk
+    import gobject
 except:
-    print("Error: DISPLAY environment varible not set.")
-    sys.exit(1)
+    # The banner daemon serves the configuration and needs no display
+    if '--daemon' not in sys.argv[1:]:
+        print("Error: DISPLAY environment varible not set.")
+        sys.exit(1)
+
+# Global Configuration
+CONFIG_FILE = "/etc/classification-banner"
+DEFAULTS = {
+    "message": "UNCLASSIFIED",
+    "fgcolor": "#000000",
+    "bgcolor": "#00CC00",
+    "face": "liberation-sans",
+    "size": "small",
+    "weight": "bold",
+    "show_top": True,
+    "show_bottom": True,
+}
+# Local socket of the per-host banner daemon (in a directory the daemon's
+# unprivileged account owns)
+SOCKET = "/var/run/classification-banner/banner.sock"
+# Queued output after which the daemon drops a client that stopped reading
+MAX_QUEUE = 65536
+# Clients the daemon serves at most (select() handles descriptors < 1024)
+MAX_CLIENTS = 1000
+# Clients the daemon serves at most for any one user
+MAX_USER_CLIENTS = 16
+# Linux getsockopt() option for the peer's (pid, uid, gid)
+SO_PEERCRED = getattr(socket, 'SO_PEERCRED', 17)
+# Parsed configuration files: path -> ((device, inode, mtime, size), config)
+CONFIG_CACHE = {}
+
+# Parse 'key = value' configuration lines (values may be quoted)
+def parse_config(text, path=CONFIG_FILE):
+    config = {}
+    for number, line in enumerate(text.splitlines()):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        key, sep, value = line.partition('=')
+        key = key.strip()
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+            value = value[1:-1]
+        if not sep or key not in DEFAULTS:
+            sys.stderr.write("%s:%d: ignoring invalid line\n" % (path, number + 1))
+            continue
+        if isinstance(DEFAULTS[key], bool):
+            if value.lower() in ('true', 'yes', '1'):
+                value = True
+            elif value.lower() in ('false', 'no', '0'):
+                value = False
+            else:
+                sys.stderr.write("%s:%d: invalid boolean for %s\n" % (path, number + 1, key))
+                continue
+        config[key] = value
+    return config
+
+# Read a configuration file, re-parsing only when it has changed on disk
+def read_config(path=CONFIG_FILE):
+    try:
+        st = os.stat(path)
+    except OSError:
+        CONFIG_CACHE.pop(path, None)
+        return {}
+    key = (st.st_dev, st.st_ino, st.st_mtime, st.st_size)
+    cached = CONFIG_CACHE.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    try:
+        f = open(path)
+        try:
+            config = parse_config(f.read(), path)
+        finally:
+            f.close()
+    except IOError as e:
+        sys.stderr.write("%s: %s\n" % (path, e))
+        config = {}
+    CONFIG_CACHE[path] = (key, config)
+    return config
+
+# Configuration with the defaults filled in, as a daemon message line
+def encode_config(config):
+    full = dict(DEFAULTS)
+    full.update(config)
+    return (json.dumps(full) + "\n").encode('utf-8')
+
+# Banner Daemon
+class Banner_Daemon:
+    """Serve the global configuration to banner clients over a local socket.
+
+    Every client receives the full configuration (defaults filled in) as one
+    JSON line when it connects and again whenever the configuration file
+    changes. Sends never block: output is queued per client and a client
+    that stops reading is dropped once its queue passes MAX_QUEUE. Every
+    local user may connect, up to MAX_USER_CLIENTS connections per user.
+    """
+
+    def __init__(self, path=SOCKET, interval=2):
+        self.path = path
+        self.interval = interval
+        # Client socket -> queued output
+        self.clients = {}
+        # Client socket -> user id of the connecting process
+        self.users = {}
+
+    # Queue a message for a client and send what the socket takes now
+    def send(self, client, message):
+        queued = self.clients[client] + message
+        if len(queued) > MAX_QUEUE:
+            self.drop(client)
+            return
+        self.clients[client] = queued
+        self.flush(client)
+
+    # Send queued output without blocking, dropping clients that went away
+    def flush(self, client):
+        try:
+            sent = client.send(self.clients[client])
+        except socket.error as e:
+            if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                self.drop(client)
+            return
+        self.clients[client] = self.clients[client][sent:]
+
+    def drop(self, client):
+        del self.clients[client]
+        self.users.pop(client, None)
+        client.close()
+
+    # Accept a client unless the host or its user has too many connections
+    def accept(self, server):
+        try:
+            client = server.accept()[0]
+        except socket.error:
+            return None
+        try:
+            creds = client.getsockopt(socket.SOL_SOCKET, SO_PEERCRED, struct.calcsize('3i'))
+            uid = struct.unpack('3i', creds)[1]
+        except socket.error:
+            client.close()
+            return None
+        if len(self.clients) >= MAX_CLIENTS or list(self.users.values()).count(uid) >= MAX_USER_CLIENTS:
+            client.close()
+            return None
+        client.setblocking(0)
+        self.clients[client] = b''
+        self.users[client] = uid
+        return client
+
+    # Bind the socket, accessible to every local user
+    def listen(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        # Connecting takes write permission on the socket
+        os.chmod(self.path, 0o666)
+        server.listen(128)
+        server.setblocking(0)
+        return server
+
+    # Serve clients forever (on a socket from listen() if given)
+    def run(self, server=None):
+        if server is None:
+            server = self.listen()
+        config = read_config(CONFIG_FILE)
+        message = encode_config(config)
+        while True:
+            waiting = [client for client in self.clients if self.clients[client]]
+            readable, writable = select.select([server] + list(self.clients), waiting, [], self.interval)[:2]
+            for sock in readable:
+                if sock is server:
+                    client = self.accept(server)
+                    if client is not None:
+                        self.send(client, message)
+                elif sock in self.clients:
+                    # Clients never send anything, so readable means closed
+                    try:
+                        data = sock.recv(4096)
+                    except socket.error:
+                        data = None
+                    if not data:
+                        self.drop(sock)
+            for sock in writable:
+                if sock in self.clients:
+                    self.flush(sock)
+            current = read_config(CONFIG_FILE)
+            if current != config:
+                config = current
+                message = encode_config(config)
+                for client in list(self.clients):
+                    self.send(client, message)
+
+# Primary Monitor Geometry
+def primary_monitor(screen=None):
+    if screen is None:
+        screen = gtk.gdk.screen_get_default()
+    # Newer versions of pygtk have this method
+    try:
+        monitor = screen.get_primary_monitor()
+    except AttributeError:
+        monitor = 0
+    return screen.get_monitor_geometry(monitor)
 
 # Classifion Banner Class
 class Classification_Banner:
@@ -34,15 +241,6 @@ class Classification_Banner:
         size    -- Size of font to use for text
         weight  -- Bold or normal
         """
-    	# Dynamic Resolution Scaling
-    	self.monitor = gtk.gdk.Screen()
-	self.monitor.connect("size-changed", self.resize)
-	# Newer versions of pygtk have this method
-	try:
-		self.monitor.connect("monitors-changed", self.resize)
-	except:
-		pass
-
         # Create Main Window
         self.window = gtk.Window()
         self.window.set_position(gtk.WIN_POS_CENTER)
@@ -55,35 +253,19 @@ class Classification_Banner:
         self.window.set_decorated(False)
         self.window.set_keep_above(True)
         self.window.set_app_paintable(True)
-        # Try Xrandr to determine primary monitor resolution
-    	try:
-                self.screen = os.popen("xrandr | grep *0 | awk '{ print $2$3$4 }'").readlines()[0]
-                self.hres = self.screen.split('x')[0]
-                self.vres = self.screen.split('x')[1].split('+')[0]
-	except:
-		try:
-	    		self.screen = os.popen("xrandr | grep primary | awk '{ print $4 }'").readlines()[0]
-	    		self.hres = self.screen.split('x')[0]
-	    		self.vres = self.screen.split('x')[1].split('+')[0]
-		except:
-			self.screen = os.popen("xrandr | grep connected | awk '{ print $3 }'").readlines()[0]
-			self.hres = self.screen.split('x')[0]
-			self.vres = self.screen.split('x')[1].split('+')[0]
-        	else:
-			# Failback to GTK method
-			self.display = gtk.gdk.display_get_default()
-			self.screen = self.display.get_default_screen()
-			self.hres = self.screen.get_width()
-			self.vres = self.screen.get_height()
+        # Primary monitor resolution (GDK, no external processes)
+        geometry = primary_monitor()
+        self.hres = geometry.width
+        self.vres = geometry.height
         self.window.set_default_size(int(self.hres), 5)
 
         # Create Main Vertical Box to Populate
         self.vbox = gtk.VBox()
 
-        self.label = gtk.Label(
+        self.label = gtk.Label()
+        self.label.set_markup(
             "<span font_family='%s' weight='%s' foreground='%s' size='%s'>%s</span>" %
             (face, weight, fgcolor, size, message))
-        self.label.set_use_markup(True)
         self.label.set_justify(gtk.JUSTIFY_CENTER)
         self.vbox.pack_start(self.label, True, True, 0)
 
@@ -96,97 +278,211 @@ class Classification_Banner:
         self.window.present()
         return True
 
-    # Destroy Classification Banner Window on Resize (Display Banner Will Relaunch)
-    def resize(self, widget, data=None):
-        self.window.destroy()
-        return True
+    # Change the Banner Message and Colors
+    def update(self, message, fgcolor, bgcolor, face, size, weight):
+        self.window.modify_bg(gtk.STATE_NORMAL, gtk.gdk.color_parse(bgcolor))
+        self.label.set_markup(
+            "<span font_family='%s' weight='%s' foreground='%s' size='%s'>%s</span>" %
+            (face, weight, fgcolor, size, message))
+
+    # Move/Resize the Banner to Span a Monitor (top or bottom edge)
+    def place(self, geometry, bottom=False):
+        self.window.resize(geometry.width, self.height)
+        if bottom:
+            self.window.move(geometry.x, geometry.y + geometry.height - self.height)
+        else:
+            self.window.move(geometry.x, geometry.y)
 
 class Display_Banner:
     """Display Classification Banner Message"""
 
     def __init__(self):
 
-    	# Dynamic Resolution Scaling
-    	self.monitor = gtk.gdk.Screen()
-	self.monitor.connect("size-changed", self.resize)
-	# Newer versions of pygtk have this method
-	try:
-		self.monitor.connect("monitors-changed", self.resize)
-	except:
-		pass
+        # Dynamic Resolution Scaling
+        self.screen = gtk.gdk.screen_get_default()
+        self.screen.connect("size-changed", self.resize)
+        # Newer versions of pygtk have this method
+        try:
+            self.screen.connect("monitors-changed", self.resize)
+        except:
+            pass
 
-	# Launch Banner
-	self.config, self.args = self.configure()
-	self.execute(self.config)
+        # One (top, bottom) banner pair per monitor, kept for the whole session
+        self.banners = []
+
+        # Launch Banner
+        self.options, self.args = self.parse_args()
+        self.connect()
+        self.config, self.args = self.configure()
+        self.execute(self.config)
+        self.watch()
+
+    # Parse the Command Line (options left unset fall back to the global config)
+    def parse_args(self):
+        parser = optparse.OptionParser()
+        parser.add_option("-m", "--message", help="Classification message")
+        parser.add_option("-f", "--fgcolor", help="Foreground (text) color")
+        parser.add_option("-b", "--bgcolor", help="Background color")
+        parser.add_option("--face", help="Font face")
+        parser.add_option("--size", help="Font size")
+        parser.add_option("--weight", help="Font weight")
+        parser.add_option("--hide-top", dest="show_top", action="store_false",
+            help="Disable the top banner")
+        parser.add_option("--hide-bottom", dest="show_bottom", action="store_false",
+            help="Disable the bottom banner")
+        parser.add_option("--socket", default=SOCKET,
+            help="Banner daemon socket (default: %s)" % SOCKET)
+        parser.add_option("--daemon", action="store_true", default=False,
+            help="Run the per-host banner daemon")
+        return parser.parse_args()
+
+    # Connect to the Banner Daemon (returns False if it is not running)
+    def connect(self):
+        self.remote = None
+        self.sock = None
+        self.buffer = ''
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(2)
+            sock.connect(self.options.socket)
+            f = sock.makefile('r')
+            self.remote = json.loads(f.readline())
+            f.close()
+        except (socket.error, ValueError):
+            return False
+        sock.setblocking(0)
+        self.sock = sock
+        return True
+
+    # Receive Configuration Updates from the Banner Daemon
+    def receive(self, source, condition):
+        try:
+            data = self.sock.recv(65536)
+        except socket.error:
+            data = ''
+        if not data:
+            # Daemon went away, fall back to watching the file directly
+            self.sock.close()
+            self.sock = None
+            self.remote = None
+            self.watch()
+            self.reload()
+            return False
+        self.buffer += data.decode('utf-8')
+        lines = self.buffer.split("\n")
+        self.buffer = lines.pop()
+        if lines:
+            self.remote = json.loads(lines[-1])
+            self.reload()
+        return True
 
     # Read Global configuration
     def configure(self):
-        config = {}
+        if self.remote is not None:
+            config = self.remote
+        else:
+            config = read_config(CONFIG_FILE)
+        options = optparse.Values()
+        for key in DEFAULTS:
+            value = getattr(self.options, key)
+            if value is None:
+                value = config.get(key, DEFAULTS[key])
+            setattr(options, key, value)
+        return options, self.args
+
+    # Watch the Global configuration for changes
+    def watch(self):
+        if self.sock:
+            gobject.io_add_watch(self.sock, gobject.IO_IN | gobject.IO_HUP, self.receive)
+            return
         try:
-        	execfile("/etc/classification-banner", config)
+            import gio
+            self.monitor = gio.File(CONFIG_FILE).monitor_file()
+            self.monitor.connect("changed", self.reload)
         except:
-        	pass
-        defaults = {}
-        defaults["message"] = config.get("message", "UNCLASSIFIED")
-        defaults["fgcolor"] = config.get("fgcolor", "#000000")
-        defaults["bgcolor"] = config.get("bgcolor", "#00CC00")
-        defaults["face"] = config.get("face", "liberation-sans")
-        defaults["size"] = config.get("size", "small")
-        defaults["weight"] = config.get("weight", "bold")
-        defaults["show_top"] = config.get("show_top", True)
-        defaults["show_bottom"] = config.get("show_bottom", True)
-
-        # Use the global config to set defaults for command line options
-        parser = optparse.OptionParser()
-        parser.add_option("-m", "--message", default=defaults["message"],
-            help="Classification message")
-        parser.add_option("-f", "--fgcolor", default=defaults["fgcolor"],
-            help="Foreground (text) color")
-        parser.add_option("-b", "--bgcolor", default=defaults["bgcolor"],
-            help="Background color")
-        parser.add_option("--face", default=defaults["face"], help="Font face")
-        parser.add_option("--size", default=defaults["size"], help="Font size")
-        parser.add_option("--weight", default=defaults["weight"],
-            help="Font weight")
-        parser.add_option("--hide-top", default=defaults["show_top"],
-            dest="show_top", action="store_false",
-            help="Disable the top banner")
-        parser.add_option("--hide-bottom", default=defaults["show_bottom"],
-            dest="show_bottom", action="store_false",
-            help="Disable the bottom banner")
+            # No file monitoring available, fall back to polling (stat only)
+            gobject.timeout_add_seconds(5, self.reload)
+
+    # Update the Banners in Place when the Configuration Changes
+    def reload(self, *args):
+        config, self.args = self.configure()
+        if config == self.config:
+            return True
+        if (config.show_top, config.show_bottom) != (self.config.show_top, self.config.show_bottom):
+            for pair in self.banners:
+                for banner in pair:
+                    if banner:
+                        banner.window.destroy()
+            self.banners = []
+        else:
+            for pair in self.banners:
+                for banner in pair:
+                    if banner:
+                        banner.update(config.message, config.fgcolor, config.bgcolor,
+                            config.face, config.size, config.weight)
+        self.config = config
+        self.layout(config)
+        return True
 
-        options, args = parser.parse_args()
-	return options, args
+    # Create a Banner Window
+    def banner(self, options):
+        return Classification_Banner(
+            options.message,
+            options.fgcolor,
+            options.bgcolor,
+            options.face,
+            options.size,
+            options.weight)
 
     # Launch the Classification Banner Window(s)
     def execute(self, options):
-        if options.show_top:
-            top = Classification_Banner(
-                options.message,
-                options.fgcolor,
-                options.bgcolor,
-                options.face,
-                options.size,
-                options.weight)
-            top.window.move(0, 0)
-        if options.show_bottom:
-            bottom = Classification_Banner(
-                options.message,
-                options.fgcolor,
-                options.bgcolor,
-                options.face,
-                options.size,
-                options.weight)
-            bottom.window.move(0, int(bottom.vres))
-
-    # Relauch the Classification Banner on Screen Resize
+        self.layout(options)
+
+    # Match the banner windows to the current monitors and move them into place
+    def layout(self, options):
+        monitors = [self.screen.get_monitor_geometry(i)
+            for i in range(self.screen.get_n_monitors())]
+        while len(self.banners) < len(monitors):
+            top = bottom = None
+            if options.show_top:
+                top = self.banner(options)
+            if options.show_bottom:
+                bottom = self.banner(options)
+            self.banners.append((top, bottom))
+        while len(self.banners) > len(monitors):
+            for banner in self.banners.pop():
+                if banner:
+                    banner.window.destroy()
+        for (top, bottom), geometry in zip(self.banners, monitors):
+            if top:
+                top.place(geometry)
+            if bottom:
+                bottom.place(geometry, bottom=True)
+
+    # Reposition the Classification Banners on Screen Resize/Hotplug
     def resize(self, widget, data=None):
-	self.config, self.args = self.configure()
-	self.execute(self.config)
+        self.layout(self.config)
         return True
 
 
 # Main Program Loop
 if __name__ == "__main__":
+	if '--daemon' in sys.argv[1:]:
+		parser = optparse.OptionParser()
+		parser.add_option("--daemon", action="store_true")
+		parser.add_option("--socket", default=SOCKET)
+		parser.add_option("--pidfile", help="Write the daemon's process id to a file")
+		options, args = parser.parse_args()
+		daemon = Banner_Daemon(options.socket)
+		try:
+			server = daemon.listen()
+		except (socket.error, OSError) as e:
+			sys.stderr.write("ERROR: %s\n" % e)
+			sys.exit(1)
+		if options.pidfile:
+			f = open(options.pidfile, 'w')
+			f.write("%d\n" % os.getpid())
+			f.close()
+		daemon.run(server)
 	run = Display_Banner()
 	gtk.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/python
+# Disk Inventory
+#
+# Lists the installable hard drives by reading /sys/block directly instead of
+# forking the anaconda 'list-harddrives' helper. The sysfs and /dev roots can
+# be pointed at a fake tree for testing.
+#
+# License: GPLv2
+
+import os
+from collections import namedtuple
+
+# Hard drive record
+#
+#   name       -- Kernel device name (e.g. sda)
+#   size       -- Size in MB
+#   rotational -- True for spinning disks, False for SSD/NVMe
+#   model      -- Vendor model string
+#   transport  -- sata, sas, scsi, usb, nvme, virtio, xen, mmc, fc or iscsi
+#   removable  -- Removable media flag
+#   member     -- 'lvm', 'luks' or 'raid' if the drive (or one of its
+#                 partitions) is already in use by one, otherwise None
+Disk = namedtuple('Disk', 'name size rotational model transport removable member')
+
+# Block devices that are never install targets
+IGNORE = ('fd', 'sr', 'loop', 'ram', 'zram', 'dm-', 'md', 'nbd')
+
+# Device path fragments identifying the transport (checked in order)
+TRANSPORTS = (
+    ('/usb', 'usb'),
+    ('/virtio', 'virtio'),
+    ('/rport-', 'fc'),
+    ('/session', 'iscsi'),
+    ('/end_device-', 'sas'),
+    ('/ata', 'sata'),
+)
+
+# Volume signatures (offset, magic) probed on the block device
+SIGNATURES = (
+    (0, b'LUKS\xba\xbe', 'luks'),
+    (512 + 24, b'LVM2 001', 'lvm'),
+)
+
+
+# Read a sysfs attribute, returning default if it does not exist
+def read_attr(path, default=''):
+    try:
+        f = open(path)
+        try:
+            return f.read().strip()
+        finally:
+            f.close()
+    except (IOError, OSError):
+        return default
+
+
+# Determine the transport of a block device
+def transport(sysfs, name):
+    for prefix, bus in (('nvme', 'nvme'), ('vd', 'virtio'), ('xvd', 'xen'), ('mmcblk', 'mmc')):
+        if name.startswith(prefix):
+            return bus
+    path = os.path.realpath(os.path.join(sysfs, 'block', name))
+    for fragment, bus in TRANSPORTS:
+        if fragment in path:
+            return bus
+    return 'scsi'
+
+
+# Classify a device-mapper/md holder (LVM, LUKS or software RAID)
+def holder_type(sysfs, holder):
+    if holder.startswith('md'):
+        return 'raid'
+    uuid = read_attr(os.path.join(sysfs, 'block', holder, 'dm', 'uuid'))
+    if uuid.startswith('LVM-'):
+        return 'lvm'
+    if uuid.startswith('CRYPT-'):
+        return 'luks'
+    return None
+
+
+# Probe a block device node for LUKS/LVM signatures
+def signature(dev, name):
+    try:
+        f = open(os.path.join(dev, name), 'rb')
+        try:
+            header = f.read(1024)
+        finally:
+            f.close()
+    except (IOError, OSError):
+        return None
+    for offset, magic, kind in SIGNATURES:
+        if header[offset:offset + len(magic)] == magic:
+            return kind
+    return None
+
+
+# Determine whether a drive or any of its partitions is an LVM/LUKS/RAID member
+def member(sysfs, dev, name):
+    base = os.path.join(sysfs, 'block', name)
+    devices = [name]
+    try:
+        for entry in sorted(os.listdir(base)):
+            if entry.startswith(name) and os.path.exists(os.path.join(base, entry, 'partition')):
+                devices.append(entry)
+    except OSError:
+        pass
+    for device in devices:
+        if device == name:
+            path = base
+        else:
+            path = os.path.join(base, device)
+        try:
+            holders = sorted(os.listdir(os.path.join(path, 'holders')))
+        except OSError:
+            holders = []
+        for holder in holders:
+            kind = holder_type(sysfs, holder)
+            if kind:
+                return kind
+        kind = signature(dev, device)
+        if kind:
+            return kind
+    return None
+
+
+# List the installable hard drives (sda..sdz before sdaa)
+def list_disks(sysfs='/sys', dev='/dev'):
+    disks = []
+    try:
+        names = sorted(os.listdir(os.path.join(sysfs, 'block')), key=lambda n: (len(n), n))
+    except OSError:
+        return disks
+    for name in names:
+        if name.startswith(IGNORE):
+            continue
+        base = os.path.join(sysfs, 'block', name)
+        try:
+            sectors = int(read_attr(os.path.join(base, 'size'), '0'))
+        except ValueError:
+            sectors = 0
+        if sectors == 0:
+            # Empty card readers, detached devices
+            continue
+        disks.append(Disk(
+            name=name,
+            size=sectors * 512 // (1024 * 1024),
+            rotational=read_attr(os.path.join(base, 'queue', 'rotational'), '1') == '1',
+            model=read_attr(os.path.join(base, 'device', 'model')),
+            transport=transport(sysfs, name),
+            removable=read_attr(os.path.join(base, 'removable'), '0') == '1',
+            member=member(sysfs, dev, name)))
+    return disks
@@ -0,0 +1,55 @@
+#!/usr/bin/python
+# Kickstart Fragment Writer
+#
+# Keeps the pending kickstart fragments in memory and writes them out in one
+# go. Each file is written to a temporary file in the same directory and
+# renamed into place, so %include never sees a partially written fragment.
+#
+# License: GPLv2
+
+import os
+import tempfile
+
+
+# Atomically replace a file with new contents
+def write_atomic(path, data, mode=0o644):
+    directory = os.path.dirname(path) or '.'
+    fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', dir=directory)
+    try:
+        f = os.fdopen(fd, 'w')
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        os.chmod(tmp, mode)
+        os.rename(tmp, path)
+    except:
+        os.unlink(tmp)
+        raise
+
+
+class FragmentWriter:
+    """Buffer kickstart fragments and flush them atomically."""
+
+    def __init__(self):
+        self.pending = {}
+
+    # Set (or replace) the pending contents of a fragment
+    def set(self, path, data):
+        self.pending[path] = data
+
+    # Set several fragments from a {path: data} dictionary
+    def update(self, fragments):
+        self.pending.update(fragments)
+
+    # Drop a pending fragment
+    def discard(self, path):
+        self.pending.pop(path, None)
+
+    # Write every pending fragment to disk, returning the paths written
+    def flush(self):
+        written = sorted(self.pending)
+        for path in written:
+            write_atomic(path, self.pending[path])
+        self.pending = {}
+        return written
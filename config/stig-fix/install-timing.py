@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# Install Timing Report
+#
+# Turns the event log written by the timing/timed shell helpers in
+# stig-fix.cfg into a JSON report. Each log line is
+#
+#   <uptime> start <name>
+#   <uptime> end <name> <exit status>
+#   <uptime> profile <profile name>
+#
+# where <uptime> is read from /proc/uptime, which is monotonic and shared
+# by the installer and the chroot, so stamps from %pre and %post compare.
+#
+#   install-timing.py /root/install-timing.log > /root/install-timing.json
+#
+# License: GPLv2
+
+import sys
+import json
+import socket
+import optparse
+
+# Top level phases in install order
+PHASES = ('pre', 'post-nochroot', 'post')
+
+
+# Parse the event log into (events, metadata)
+def parse_log(path):
+    events = []
+    running = {}
+    metadata = {}
+    for line in open(path):
+        fields = line.split(None, 2)
+        if len(fields) < 3:
+            continue
+        try:
+            stamp = float(fields[0])
+        except ValueError:
+            continue
+        kind, rest = fields[1], fields[2].strip()
+        if kind == 'start':
+            event = {'name': rest, 'start': stamp, 'end': None, 'duration': None, 'status': None}
+            running[rest] = event
+            events.append(event)
+        elif kind == 'end':
+            words = rest.split()
+            event = running.pop(words[0], None)
+            if event is None:
+                continue
+            event['end'] = stamp
+            event['duration'] = round(stamp - event['start'], 2)
+            if len(words) > 1 and words[1].lstrip('-').isdigit():
+                event['status'] = int(words[1])
+        else:
+            metadata[kind] = rest
+    return events, metadata
+
+
+# Read the CPU count and memory of the machine being installed
+def hardware():
+    cpus = 0
+    memory = None
+    try:
+        for line in open('/proc/cpuinfo'):
+            if line.startswith('processor'):
+                cpus += 1
+        for line in open('/proc/meminfo'):
+            if line.startswith('MemTotal:'):
+                memory = int(line.split()[1])
+                break
+    except (IOError, ValueError):
+        pass
+    return {'cpus': cpus, 'memory_kb': memory}
+
+
+# Build the report
+#
+# 'install' is the gap between the end of %pre and the start of
+# %post --nochroot: partitioning and the %packages transaction.
+def report(events, metadata):
+    phases = {}
+    for event in events:
+        if event['name'] in PHASES:
+            phases[event['name']] = event
+    durations = {}
+    for name, event in phases.items():
+        durations[name] = event['duration']
+    if 'pre' in phases and 'post-nochroot' in phases and phases['pre']['end'] is not None:
+        durations['install'] = round(phases['post-nochroot']['start'] - phases['pre']['end'], 2)
+    stamps = [e['start'] for e in events] + [e['end'] for e in events if e['end'] is not None]
+    result = {
+        'hostname': socket.gethostname(),
+        'profile': metadata.get('profile'),
+        'total': stamps and round(max(stamps) - min(stamps), 2) or 0,
+        'phases': durations,
+        'events': events,
+    }
+    result.update(hardware())
+    return result
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [-s] install-timing.log")
+    parser.add_option("-s", "--summary", action="store_true", default=False,
+        help="Print the steps by duration instead of JSON")
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error("an event log is required")
+
+    events, metadata = parse_log(args[0])
+    result = report(events, metadata)
+    if options.summary:
+        for event in sorted(events, key=lambda e: -(e['duration'] or 0)):
+            print("%8.2fs  %-40s %s" % (event['duration'] or 0, event['name'],
+                event['status'] is None and '' or event['status']))
+        print("%8.2fs  total" % result['total'])
+    else:
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
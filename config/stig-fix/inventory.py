@@ -0,0 +1,144 @@
+#!/usr/bin/python
+# Host Inventory
+#
+# Reads a fleet inventory (CSV or JSON) and turns each host record into the
+# configuration dictionary understood by kickstart.py.
+#
+# CSV columns / JSON keys (only hostname and disks are required):
+#
+#   hostname, profile, classification, disks, ignore_disks, luks, password,
+#   root, home, tmp, var, log, audit, swap, opt, www, tim, core, disk_sizes
+#
+# Disk lists may be separated by commas, semicolons or spaces (CSV) or given
+# as a list (JSON). Partition percentages default to the profile table.
+# When disk_sizes (Gb, in the same order as disks) is given the resulting
+# logical volume sizes are checked against the volume group. ks-server.py
+# also reads a mac column (the host's MAC addresses).
+#
+# License: GPLv2
+
+import csv
+import json
+import re
+
+import kickstart
+import lvm
+import profiles
+import pwhash
+
+TRUE = ('1', 'y', 'yes', 'true', 'on')
+FALSE = ('', '0', 'n', 'no', 'false', 'off')
+
+
+class InventoryError(Exception):
+    """Invalid host record in an inventory."""
+
+
+# Verification of host names (same rules as the graphical menu)
+def check_hostname(hostname):
+    return re.match(r"^[a-zA-Z0-9\-\.]{1,100}$", hostname) is not None
+
+
+# Parse a boolean inventory field
+def to_bool(value, default=False):
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE:
+        return True
+    if value in FALSE:
+        return False
+    raise InventoryError("invalid boolean '%s'" % value)
+
+
+# Parse a disk list field
+def to_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v for v in re.split(r'[,; ]+', str(value).strip()) if v]
+
+
+# Load an inventory file, returning a list of host records (dictionaries)
+def load(path):
+    f = open(path)
+    try:
+        if path.endswith('.json'):
+            records = json.load(f)
+            if isinstance(records, dict):
+                records = records.get('hosts', [])
+            if not isinstance(records, list):
+                raise InventoryError("%s: expected a list of hosts" % path)
+            for number, record in enumerate(records):
+                if not isinstance(record, dict):
+                    raise InventoryError("%s: host %d is not an object" % (path, number + 1))
+        else:
+            records = [r for r in csv.DictReader(f)]
+    finally:
+        f.close()
+    return records
+
+
+# Convert a host record into a kickstart configuration
+#
+# The root password is taken from the record's 'password' field or from
+# the password argument; it is encrypted here and also used as the LUKS
+# passphrase, exactly as the graphical menu does.
+def host_config(record, password=None, rounds=pwhash.ROUNDS):
+    hostname = str(record.get('hostname') or '').strip()
+    if not check_hostname(hostname):
+        raise InventoryError("invalid hostname '%s'" % hostname)
+    try:
+        profile_id = profiles.profile_id(record.get('profile') or 0)
+        classification = profiles.classification_id(record.get('classification') or 0)
+    except ValueError as e:
+        raise InventoryError('%s: %s' % (hostname, e))
+
+    config = kickstart.default_config(profile_id)
+    config['hostname'] = hostname
+    config['classification'] = classification
+    config['install_drives'] = to_list(record.get('disks'))
+    config['ignore_drives'] = to_list(record.get('ignore_disks'))
+    if not config['install_drives']:
+        raise InventoryError('%s: no install disks' % hostname)
+    config['encrypt'] = to_bool(record.get('luks'), True)
+    config['tim'] = to_bool(record.get('tim'))
+    config['core'] = to_bool(record.get('core'))
+    if config['tim'] and config['core']:
+        raise InventoryError('%s: can not have both TIM and CORE install' % hostname)
+
+    for lv in profiles.LOGVOLS:
+        value = record.get(lv)
+        if value is not None and str(value).strip() != '':
+            try:
+                config['partitions'][lv] = int(value)
+            except ValueError:
+                raise InventoryError("%s: invalid %s percentage '%s'" % (hostname, lv, value))
+            if not 0 <= config['partitions'][lv] <= 100:
+                raise InventoryError("%s: %s percentage '%s' is not between 0 and 100" % (hostname, lv, value))
+    if sum(config['partitions'].values()) > 100:
+        raise InventoryError('%s: LVM configuration is over 100%%' % hostname)
+    sizes = to_list(record.get('disk_sizes'))
+    if sizes:
+        try:
+            sizes = [int(float(size) * 1024) for size in sizes]
+        except ValueError:
+            raise InventoryError("%s: invalid disk sizes '%s'" % (hostname, record.get('disk_sizes')))
+        try:
+            lvm.layout(sizes, config['partitions'], config['encrypt'])
+        except lvm.SizingError as e:
+            raise InventoryError('%s: %s' % (hostname, e))
+
+    passwd = record.get('password') or password
+    if not passwd:
+        raise InventoryError('%s: no password' % hostname)
+    if len(passwd) < 15:
+        raise InventoryError('%s: password too short, 15 characters required' % hostname)
+    config['password'] = pwhash.crypt_password(passwd, rounds)
+    if config['encrypt']:
+        config['passphrase'] = passwd
+    return config
+
@@ -0,0 +1,175 @@
+#!/usr/bin/python
+# Kickstart Fragments
+#
+# Renders the kickstart fragments that stig-fix.cfg pulls in with %include
+# (/tmp/stig-fix, /tmp/stig-fix-packages, /tmp/stig-fix-post, ...) from a
+# plain configuration dictionary. No GTK is required, so the same code backs
+# the graphical menu and the headless batch generator.
+#
+# License: GPLv2
+
+import kstemplate
+import profiles
+
+# Fragment Locations (as referenced by stig-fix.cfg)
+STIG_FIX = '/tmp/stig-fix'
+PACKAGES = '/tmp/stig-fix-packages'
+POST = '/tmp/stig-fix-post'
+POST_NOCHROOT = '/tmp/stig-fix-post-nochroot'
+BANNER = '/tmp/classification-banner'
+SYSTEM_CHOICE = '/tmp/system-choice'
+FRAGMENTS = (STIG_FIX, PACKAGES, POST, POST_NOCHROOT, BANNER, SYSTEM_CHOICE)
+
+# Compiled templates, keyed by template text
+TEMPLATES = {}
+
+# Logical Volumes (name, mount point, fstype, minimum size in MB)
+LOGVOLS = {
+    'root': ('lv_root', '/', 'ext4', 2048),
+    'home': ('lv_home', '/home', 'ext4', 1024),
+    'tmp': ('lv_tmp', '/tmp', 'ext4', 512),
+    'var': ('lv_var', '/var', 'ext4', 512),
+    'log': ('lv_log', '/var/log', 'ext4', 512),
+    'audit': ('lv_audit', '/var/log/audit', 'ext4', 512),
+    'swap': ('lv_swap', 'swap', 'swap', 256),
+    'opt': ('lv_opt', '/opt', 'ext4', 512),
+    'www': ('lv_www', '/var/www', 'ext4', 512),
+}
+
+# Partitioning sizes (MB, physical extent size in KB)
+BOOT_SIZE = 300
+PV_SIZE = 200
+PE_SIZE = 4096
+SWAP_MAXSIZE = 4096
+
+# Logical volumes that are only created when given a non-zero percentage
+OPTIONAL_LOGVOLS = ('swap', 'opt', 'www')
+
+
+# Join fragment lines into file contents
+def lines(items):
+    if not items:
+        return ''
+    return '\n'.join(items) + '\n'
+
+
+# Default configuration for a profile (hostname and password still required)
+def default_config(profile_id=0):
+    profile = profiles.PROFILES[profile_id]
+    return {
+        'hostname': 'localhost.localdomain',
+        'profile': profile_id,
+        'classification': 0,
+        'password': '',
+        'passphrase': '',
+        'install_drives': [],
+        'ignore_drives': [],
+        'encrypt': True,
+        'partitions': dict(profile['partitions']),
+        'tim': False,
+        'core': False,
+    }
+
+
+# Kickstart Configuration (/tmp/stig-fix)
+def render_stig_fix(config):
+    profile = profiles.PROFILES[config['profile']]
+    install = ','.join(config['install_drives'])
+    ignore = ','.join(config['ignore_drives'])
+    percent = config['partitions']
+    out = []
+    if profile['network'] == 'dhcp':
+        out.append('network --device eth0 --bootproto dhcp --noipv6 --hostname ' + config['hostname'])
+    else:
+        out.append('network --device eth0 --bootproto static --ip=192.168.1.101 --netmask=255.255.255.0 --onboot=on --noipv6 --hostname ' + config['hostname'])
+    out.append('rootpw --iscrypted ' + config['password'])
+    out.append('bootloader --location=mbr --driveorder=' + install + ' --append="crashkernel=auto rhgb quiet audit=1" --password=' + config['password'])
+    if ignore != '':
+        out.append('ignoredisk --drives=' + ignore)
+    out.append('zerombr')
+    out.append('clearpart --all --drives=' + install)
+    if config['encrypt']:
+        out.append('part pv.01 --grow --size=%d --encrypted --cipher=\'aes-xts-plain64\' --passphrase=%s' % (PV_SIZE, config['passphrase']))
+    else:
+        out.append('part pv.01 --grow --size=%d' % PV_SIZE)
+    out.append('part /boot --fstype=ext4 --size=%d' % BOOT_SIZE)
+    out.append('volgroup vg1 --pesize=%d pv.01' % PE_SIZE)
+    for lv in profiles.LOGVOLS:
+        name, mount, fstype, size = LOGVOLS[lv]
+        if lv in OPTIONAL_LOGVOLS and int(percent[lv]) < 1:
+            continue
+        if lv == 'swap':
+            out.append('logvol %s --fstype=%s --name=%s --vgname=vg1 --size=%d --grow --maxsize=%d --percent=%d' % (mount, fstype, name, size, SWAP_MAXSIZE, int(percent[lv])))
+        else:
+            out.append('logvol %s --fstype=%s --name=%s --vgname=vg1 --size=%d --grow --percent=%d' % (mount, fstype, name, size, int(percent[lv])))
+    return lines(out)
+
+
+# Package Selection (/tmp/stig-fix-packages)
+def render_packages(config):
+    return lines(profiles.PROFILES[config['profile']]['packages'])
+
+
+# Post Configuration (/tmp/stig-fix-post)
+def render_post(config):
+    return lines(profiles.PROFILES[config['profile']]['post'])
+
+
+# Post Configuration nochroot (/tmp/stig-fix-post-nochroot)
+#
+# The profile name is recorded in the install timing log first.
+def render_post_nochroot(config):
+    profile = profiles.PROFILES[config['profile']]
+    return lines(['timing profile ' + profile['name']] + profile['post_nochroot'])
+
+
+# Classification Banner Settings (/tmp/classification-banner)
+def render_banner(config):
+    message, fgcolor, bgcolor = profiles.CLASSIFICATIONS[config['classification']]
+    return lines([
+        'message = "%s"' % message,
+        'fgcolor = "%s"' % fgcolor,
+        'bgcolor = "%s"' % bgcolor,
+    ])
+
+
+# Additional Configuration Scripts (/tmp/system-choice)
+def render_system_choice(config):
+    out = []
+    if config['tim']:
+        out.append('echo Installing tim config')
+        out.append('/opt/tim_config/install')
+    if config['core']:
+        out.append('echo Installing core config')
+        out.append('/opt/core_config/install')
+    return lines(out)
+
+
+# Render every fragment for a configuration, keyed by fragment path
+def render_fragments(config):
+    fragments = {
+        STIG_FIX: render_stig_fix(config),
+        PACKAGES: render_packages(config),
+        POST: render_post(config),
+        POST_NOCHROOT: render_post_nochroot(config),
+        SYSTEM_CHOICE: render_system_choice(config),
+    }
+    if profiles.PROFILES[config['profile']]['banner']:
+        fragments[BANNER] = render_banner(config)
+    return fragments
+
+
+# Flatten stig-fix.cfg into a single kickstart with the fragments inlined
+#
+# The interactive %pre (Xorg + menu.py) is dropped, every %include of a
+# rendered fragment is replaced by its contents and fragments that %post
+# copies out of /tmp are written with a here-document instead. Templates
+# are compiled (and checked) once; see kstemplate.py.
+def render_kickstart(template, fragments):
+    compiled = TEMPLATES.get(template)
+    if compiled is None:
+        compiled = kstemplate.Template(template, FRAGMENTS)
+        if len(TEMPLATES) >= 8:
+            TEMPLATES.clear()
+        TEMPLATES[template] = compiled
+    return compiled.render(fragments)
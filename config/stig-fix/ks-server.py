@@ -0,0 +1,310 @@
+#!/usr/bin/python
+# Kickstart Server
+#
+# Network counterpart of batch-kickstart.py for PXE rebuilds: serves the
+# flattened kickstart of each host in a CSV/JSON inventory over HTTP.
+# Hosts are found by the MAC addresses anaconda sends with 'kssendmac'
+# (or a ?mac= query), or by name:
+#
+#   ks=http://server:8080/ks kssendmac
+#   ks=http://server:8080/ks/<hostname>
+#
+# Rendered kickstarts are kept in memory. The template, the inventory,
+# profiles.py and media-profiles are checked for changes (at most once a
+# second) and any change reloads them and empties the cache. /status
+# reports the cache counters as JSON.
+#
+# Inventories may carry a 'mac' column (one or more addresses) in addition
+# to the columns read by inventory.py.
+#
+# License: GPLv2
+
+import os
+import re
+import csv
+import sys
+import json
+import time
+import optparse
+import threading
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs
+    from urllib import unquote
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, unquote
+
+try:
+    reload
+except NameError:
+    from importlib import reload
+
+import inventory
+import kickstart
+import kstemplate
+import profiles
+import pwhash
+
+# Header prefix of the MAC addresses sent by anaconda ('eth0 00:11:22:33:44:55')
+MAC_HEADER = 'x-rhn-provisioning-mac-'
+
+
+# Normalize a MAC address (aa:bb:cc:dd:ee:ff), None if it is not one
+def normalize_mac(value):
+    digits = re.sub(r'[^0-9a-fA-F]', '', value or '')
+    if len(digits) != 12:
+        return None
+    return ':'.join([digits[i:i + 2] for i in range(0, 12, 2)]).lower()
+
+
+# Source file of a module (not its .pyc)
+def source(module):
+    return os.path.splitext(module.__file__)[0] + '.py'
+
+
+class KickstartService:
+    """Rendered kickstarts per host, cached until an input file changes."""
+
+    def __init__(self, template, inventory_path, password=None, rounds=pwhash.ROUNDS, interval=1.0):
+        self.template_path = template
+        self.inventory_path = inventory_path
+        self.password = password
+        self.rounds = rounds
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.cache = {}
+        self.hosts = {}
+        self.macs = {}
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self.loaded = None
+        self.checked = 0
+        self.refresh(force=True)
+
+    # (inode, mtime, size) of every input, keyed by path
+    def signature(self):
+        paths = (self.template_path, self.inventory_path, source(profiles), profiles.MEDIA_PROFILES)
+        result = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+                result[path] = (st.st_ino, st.st_mtime, st.st_size)
+            except OSError:
+                result[path] = None
+        return result
+
+    # Reload the inputs and empty the cache if any of them changed
+    def refresh(self, force=False):
+        now = time.time()
+        if not force and now - self.checked < self.interval:
+            return
+        self.lock.acquire()
+        try:
+            if not force and now - self.checked < self.interval:
+                return
+            self.checked = now
+            signature = self.signature()
+            if signature == self.loaded:
+                return
+            try:
+                self.load(signature)
+            except (IOError, OSError, ValueError, SyntaxError, csv.Error, inventory.InventoryError,
+                    kstemplate.TemplateError) as e:
+                if self.loaded is None:
+                    raise
+                # Keep serving the previous inputs until the files change again
+                sys.stderr.write("ERROR: reload failed, keeping generation %d: %s\n" % (self.generation, e))
+                self.loaded = signature
+        finally:
+            self.lock.release()
+
+    # Read the inputs (the lock is held)
+    def load(self, signature):
+        if self.loaded is not None and signature[source(profiles)] != self.loaded[source(profiles)]:
+            reload(profiles)
+        f = open(self.template_path)
+        try:
+            template = kstemplate.Template(f.read(), kickstart.FRAGMENTS, self.template_path)
+        finally:
+            f.close()
+        hosts = {}
+        macs = {}
+        for record in inventory.load(self.inventory_path):
+            hostname = str(record.get('hostname') or '').strip()
+            if not hostname:
+                continue
+            hosts[hostname] = record
+            for mac in inventory.to_list(record.get('mac')):
+                if normalize_mac(mac):
+                    macs[normalize_mac(mac)] = hostname
+        self.template = template
+        self.hosts = hosts
+        self.macs = macs
+        self.cache = {}
+        self.generation += 1
+        self.loaded = signature
+
+    # Hostname of the requesting host (by name, then by MAC), None if unknown
+    def lookup(self, hostname=None, macs=()):
+        self.refresh()
+        if hostname in self.hosts:
+            return hostname
+        for mac in macs:
+            mac = normalize_mac(mac)
+            if mac in self.macs:
+                return self.macs[mac]
+        return None
+
+    # Rendered kickstart of a host (None if it is unknown, InventoryError
+    # for bad records, TemplateError for invalid fragments)
+    def kickstart(self, hostname):
+        self.refresh()
+        self.lock.acquire()
+        try:
+            data = self.cache.get(hostname)
+            if data is not None:
+                self.hits += 1
+                return data
+            self.misses += 1
+            generation = self.generation
+            record = self.hosts.get(hostname)
+            template = self.template
+        finally:
+            self.lock.release()
+        if record is None:
+            # Removed from the inventory since the lookup
+            return None
+        # Rendering (password hashing mostly) runs outside the lock
+        config = inventory.host_config(record, self.password, self.rounds)
+        data = template.render(kickstart.render_fragments(config))
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        self.lock.acquire()
+        try:
+            if generation == self.generation:
+                self.cache[hostname] = data
+        finally:
+            self.lock.release()
+        return data
+
+    # Cache counters
+    def status(self):
+        self.refresh()
+        return {
+            'hosts': len(self.hosts),
+            'macs': len(self.macs),
+            'cached': len(self.cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'generation': self.generation,
+        }
+
+
+class KickstartHandler(BaseHTTPRequestHandler):
+    """GET /ks, /ks/<hostname> and /status."""
+
+    server_version = 'stig-fix-ks/1.3'
+
+    def send(self, code, data, content_type='text/plain'):
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        service = self.server.service
+        path, sep, query = self.path.partition('?')
+        if path == '/status':
+            self.send(200, json.dumps(service.status(), sort_keys=True) + '\n', 'application/json')
+            return
+        if path != '/ks' and not path.startswith('/ks/'):
+            self.send(404, 'not found\n')
+            return
+        macs = parse_qs(query).get('mac', [])
+        for name, value in self.headers.items():
+            if name.lower().startswith(MAC_HEADER):
+                macs.append(value.split()[-1])
+        hostname = service.lookup(unquote(path[4:]), macs)
+        data = None
+        if hostname is not None:
+            try:
+                data = service.kickstart(hostname)
+            except (inventory.InventoryError, kstemplate.TemplateError) as e:
+                sys.stderr.write("ERROR: %s\n" % e)
+                self.send(500, '%s\n' % e)
+                return
+        if data is None:
+            self.send(404, 'no kickstart for %s\n' % (path[4:] or ', '.join(macs) or 'this host'))
+            return
+        self.send(200, data)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class KickstartServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP server (one thread per PXE client)."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256
+
+    def __init__(self, address, service, quiet=False):
+        HTTPServer.__init__(self, address, KickstartHandler)
+        self.service = service
+        self.quiet = quiet
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [options] inventory.{csv,json}")
+    parser.add_option("-t", "--template",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stig-fix.cfg'),
+        help="Kickstart template (default: stig-fix.cfg next to this script)")
+    parser.add_option("-p", "--password-file",
+        help="File containing the default root/LUKS password")
+    parser.add_option("-r", "--rounds", default=str(pwhash.ROUNDS),
+        help="SHA-512 crypt rounds, or 'auto' to benchmark this host (default: %d)" % pwhash.ROUNDS)
+    parser.add_option("-a", "--address", default="",
+        help="Address to listen on (default: all)")
+    parser.add_option("-P", "--port", type="int", default=8080,
+        help="Port to listen on, 0 for any free port (default: 8080)")
+    parser.add_option("-q", "--quiet", action="store_true", default=False,
+        help="Do not log requests")
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error("an inventory file is required")
+
+    try:
+        rounds = pwhash.rounds_setting(options.rounds)
+    except ValueError as e:
+        parser.error(str(e))
+    password = None
+    if options.password_file:
+        f = open(options.password_file)
+        password = f.readline().rstrip('\n')
+        f.close()
+
+    service = KickstartService(options.template, args[0], password, rounds)
+    server = KickstartServer((options.address, options.port), service, options.quiet)
+    address, port = server.server_address[:2]
+    print("Serving %d hosts on http://%s:%d/ks" % (len(service.hosts), address, port))
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/python
+# Compiled Kickstart Template
+#
+# Parses stig-fix.cfg once into literal text and fragment slots, checking
+# every command, section header and %packages entry on the way, so that a
+# flattened kickstart per host is a join of strings plus a check of the
+# host's own fragment lines.
+#
+# Flattening follows the batch rules: %pre sections (the interactive menu)
+# are dropped, '%include <fragment>' is replaced by the fragment and
+# 'cp <fragment> <destination>' in %post becomes a here-document. Output
+# depends only on the template and the fragments, so renders are
+# byte-for-byte stable.
+#
+# License: GPLv2
+
+import re
+import shlex
+
+# Kickstart commands (RHEL 6 anaconda) and their options; None accepts any
+# option (authconfig passes them on to authconfig)
+ENCRYPTION = ('--encrypted', '--passphrase', '--cipher', '--escrowcert', '--backuppassphrase')
+FILESYSTEM = ('--fstype', '--fsoptions', '--fsprofile', '--label', '--noformat', '--bytes-per-inode')
+COMMANDS = {
+    'auth': None,
+    'authconfig': None,
+    'autopart': ENCRYPTION,
+    'autostep': ('--autoscreenshot',),
+    'bootloader': ('--append', '--driveorder', '--location', '--password', '--md5pass', '--iscrypted',
+        '--upgrade', '--hvargs', '--timeout', '--leavebootorder'),
+    'cdrom': (),
+    'clearpart': ('--all', '--drives', '--initlabel', '--linux', '--none'),
+    'cmdline': (),
+    'device': ('--opts',),
+    'driverdisk': ('--source', '--biospart', '--type'),
+    'firewall': ('--enabled', '--enable', '--disabled', '--disable', '--service', '--port', '--trust',
+        '--ssh', '--smtp', '--http', '--ftp', '--telnet'),
+    'firstboot': ('--enable', '--enabled', '--disable', '--disabled', '--reconfig'),
+    'graphical': (),
+    'halt': (),
+    'harddrive': ('--partition', '--dir', '--biospart'),
+    'ignoredisk': ('--drives', '--only-use', '--interactive'),
+    'install': (),
+    'interactive': (),
+    'iscsi': ('--ipaddr', '--port', '--target', '--iface', '--user', '--password', '--reverse-user',
+        '--reverse-password'),
+    'iscsiname': (),
+    'key': ('--skip',),
+    'keyboard': (),
+    'lang': (),
+    'logging': ('--host', '--port', '--level'),
+    'logvol': ('--name', '--vgname', '--size', '--grow', '--maxsize', '--percent', '--recommended',
+        '--useexisting') + FILESYSTEM + ENCRYPTION,
+    'mediacheck': (),
+    'network': ('--bootproto', '--device', '--ip', '--ipv6', '--gateway', '--nameserver', '--nodns',
+        '--netmask', '--hostname', '--ethtool', '--essid', '--wepkey', '--wpakey', '--onboot',
+        '--dhcpclass', '--mtu', '--noipv4', '--noipv6', '--activate'),
+    'nfs': ('--server', '--dir', '--opts'),
+    'part': ('--size', '--grow', '--maxsize', '--onpart', '--usepart', '--ondisk', '--ondrive',
+        '--asprimary', '--recommended', '--onbiosdisk', '--start', '--end') + FILESYSTEM + ENCRYPTION,
+    'poweroff': (),
+    'raid': ('--level', '--device', '--spares', '--useexisting') + FILESYSTEM + ENCRYPTION,
+    'reboot': ('--eject',),
+    'repo': ('--name', '--baseurl', '--mirrorlist', '--cost', '--excludepkgs', '--includepkgs',
+        '--proxy', '--ignoregroups', '--noverifyssl'),
+    'rootpw': ('--iscrypted', '--plaintext', '--lock'),
+    'selinux': ('--enforcing', '--permissive', '--disabled'),
+    'services': ('--enabled', '--disabled'),
+    'shutdown': (),
+    'skipx': (),
+    'sshpw': ('--username', '--iscrypted', '--plaintext', '--lock'),
+    'text': (),
+    'timezone': ('--utc', '--isUtc', '--nontp', '--ntpservers'),
+    'upgrade': (),
+    'url': ('--url', '--proxy', '--noverifyssl'),
+    'user': ('--name', '--groups', '--homedir', '--password', '--iscrypted', '--plaintext',
+        '--shell', '--uid', '--lock'),
+    'volgroup': ('--noformat', '--useexisting', '--pesize'),
+    'xconfig': ('--driver', '--defaultdesktop', '--startxonboot', '--resolution', '--depth',
+        '--videoram', '--hsync', '--vsync', '--monitor', '--noprobe'),
+    'zerombr': (),
+}
+COMMANDS['partition'] = COMMANDS['part']
+
+# Commands that may appear only once in a kickstart
+SINGLE = set(['auth', 'authconfig', 'autopart', 'autostep', 'bootloader', 'cdrom', 'clearpart',
+    'cmdline', 'firewall', 'firstboot', 'graphical', 'halt', 'harddrive', 'ignoredisk', 'install',
+    'interactive', 'key', 'keyboard', 'lang', 'mediacheck', 'nfs', 'poweroff', 'reboot', 'rootpw',
+    'selinux', 'shutdown', 'skipx', 'text', 'timezone', 'upgrade', 'url', 'xconfig', 'zerombr'])
+
+# Options every use of a command needs
+REQUIRED = {
+    'logvol': ('--name', '--vgname'),
+}
+
+# Commands taking an argument, and those whose first word is the argument
+# (mount point or volume group name)
+ARGUMENT = set(['keyboard', 'lang', 'logvol', 'part', 'partition', 'raid', 'rootpw', 'timezone', 'volgroup'])
+LEADING_ARGUMENT = set(['logvol', 'part', 'partition', 'raid', 'volgroup'])
+
+# Options taking a count in MB, seconds or similar (a non-negative integer),
+# percentages and the file systems anaconda can create
+NUMERIC = set(['--size', '--maxsize', '--pesize', '--timeout', '--mtu', '--port', '--uid', '--spares',
+    '--start', '--end', '--cost', '--bytes-per-inode', '--biospart'])
+PERCENT = set(['--percent'])
+FSTYPES = set(['ext2', 'ext3', 'ext4', 'xfs', 'btrfs', 'swap', 'vfat', 'efi', 'biosboot', 'PPC PReP Boot'])
+
+# Section headers and their options
+SECTIONS = {
+    '%packages': ('--nobase', '--ignoremissing', '--resolvedeps', '--excludedocs', '--default',
+        '--instLangs', '--multilib', '--nocore'),
+    '%pre': ('--interpreter', '--log', '--erroronfail'),
+    '%post': ('--nochroot', '--interpreter', '--log', '--erroronfail'),
+}
+
+# %packages entries: [-][@]name with shell globs, group options
+PACKAGE = re.compile(r'^-?@?[A-Za-z0-9][\w.+*?\[\]:-]*( --nodefaults| --optional)*$')
+
+# Here-document delimiter for copied fragments
+HEREDOC = 'EOF'
+
+# Validated fragment texts kept per template
+MEMO_SIZE = 256
+
+
+class TemplateError(Exception):
+    """Invalid template or fragment."""
+
+
+# Split a command line into words (quotes only parsed when present)
+def split_words(line):
+    if '"' in line or "'" in line:
+        try:
+            return shlex.split(line)
+        except ValueError:
+            raise TemplateError('unbalanced quotes')
+    return line.split()
+
+
+# Check the value of a numeric, percentage or file system option
+def check_value(command, name, value):
+    if name == '--fstype':
+        if value not in FSTYPES:
+            raise TemplateError("%s: unknown file system '%s'" % (command, value))
+        return
+    if not value.isdigit():
+        raise TemplateError("%s: %s '%s' is not a non-negative number" % (command, name, value))
+    if name in PERCENT and int(value) > 100:
+        raise TemplateError("%s: %s '%s' is not between 0 and 100" % (command, name, value))
+
+
+# Check a command line, returning (command, mount point or None)
+def check_command(line):
+    words = split_words(line)
+    command = words[0]
+    if command not in COMMANDS:
+        raise TemplateError("unknown command '%s'" % command)
+    allowed = COMMANDS[command]
+    options = set()
+    argument = False
+    position = 1
+    while position < len(words):
+        word = words[position]
+        position += 1
+        if not word.startswith('--'):
+            argument = True
+            continue
+        name = word.split('=', 1)[0]
+        if allowed is not None and name not in allowed:
+            raise TemplateError("%s: unknown option '%s'" % (command, name))
+        options.add(name)
+        if name not in NUMERIC and name not in PERCENT and name != '--fstype':
+            continue
+        # The value follows the '=' or is the next word
+        if '=' in word:
+            value = word.split('=', 1)[1]
+        elif position < len(words) and not words[position].startswith('--'):
+            value = words[position]
+            position += 1
+        else:
+            raise TemplateError('%s: %s needs a value' % (command, name))
+        check_value(command, name, value)
+    if command in ARGUMENT and not argument:
+        raise TemplateError('%s: argument missing' % command)
+    mount = None
+    if command in LEADING_ARGUMENT:
+        if len(words) < 2 or words[1].startswith('--'):
+            raise TemplateError('%s: %s must come first' % (command, command == 'volgroup' and 'name' or 'mount point'))
+        if command != 'volgroup':
+            mount = words[1]
+    for option in REQUIRED.get(command, ()):
+        if option not in options:
+            raise TemplateError('%s: %s is required' % (command, option))
+    return command, mount
+
+
+# Check a %packages entry
+def check_package(line):
+    if not PACKAGE.match(line):
+        raise TemplateError("invalid package entry '%s'" % line)
+
+
+# Check a section header
+def check_section(words):
+    for word in words[1:]:
+        name = word.split('=', 1)[0]
+        if name not in SECTIONS[words[0]]:
+            raise TemplateError("%s: unknown option '%s'" % (words[0], name))
+
+
+# Check the lines of a command or %packages block, returning the commands
+# that may appear only once and the mount points it uses
+def check_block(text, section):
+    singles = []
+    mounts = []
+    for number, line in enumerate(text.splitlines()):
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            continue
+        try:
+            if section == 'packages':
+                check_package(stripped)
+                continue
+            command, mount = check_command(stripped)
+        except TemplateError as e:
+            raise TemplateError('line %d: %s' % (number + 1, e))
+        if command in SINGLE:
+            if command in singles:
+                raise TemplateError("line %d: %s given twice" % (number + 1, command))
+            singles.append(command)
+        if mount and mount != 'swap':
+            if mount in mounts:
+                raise TemplateError("line %d: %s mounted twice" % (number + 1, mount))
+            mounts.append(mount)
+    return singles, mounts
+
+
+class Template:
+    """Compiled kickstart template: literal text and fragment slots."""
+
+    def __init__(self, text, fragments, path='stig-fix.cfg'):
+        self.path = path
+        # Parts: literal strings and (kind, fragment, destination, section) slots
+        self.parts = []
+        self.singles = set()
+        self.mounts = set()
+        self.memo = {}
+        self.compile(text, set(fragments))
+
+    def error(self, number, message):
+        raise TemplateError('%s:%d: %s' % (self.path, number, message))
+
+    def compile(self, text, fragments):
+        literal = []
+        section = None
+        block = []
+        for number, line in enumerate(text.splitlines()):
+            number += 1
+            stripped = line.strip()
+            words = stripped.split()
+            if section == 'pre':
+                if stripped == '%end':
+                    section = None
+                continue
+            if words and words[0].startswith('%') and words[0] != '%include':
+                if words[0] == '%end':
+                    if section is None:
+                        self.error(number, '%end outside a section')
+                    section = None
+                elif words[0] in SECTIONS:
+                    if section is not None:
+                        self.error(number, '%s inside an unclosed section' % words[0])
+                    try:
+                        check_section(words)
+                    except TemplateError as e:
+                        self.error(number, e)
+                    section = words[0][1:]
+                    if section == 'pre':
+                        continue
+                else:
+                    self.error(number, "unknown directive '%s'" % words[0])
+                literal.append(line + '\n')
+                continue
+            if words[:1] == ['%include']:
+                if len(words) != 2 or words[1] not in fragments:
+                    self.error(number, "%%include of '%s' cannot be inlined" % ' '.join(words[1:]))
+                self.flush(literal)
+                self.parts.append(('include', words[1], None, section))
+                continue
+            if section == 'post' and len(words) == 3 and words[0] == 'cp' and words[1] in fragments:
+                self.flush(literal)
+                self.parts.append(('copy', words[1], words[2], section))
+                continue
+            if section in (None, 'packages') and stripped and not stripped.startswith('#'):
+                block.append((number, stripped, section))
+            literal.append(line + '\n')
+        if section is not None:
+            self.error(number, '%%%s is not closed with %%end' % section)
+        self.flush(literal)
+
+        # Template commands and packages
+        for number, stripped, section in block:
+            try:
+                if section == 'packages':
+                    check_package(stripped)
+                    continue
+                command, mount = check_command(stripped)
+            except TemplateError as e:
+                self.error(number, e)
+            if command in SINGLE:
+                if command in self.singles:
+                    self.error(number, '%s given twice' % command)
+                self.singles.add(command)
+            if mount and mount != 'swap':
+                if mount in self.mounts:
+                    self.error(number, '%s mounted twice' % mount)
+                self.mounts.add(mount)
+
+    # Move pending literal lines into one literal part
+    def flush(self, literal):
+        if literal:
+            self.parts.append(''.join(literal))
+            del literal[:]
+
+    # Check a fragment inlined into a command or %packages section
+    def check_fragment(self, path, text, section):
+        key = (section, text)
+        result = self.memo.get(key)
+        if result is None:
+            try:
+                result = check_block(text, section)
+            except TemplateError as e:
+                raise TemplateError('%s: %s' % (path, e))
+            if len(self.memo) >= MEMO_SIZE:
+                self.memo.clear()
+            self.memo[key] = result
+        return result
+
+    # Flattened kickstart for a set of rendered fragments ({path: text};
+    # slots without a fragment are left out)
+    def render(self, fragments):
+        out = []
+        singles = set(self.singles)
+        mounts = set(self.mounts)
+        for part in self.parts:
+            if part.__class__ is not tuple:
+                out.append(part)
+                continue
+            kind, path, destination, section = part
+            text = fragments.get(path)
+            if text is None:
+                continue
+            text = text.rstrip('\n')
+            if kind == 'copy':
+                if HEREDOC in text.split('\n'):
+                    raise TemplateError("%s: a line reads '%s', which ends the here-document" % (path, HEREDOC))
+                out.append("cat << '%s' > %s\n%s\n%s\n" % (HEREDOC, destination, text, HEREDOC))
+                continue
+            if section in (None, 'packages'):
+                commands, used = self.check_fragment(path, text, section)
+                for command in commands:
+                    if command in singles:
+                        raise TemplateError('%s: %s is already given' % (path, command))
+                    singles.add(command)
+                for mount in used:
+                    if mount in mounts:
+                        raise TemplateError('%s: %s is already mounted' % (path, mount))
+                    mounts.add(mount)
+            out.append(text + '\n')
+        return ''.join(out)
@@ -0,0 +1,121 @@
+#!/usr/bin/python
+# LVM Sizing
+#
+# Computes the logical volume sizes anaconda will create from the
+# partitioning written by kickstart.render_stig_fix (/boot, one growing
+# physical volume and percentage-grown logical volumes), so the menu can
+# preview absolute sizes and the batch tools can validate layouts headless.
+#
+# Anaconda grows each volume from its --size minimum by --percent of the
+# space left in the volume group after all minimums, rounded down to whole
+# physical extents and capped by --maxsize.
+#
+# License: GPLv2
+
+import kickstart
+import profiles
+
+# Fixed overhead in MB
+ALIGNMENT = 1       # Partitions start on a 1MB boundary
+LUKS_HEADER = 2     # cryptsetup payload offset (4096 sectors)
+PE_START = 1        # LVM metadata ahead of the first extent
+PE_SIZE = kickstart.PE_SIZE // 1024
+
+
+class SizingError(Exception):
+    """Logical volumes do not fit the volume group."""
+
+
+# Size of the volume group in MB for the install disks (sizes in MB)
+#
+# /boot goes on the first disk; the growing pv.01 partition ends up on the
+# disk with the most free space, so only that disk backs the volume group.
+def volume_group(disks, encrypt=True):
+    if not disks:
+        return 0
+    free = [size - ALIGNMENT for size in disks]
+    free[0] -= kickstart.BOOT_SIZE
+    pv = max(free)
+    if encrypt:
+        pv -= LUKS_HEADER
+    pv -= PE_START
+    if pv < kickstart.PV_SIZE:
+        return 0
+    return pv // PE_SIZE * PE_SIZE
+
+
+class Sizer:
+    """Logical volume sizes for a volume group, updated one volume at a time."""
+
+    def __init__(self, vg, partitions=None):
+        self.vg = vg
+        self.percent = dict([(lv, 0) for lv in profiles.LOGVOLS])
+        self.used = 0
+        self.minimum = 0
+        for lv in profiles.LOGVOLS:
+            if lv not in kickstart.OPTIONAL_LOGVOLS:
+                self.minimum += kickstart.LOGVOLS[lv][3]
+        for lv, percent in (partitions or {}).items():
+            self.set(lv, percent)
+
+    # Whether a volume is created at the given percentage
+    def created(self, lv, percent):
+        return percent >= 1 or lv not in kickstart.OPTIONAL_LOGVOLS
+
+    # Change the percentage of one volume (running totals, no rescan)
+    def set(self, lv, percent):
+        percent = int(percent)
+        old = self.percent[lv]
+        if self.created(lv, old) != self.created(lv, percent):
+            if self.created(lv, percent):
+                self.minimum += kickstart.LOGVOLS[lv][3]
+            else:
+                self.minimum -= kickstart.LOGVOLS[lv][3]
+        self.used += percent - old
+        self.percent[lv] = percent
+
+    # Change the volume group size (disk selection or encryption changed)
+    def resize(self, vg):
+        self.vg = vg
+
+    # Space shared out by the percentages
+    def free(self):
+        return max(self.vg - self.minimum, 0)
+
+    # Size of one volume in MB (0 if it is not created)
+    def size(self, lv):
+        percent = self.percent[lv]
+        if not self.created(lv, percent):
+            return 0
+        minimum = kickstart.LOGVOLS[lv][3]
+        size = minimum + self.free() * percent // 100 // PE_SIZE * PE_SIZE
+        if lv == 'swap':
+            size = min(size, max(kickstart.SWAP_MAXSIZE, minimum))
+        return size
+
+    # Sizes of all volumes in MB
+    def sizes(self):
+        return dict([(lv, self.size(lv)) for lv in profiles.LOGVOLS])
+
+    # Space left unallocated in the volume group
+    def unallocated(self):
+        return self.vg - sum(self.sizes().values())
+
+    # Problems anaconda would fail on
+    def errors(self):
+        errors = []
+        if self.used > 100:
+            errors.append('LVM configuration is over 100%')
+        if self.minimum > self.vg:
+            errors.append('logical volumes need %dMB, the volume group has %dMB' % (self.minimum, self.vg))
+        return errors
+
+
+# Logical volume sizes in MB for a layout, raising SizingError if it does
+# not install
+def layout(disks, partitions, encrypt=True):
+    sizer = Sizer(volume_group(disks, encrypt), partitions)
+    errors = sizer.errors()
+    if errors:
+        raise SizingError(errors[0])
+    return sizer.sizes()
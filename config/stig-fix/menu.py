@@ -12,13 +12,14 @@
 # Version: 1.3
 # License: GPLv2
 
-import os,sys,re,crypt,random
+import os,sys,re
 try:
 	os.environ['DISPLAY']
-	import pygtk,gtk
+	import pygtk,gtk,gobject
 except:
 	print "Error: DISPLAY environment varible not set."
 	sys.exit(1)
+import disks,fragments,kickstart,lvm,profiles,pwhash,sysinfo
 
 # Class containing verification items
 class Verification:
@@ -67,13 +68,8 @@ class Verification:
 class Display_Menu:
         def __init__(self):
 
-		# Initalize Additional Configuration Files
-		f = open('/tmp/stig-fix-post','w')
-		f.write('')
-		f.close()
-		f = open('/tmp/stig-fix-packages','w')
-		f.write('')
-		f.close()
+		# Pending Kickstart Fragments (written once, when the menu exits)
+		self.fragments = fragments.FragmentWriter()
 
                 # Data Storage
 		self.data = {}
@@ -85,7 +81,7 @@ class Display_Menu:
                 self.window = gtk.Window()
                 self.window.set_title("Red Hat Enterprise Linux - DISA STIG Installation")
                 self.window.set_position(gtk.WIN_POS_CENTER)
-		self.window.connect("delete_event",gtk.main_quit)
+		self.window.connect("delete_event",self.quit)
 		self.display = gtk.gdk.display_get_default()
 		self.screen = self.display.get_default_screen()
 		self.hres = self.screen.get_width()
@@ -131,28 +127,19 @@ class Display_Menu:
                 self.hostname = gtk.Entry(100)
 		self.hostname.set_size_request(225,-1)
                 self.system.pack_start(self.hostname,False,True,0)
-		try:
-			if os.environ['HOSTNAME'] != '':
-				self.hostname.set_text(os.environ['HOSTNAME'])
-			else:
-				self.hostname.set_text('localhost.localdomain')
-		except:
-			self.hostname.set_text('localhost.localdomain')
+		# Site variant ISOs carry their own defaults (media-defaults)
+		self.defaults = profiles.media_defaults()
+		self.hostname.set_text(profiles.default_hostname(self.defaults))
 		self.label = gtk.Label("              System Profile: ")                
 		self.system.pack_start(self.label,False,True, 0)
                 self.system_profile = gtk.combo_box_new_text()
-		self.system_profile.append_text("Minimal Installation")
-		self.system_profile.append_text("User Workstation")
-		self.system_profile.append_text("Developer Workstation")
-		self.system_profile.append_text("RHN Satellite Server")
-		self.system_profile.append_text("Proprietary Database Server")
-		self.system_profile.append_text("RHEV-Attached KVM Server")
-		#self.system_profile.append_text("Standalone KVM Server")
-		#self.system_profile.append_text("Apache Web Server")
-		#self.system_profile.append_text("Tomcat Web Server")
-		#self.system_profile.append_text("PostgreSQL Database Server")
-		#self.system_profile.append_text("MySQL Database Server")
-		self.system_profile.set_active(0)
+		self.profile_ids = profiles.offered()
+		for profile_id in self.profile_ids:
+			self.system_profile.append_text(profiles.PROFILES[profile_id]['name'])
+		if self.defaults.get('profile') in self.profile_ids:
+			self.system_profile.set_active(self.profile_ids.index(self.defaults['profile']))
+		else:
+			self.system_profile.set_active(0)
 		self.system_profile.connect('changed',self.configure_system_profile)
                 self.system.pack_start(self.system_profile,False,True,0)
 		self.vbox.add(self.system)
@@ -162,14 +149,9 @@ class Display_Menu:
 		self.label = gtk.Label("                                                                               System Classification: ")
                 self.classification.pack_start(self.label,False,True, 0)
                 self.system_classification = gtk.combo_box_new_text()
-		self.system_classification.append_text("UNCLASSIFIED")
-		self.system_classification.append_text("UNCLASSIFIED//FOUO")
-		self.system_classification.append_text("CONFIDENTIAL")
-		self.system_classification.append_text("SECRET")
-		self.system_classification.append_text("TOP SECRET")
-		self.system_classification.append_text("TOP SECRET//SCI")
-		self.system_classification.append_text("TOP SECRET//SCI//NOFORN")
-		self.system_classification.set_active(0)
+		for classification in profiles.CLASSIFICATIONS:
+			self.system_classification.append_text(classification[0])
+		self.system_classification.set_active(self.defaults.get('classification', 0))
                 self.classification.pack_start(self.system_classification,False,True,0)
 		self.vbox.add(self.classification)
 
@@ -177,53 +159,32 @@ class Display_Menu:
                 self.label = gtk.Label("")
                 self.vbox.add(self.label)
 
-		# System Information
-		self.cpu_cores = 0
-		self.cpu_model = ''
-		self.cpu_arch = ''
-		self.system_memory = {}
-		with open('/proc/cpuinfo') as f:
-	    		for line in f:
-				if line.strip():
-		    			if line.rstrip('\n').startswith('model name'):
-						self.cpu_model = line.rstrip('\n').split(':')[1]
-						self.cpu_cores += 1
-            				elif line.rstrip('\n').startswith('flags') or line.rstrip('\n').startswith('Features'):
-                				if 'lm' in line.rstrip('\n').split():
-                   		 			self.cpu_arch = '64-bit'
-                				else:
-                   		 			self.cpu_arch = '32-bit'
-		f.close()
-
-		with open('/proc/meminfo') as f:
-			for line in f:
-				self.system_memory[line.split(':')[0]] = line.split(':')[1].strip()
-		f.close()
-						
+		# System Information (filled in by probe_hardware once the window is shown)
+		self.probed = False
                 self.cpu_information = gtk.HBox()
                 self.label = gtk.Label("   CPU Model: ")
                 self.cpu_information.pack_start(self.label,False,True, 0)
-                self.label = gtk.Label(" %s "%(self.cpu_model))
-                self.cpu_information.pack_start(self.label,False,True, 0)
+		self.cpu_model_label = gtk.Label(" ... ")
+		self.cpu_information.pack_start(self.cpu_model_label,False,True, 0)
                 self.label = gtk.Label("   CPU Threads: ")
                 self.cpu_information.pack_start(self.label,False,True, 0)
-                self.label = gtk.Label(" %d "%(self.cpu_cores))
-                self.cpu_information.pack_start(self.label,False,True, 0)
+		self.cpu_threads_label = gtk.Label(" ... ")
+		self.cpu_information.pack_start(self.cpu_threads_label,False,True, 0)
                 self.label = gtk.Label("   Architecure: ")
                 self.cpu_information.pack_start(self.label,False,True, 0)
-                self.label = gtk.Label(" %s "%(self.cpu_arch))
-                self.cpu_information.pack_start(self.label,False,True, 0)
+		self.cpu_arch_label = gtk.Label(" ... ")
+		self.cpu_information.pack_start(self.cpu_arch_label,False,True, 0)
 		self.vbox.add(self.cpu_information)
 
                 self.memory_information = gtk.HBox()
                 self.label = gtk.Label("   Total System Memory: ")
                 self.memory_information.pack_start(self.label,False,True, 0)
-                self.label = gtk.Label(" %s "%(self.system_memory['MemTotal']))
-                self.memory_information.pack_start(self.label,False,True, 0)
+		self.memory_total_label = gtk.Label(" ... ")
+		self.memory_information.pack_start(self.memory_total_label,False,True, 0)
                 self.label = gtk.Label("   Free Memory: ")
                 self.memory_information.pack_start(self.label,False,True, 0)
-                self.label = gtk.Label(" %s "%(self.system_memory['MemFree']))
-                self.memory_information.pack_start(self.label,False,True, 0)
+		self.memory_free_label = gtk.Label(" ... ")
+		self.memory_information.pack_start(self.memory_free_label,False,True, 0)
 		self.vbox.add(self.memory_information)
 
                 # Disk Partitioning Section
@@ -238,29 +199,14 @@ class Display_Menu:
                 # List Disks
                 self.disk_list = gtk.HBox()
 
-                self.disk_info = []
+		self.disks = []
+		self.disk_buttons = []
 		self.disk_total = 0
-                self.output = os.popen('list-harddrives')
-                for self.line in self.output:
-                        self.line = self.line.strip()
-			if not ('fd0' in self.line or 'sr0' in self.line):
-				self.disk_info.append(self.line.split(' '))
-               
+
 		self.label = gtk.Label("   Available Disks: ")
                 self.disk_list.pack_start(self.label, False, True, 0)
-
-		if len(self.disk_info) == 0:
-                        self.label = gtk.Label("No Drives Available.")
-                        self.disk_list.pack_start(self.label,False,True,0)
-                else:
-                        for i in range(len(self.disk_info)):
-				if len(self.disk_info) > 5:
-					exec("self.disk%d = gtk.CheckButton(self.disk_info[%d][0])"%(i,i))
-                               	else:
-					exec("self.disk%s = gtk.CheckButton(self.disk_info[%d][0] +' ('+ str(int(float(self.disk_info[%d][1]))/1024) +'Gb)')"%(i,i,i))
-                                exec("self.disk%d.set_active(True)"%(i))
-                                exec("self.disk_list.pack_start(self.disk%d, False, True, 0)"%(i))
-				self.disk_total += int(float(self.disk_info[i][1])/1024)
+		self.disk_status = gtk.Label("Detecting Drives...")
+		self.disk_list.pack_start(self.disk_status,False,True,0)
 
                 self.vbox.add(self.disk_list)
 
@@ -285,13 +231,13 @@ class Display_Menu:
 		self.core.pack_start(self.core_install, False, True, 0)
 		self.tim.pack_start(self.tim_install, False, True, 0)
 		self.tim_install.connect("clicked",self.choose)
+		self.encrypt_disk.connect('toggled',self.disk_changed)
+		# Logical volume sizes for the selected disks (updated per spin change)
+		self.sizer = lvm.Sizer(self.volume_group())
 		self.core_install.connect("clicked",self.choose)
 		self.vbox.add(self.encrypt)
 		self.vbox.add(self.core)
 		self.vbox.add(self.tim)
-		# Minimal Installation Warning
-		if self.disk_total < 8:
-			self.MessageBox(self.window,"<b>Recommended minimum of 8Gb disk space for a Minimal Install!</b>\n\n You have "+str(self.disk_total)+"Gb available.",gtk.MESSAGE_WARNING)
 
                 # Blank Label
                 self.label = gtk.Label("")
@@ -372,6 +318,7 @@ class Display_Menu:
                 self.label = gtk.Label("%")
                 self.partitioning3.pack_start(self.label,False,True,0)
 		self.vbox.add(self.partitioning3)
+		self.spin_logvols = dict([(getattr(self,lv+'_partition'),lv) for lv in profiles.LOGVOLS])
 
                 # Blank Label
                 self.label = gtk.Label("")
@@ -404,30 +351,11 @@ class Display_Menu:
                 self.window.add(self.vbox)
                 self.window.show_all()
 
-		## STOCK CONFIGURATIONS (Minimal Install)
-		# Post Configuration (nochroot)
-		f = open('/tmp/stig-fix-post-nochroot','w')
-		f.write('')
-		f.close()
-		# Post Configuration
-		f = open('/tmp/stig-fix-post','w')
-		# Run Hardening Script
-		f.write('/sbin/stig-fix -q &> /dev/null')
-		f.close()
-		# Package Selection
-		f = open('/tmp/stig-fix-packages','w')
-		f.write('-telnet-server\n')
-		f.write('-java-1.7.0-openjdk-devel\n')
-		f.write('-java-1.6.0-openjdk-devel\n')
-		f.write('gcc-c++\n')
-		f.write('dos2unix\n')
-		f.write('kernel-devel\n')
-		f.write('gcc\n')
-		f.write('dialog\n')
-		f.write('dmidecode\n')
-		f.write('aide\n')
-		f.close()
+		## STOCK CONFIGURATIONS (default profile of the media, else the first offered)
+		self.configure_system_profile(None)
 
+		# Probe CPU, memory and disks once the window has been drawn
+		gobject.idle_add(self.probe_hardware)
 
 
 	# Key Press Event
@@ -445,569 +373,99 @@ class Display_Menu:
 
 	# System Profile Configuration
 	def configure_system_profile(self,args):
+		profile_id = self.profile_ids[self.system_profile.get_active()]
+		profile = profiles.PROFILES[profile_id]
+
 		# Zero out partitioning
-		self.opt_partition.set_value(0)
-		self.www_partition.set_value(0)
-		self.swap_partition.set_value(0)
-		self.tmp_partition.set_value(0)
-		self.var_partition.set_value(0)
-		self.log_partition.set_value(0)
-		self.audit_partition.set_value(0)
-		self.home_partition.set_value(0)
-		self.root_partition.set_value(0)
-
-		################################################################################################################
-		# Minimal (Defualts to Kickstart)
-		################################################################################################################
-		if int(self.system_profile.get_active()) == 0:
-			# Partitioning
-			if self.disk_total < 8:
-				self.MessageBox(self.window,"<b>Recommended minimum of 8Gb disk space for a Minimal Install!</b>\n\n You have "+str(self.disk_total)+"Gb available.",gtk.MESSAGE_WARNING)
-			self.opt_partition.set_value(0)
-			self.www_partition.set_value(0)
-			self.swap_partition.set_value(0)
-			self.tmp_partition.set_value(10)
-			self.var_partition.set_value(10)
-			self.log_partition.set_value(10)
-			self.audit_partition.set_value(10)
-			self.home_partition.set_value(15)
-			self.root_partition.set_value(45)
-			# Post Configuration (nochroot)
-			f = open('/tmp/stig-fix-post-nochroot','w')
-			f.write('')
-			f.close()
-			# Post Configuration
-			f = open('/tmp/stig-fix-post','w')
-			# Run Hardening Script
-			f.write('/sbin/stig-fix -q &> /dev/null')
-			f.close()
-			# Package Selection
-			f = open('/tmp/stig-fix-packages','w')
-			f.write('-telnet-server\n')
-			f.write('-java-1.7.0-openjdk-devel\n')
-			f.write('-java-1.6.0-openjdk-devel\n')
-			f.write('gcc-c++\n')
-			f.write('dos2unix\n')
-			f.write('kernel-devel\n')
-			f.write('gcc\n')
-			f.write('dialog\n')
-			f.write('dmidecode\n')
-			f.write('aide\n')
-			f.close()
-
-		################################################################################################################
-		# User Workstation
-		################################################################################################################
-		if int(self.system_profile.get_active()) == 1:
-			# Partitioning
-			if self.disk_total < 12:
-				self.MessageBox(self.window,"<b>Recommended minimum of 12Gb disk space for a User Workstation!</b>\n\n You have "+str(self.disk_total)+"Gb available.",gtk.MESSAGE_WARNING)
-			self.opt_partition.set_value(0)
-			self.www_partition.set_value(0)
-			self.swap_partition.set_value(5)
-			self.tmp_partition.set_value(10)
-			self.var_partition.set_value(10)
-			self.log_partition.set_value(10)
-			self.audit_partition.set_value(10)
-			self.home_partition.set_value(10)
-			self.root_partition.set_value(45)
-			# Post Configuration (nochroot)
-			f = open('/tmp/stig-fix-post-nochroot','w')
-			f.write('cp /mnt/source/stig-fix/classification-banner.py /mnt/sysimage/usr/local/bin/\n')
-			f.write('chmod a+rx /mnt/sysimage/usr/local/bin/classification-banner.py\n')
-			f.close()
-			# Post Configuration
-			f = open('/tmp/stig-fix-post','w')
-			# Run Hardening Script
-			f.write('/sbin/stig-fix -q &> /dev/null')
-			f.close()
-			# Package Selection
-			f = open('/tmp/stig-fix-packages','w')
-			f.write('@additional-devel\n')
-			f.write('@basic-desktop\n')
-			f.write('@desktop-platform\n')
-			f.write('@directory-client\n')
-			f.write('@general-desktop\n')
-			f.write('@graphical-admin-tools\n')
-			f.write('@input-methods\n')
-			f.write('@internet-browser\n')
-			f.write('@legacy-x\n')
-			f.write('@x11\n')
-			f.write('pcsc*\n')
-			f.write('aide\n')
-			f.write('coolkey\n')
-			f.write('liberation-*\n')
-			f.write('dejavu-*\n')
-			f.write('krb5-auth-dialog\n')
-			f.write('seahorse-plugins\n')
-			f.write('vim-X11\n')
-			f.write('gcc-c++\n')
-			f.write('dos2unix\n')
-			f.write('kernel-devel\n')
-			f.write('gcc\n')
-			f.write('dialog\n')
-			f.write('dmidecode\n')
-			f.write('policycoreutils-gui\n')
-			f.write('system-config-lvm\n')
-			f.write('audit-viewer\n')
-			f.write('openmotif\n')
-			f.write('libXmu\n')
-			f.write('libXp\n')
-			f.write('openmotif22\n')
-			f.write('-samba-winbind\n')
-			f.write('-certmonger\n')
-			f.write('-gnome-applets\n')
-			f.write('-vino\n')
-			f.write('-ypbind\n')
-			f.write('-cheese\n')
-			f.write('-gnome-backgrounds\n')
-			f.write('-compiz-gnome\n')
-			f.write('-gnome-bluetooth\n')
-			f.write('-gnome-user-share\n')
-			f.write('-sound-juicer\n')
-			f.write('-rhythmbox\n')
-			f.write('-brasero\n')
-			f.write('-brasero-nautilus\n')
-			f.write('-brasero-libs\n')
-			f.write('-NetworkManager\n')
-			f.write('-NetworkManager-gnome\n')
-			f.write('-evolution-data-server\n')
-			f.write('-NetworkManager-glib\n')
-			f.write('-m17n-contrib-bengali\n')
-			f.write('-m17n-contrib-punjabi\n')
-			f.write('-ibus-sayura\n')
-			f.write('-m17n-contrib-assamese\n')
-			f.write('-m17n-contrib-oriya\n')
-			f.write('-m17n-contrib-kannada\n')
-			f.write('-m17n-contrib-telugu\n')
-			f.write('-m17n-contrib-hindi\n')
-			f.write('-m17n-contrib-maithili\n')
-			f.write('-m17n-db-sinhala\n')
-			f.write('-m17n-contrib-marathi\n')
-			f.write('-m17n-db-thai\n')
-			f.write('-ibus-pinyin\n')
-			f.write('-m17n-contrib-urdu\n')
-			f.write('-m17n-contrib-tamil\n')
-			f.write('-ibus-chewing\n')
-			f.write('-ibus-hangul\n')
-			f.write('-ibus-anthy\n')
-			f.write('-m17n-contrib-malayalam\n')
-			f.write('-m17n-contrib-gujarati\n')
-			f.write('-telnet-server\n')
-			f.write('-java-1.7.0-openjdk-devel\n')
-			f.write('-java-1.6.0-openjdk-devel\n')
-			f.close()
-
-
-		################################################################################################################
-		# Developer Workstation
-		################################################################################################################
-		if int(self.system_profile.get_active()) == 2:
-			# Partitioning
-			if self.disk_total < 16:
-				self.MessageBox(self.window,"<b>Recommended minimum 16Gb disk space for a Developer Workstation!</b>\n\n You have "+str(self.disk_total)+"Gb available.",gtk.MESSAGE_WARNING)
-			self.opt_partition.set_value(0)
-			self.www_partition.set_value(0)
-			self.swap_partition.set_value(0)
-			self.tmp_partition.set_value(10)
-			self.var_partition.set_value(10)
-			self.log_partition.set_value(10)
-			self.audit_partition.set_value(10)
-			self.home_partition.set_value(25)
-			self.root_partition.set_value(30)
-			# Post Configuration (nochroot)
-			f = open('/tmp/stig-fix-post-nochroot','w')
-			f.write('cp /mnt/source/stig-fix/classification-banner.py /mnt/sysimage/usr/local/bin/\n')
-			f.write('chmod a+rx /mnt/sysimage/usr/local/bin/classification-banner.py\n')
-			f.close()
-			# Post Configuration
-			f = open('/tmp/stig-fix-post','w')
-			# Run Hardening Script
-			f.write('/sbin/stig-fix -q &> /dev/null')
-			f.close()
-			# Package Selection
-			f = open('/tmp/stig-fix-packages','w')
-			f.write('@additional-devel\n')
-			f.write('@basic-desktop\n')
-			f.write('@desktop-platform\n')
-			f.write('@desktop-platform-devel\n')
-			f.write('@development\n')
-			f.write('@directory-client\n')
-			f.write('@eclipse\n')
-			f.write('@general-desktop\n')
-			f.write('@graphical-admin-tools\n')
-			f.write('@input-methods\n')
-			f.write('@internet-browser\n')
-			f.write('@legacy-x\n')
-			f.write('@server-platform-devel\n')
-			f.write('@x11\n')
-			f.write('pcsc*\n')
-			f.write('coolkey\n')
-			f.write('liberation-*\n')
-			f.write('dejavu-*\n')
-			f.write('libXinerama-devel\n')
-			f.write('openmotif-devel\n')
-			f.write('libXmu-devel\n')
-			f.write('xorg-x11-proto-devel\n')
-			f.write('startup-notification-devel\n')
-			f.write('libgnomeui-devel\n')
-			f.write('libbonobo-devel\n')
-			f.write('junit\n')
-			f.write('libXau-devel\n')
-			f.write('libgcrypt-devel\n')
-			f.write('popt-devel\n')
-			f.write('gnome-python2-desktop\n')
-			f.write('libdrm-devel\n')
-			f.write('libXrandr-devel\n')
-			f.write('libxslt-devel\n')
-			f.write('libglade2-devel\n')
-			f.write('gnutls-devel\n')
-			f.write('desktop-file-utils\n')
-			f.write('ant\n')
-			f.write('rpmdevtools\n')
-			f.write('jpackage-utils\n')
-			f.write('rpmlint\n')
-			f.write('krb5-auth-dialog\n')
-			f.write('seahorse-plugins\n')
-			f.write('vim-X11\n')
-			f.write('system-config-lvm\n')
-			f.write('audit-viewer\n')
-			f.write('openmotif\n')
-			f.write('libXmu\n')
-			f.write('libXp\n')
-			f.write('openmotif22\n')
-			f.write('-samba-winbind\n')
-			f.write('-certmonger\n')
-			f.write('-gnome-applets\n')
-			f.write('-vino\n')
-			f.write('-ypbind\n')
-			f.write('-cheese\n')
-			f.write('-gnome-backgrounds\n')
-			f.write('-compiz-gnome\n')
-			f.write('-gnome-bluetooth\n')
-			f.write('-gnome-user-share\n')
-			f.write('-sound-juicer\n')
-			f.write('-rhythmbox\n')
-			f.write('-brasero\n')
-			f.write('-brasero-nautilus\n')
-			f.write('-brasero-libs\n')
-			f.write('-NetworkManager\n')
-			f.write('-NetworkManager-gnome\n')
-			f.write('-evolution-data-server\n')
-			f.write('-evolution-data-server-devel\n')
-			f.write('-NetworkManager-glib\n')
-			f.write('-m17n-contrib-bengali\n')
-			f.write('-m17n-contrib-punjabi\n')
-			f.write('-ibus-sayura\n')
-			f.write('-m17n-contrib-assamese\n')
-			f.write('-m17n-contrib-oriya\n')
-			f.write('-m17n-contrib-kannada\n')
-			f.write('-m17n-contrib-telugu\n')
-			f.write('-m17n-contrib-hindi\n')
-			f.write('-m17n-contrib-maithili\n')
-			f.write('-m17n-db-sinhala\n')
-			f.write('-m17n-contrib-marathi\n')
-			f.write('-m17n-db-thai\n')
-			f.write('-ibus-pinyin\n')
-			f.write('-m17n-contrib-urdu\n')
-			f.write('-m17n-contrib-tamil\n')
-			f.write('-ibus-chewing\n')
-			f.write('-ibus-hangul\n')
-			f.write('-ibus-anthy\n')
-			f.write('-m17n-contrib-malayalam\n')
-			f.write('-m17n-contrib-gujarati\n')
-			f.close()
-
-
-		################################################################################################################
-		# RHN Satellite Install
-		################################################################################################################
-		if int(self.system_profile.get_active()) == 3:
-			# Partitioning
-			if self.disk_total < 120:
-				self.MessageBox(self.window,"<b>Recommended minimum of 120Gb disk space for a RHN Satelite Server!</b>\n\n You have "+str(self.disk_total)+"Gb available.",gtk.MESSAGE_WARNING)
-			self.opt_partition.set_value(0)
-			self.www_partition.set_value(3)
-			self.swap_partition.set_value(0)
-			self.tmp_partition.set_value(2)
-			self.var_partition.set_value(80)
-			self.log_partition.set_value(3)
-			self.audit_partition.set_value(3)
-			self.home_partition.set_value(3)
-			self.root_partition.set_value(5)
-			# Post Configuration (nochroot)
-			f = open('/tmp/stig-fix-post-nochroot','w')
-			f.write('')
-			f.close()
-			# Post Configuration
-			f = open('/tmp/stig-fix-post','w')
-			# Run Hardening Script
-			f.write('/sbin/stig-fix -q &> /dev/null')
-			# RHN Satellite requires umask of 022 for installation
-			f.write('sed -i "/umask/ c\umask 022" /etc/profile\n')
-			f.close()
-			# Package Selection
-			f = open('/tmp/stig-fix-packages','w')
-			f.write('')
-			f.close()
-
-
-		################################################################################################################
-		# Proprietary Database
-		################################################################################################################
-		if int(self.system_profile.get_active()) == 4:
-			# Partitioning
-			if self.disk_total < 60:
-				self.MessageBox(self.window,"<b>Recommended minimum of 60Gb disk space for a Proprietary Database Server!</b>\n\n You have "+str(self.disk_total)+"Gb available.",gtk.MESSAGE_WARNING)
-			self.www_partition.set_value(0)
-			self.home_partition.set_value(5)
-			self.swap_partition.set_value(0)
-			self.var_partition.set_value(7)
-			self.log_partition.set_value(10)
-			self.audit_partition.set_value(10)
-			self.tmp_partition.set_value(15)
-			self.opt_partition.set_value(30)
-			self.root_partition.set_value(18)
-			# Post Configuration (nochroot)
-			f = open('/tmp/stig-fix-post-nochroot','w')
-			f.write('cp /mnt/source/stig-fix/classification-banner.py /mnt/sysimage/usr/local/bin/\n')
-			f.write('chmod a+rx /mnt/sysimage/usr/local/bin/classification-banner.py\n')
-			f.close()
-			# Post Configuration
-			f = open('/tmp/stig-fix-post','w')
-			# Run Hardening Script
-			f.write('/sbin/stig-fix -q &> /dev/null')
-			f.close()
-			# Package Selection
-			f = open('/tmp/stig-fix-packages','w')
-			f.write('xorg-x11-server-Xorg\n')
-			f.write('xorg-x11-xinit\n')
-			f.write('xterm\n')
-			f.write('twm\n')
-			f.write('liberation-*\n')
-			f.write('dejavu-*\n')
-			f.write('openmotif\n')
-			f.write('libXmu\n')
-			f.write('libXp\n')
-			f.write('openmotif22\n')
-			f.write('kernel-devel\n')
-			f.write('kernel-headers\n')
-			f.write('gcc\n')
-			f.write('gcc-c++\n')
-			f.write('libgcc\n')
-			f.write('autoconf\n')
-			f.write('make\n')
-			f.write('libstdc++\n')
-			f.write('compat-libstdc++\n')
-			f.write('libaio\n')
-			f.write('libaio-devel\n')
-			f.write('unixODBC\n')
-			f.write('unixODBC-devel\n')
-			f.write('sysstat\n')
-			f.write('ksh\n')
-			f.close()
-
-
-		################################################################################################################
-		# RHEV-Attached KVM Server (HARDENING SCRIPT NOT RUN UNTIL AFTER CONNECTION TO RHEVM SERVER)
-		################################################################################################################
-		if int(self.system_profile.get_active()) == 5:
-			# WARNING - HARDENDING SCRIPT NOT RUN!
- 			self.MessageBox(self.window,"<b>THIS PROFILE WILL NOT RUN THE HARDENING SCRIPT!</b>\n\nPlease run the system hardening script after system has been attached to the RHEV-M server using the following command:\n\n   # stig-fix",gtk.MESSAGE_WARNING)
-			# Partitioning
-			if self.disk_total < 60:
-				self.MessageBox(self.window,"<b>Recommended minimum of 60Gb disk space for a RHEV-Attached KVM Server Install!</b>\n\n You have "+str(self.disk_total)+"Gb available.",gtk.MESSAGE_WARNING)
-			self.opt_partition.set_value(0)
-			self.www_partition.set_value(0)
-			self.swap_partition.set_value(0)
-			self.tmp_partition.set_value(10)
-			self.var_partition.set_value(10)
-			self.log_partition.set_value(10)
-			self.audit_partition.set_value(10)
-			self.home_partition.set_value(25)
-			self.root_partition.set_value(30)
-			# Post Configuration (nochroot)
-			f = open('/tmp/stig-fix-post-nochroot','w')
-			f.write('')
-			f.close()
-			# Post Configuration
-			f = open('/tmp/stig-fix-post','w')
-			# Allow 'root' to login via SSH - Required by RHEV-M
-			f.write('sed -i "/^PermitRootLogin/ c\PermitRootLogin yes" /etc/ssh/sshd_config')
-			f.close()
-			# Package Selection
-			f = open('/tmp/stig-fix-packages','w')
-			f.write('')
-			f.close()
-
-
-		################################################################################################################
-		# Standalone KVM Installation
-		################################################################################################################
-		if int(self.system_profile.get_active()) == 6:
-			# Partitioning
-			if self.disk_total < 60:
-				self.MessageBox(self.window,"<b>Recommended minimum 60Gb disk space for a RHEL/KVM Server!</b>\n\n You have "+str(self.disk_total)+"Gb available.",gtk.MESSAGE_WARNING)
-			self.opt_partition.set_value(0)
-			self.www_partition.set_value(0)
-			self.swap_partition.set_value(0)
-			self.tmp_partition.set_value(3)
-			self.var_partition.set_value(65)
-			self.log_partition.set_value(5)
-			self.audit_partition.set_value(5)
-			self.home_partition.set_value(5)
-			self.root_partition.set_value(15)
-			# Post Configuration (nochroot)
-			f = open('/tmp/stig-fix-post-nochroot','w')
-			f.write('')
-			f.close()
-			# Post Configuration
-			f = open('/tmp/stig-fix-post','w')
-			# Run Hardening Script
-			f.write('/sbin/stig-fix -q &> /dev/null')
-			f.close()
-			# Package Selection
-			f = open('/tmp/stig-fix-packages','w')
-			f.write('@storage-client-iscsi\n')
-			f.write('@virtualization\n')
-			f.write('@virtualization-client\n')
-			f.write('@virtualization-platform\n')
-			f.write('@virtualization-tools\n')
-			f.write('perl-Sys-Virt\n')
-			f.write('qemu-kvm-tools\n')
-			f.write('fence-virtd-libvirt\n')
-			f.write('virt-v2v\n')
-			f.write('libguestfs-tools\n')
-			f.close()
-
-
-		################################################################################################################
-		# Apache HTTP (Web Server)
-		################################################################################################################
-		if int(self.system_profile.get_active()) == 7:
-			# Partitioning
-			if self.disk_total < 10:
-				self.MessageBox(self.window,"<b>Recommended minimum of 10Gb disk space for a Web Server!</b>\n\n You have "+str(self.disk_total)+"Gb available.",gtk.MESSAGE_WARNING)
-			self.opt_partition.set_value(0)
-			self.www_partition.set_value(0)
-			self.swap_partition.set_value(0)
-			self.tmp_partition.set_value(10)
-			self.var_partition.set_value(10)
-			self.log_partition.set_value(10)
-			self.audit_partition.set_value(10)
-			self.home_partition.set_value(25)
-			self.root_partition.set_value(30)
-			# Post Configuration (nochroot)
-			f = open('/tmp/stig-fix-post-nochroot','w')
-			f.write('')
-			f.close()
-			# Post Configuration
-			f = open('/tmp/stig-fix-post','w')
-			# Run Hardening Script
-			f.write('/sbin/stig-fix -q &> /dev/null')
-			f.close()
-			# Package Selection
-			f = open('/tmp/stig-fix-packages','w')
-			f.write('httpd\n')
-			f.close()
-
-
-		################################################################################################################
-		# Apache Tomcat
-		################################################################################################################
-		if int(self.system_profile.get_active()) == 8:
-			# Partitioning
-			if self.disk_total < 10:
-				self.MessageBox(self.window,"<b>Recommended minimum of 10Gb disk space for an Apache Tomcat Web Server!</b>\n\n You have "+str(self.disk_total)+"Gb available.",gtk.MESSAGE_WARNING)
-			self.opt_partition.set_value(0)
-			self.www_partition.set_value(0)
-			self.swap_partition.set_value(0)
-			self.tmp_partition.set_value(10)
-			self.var_partition.set_value(10)
-			self.log_partition.set_value(10)
-			self.audit_partition.set_value(10)
-			self.home_partition.set_value(25)
-			self.root_partition.set_value(30)
-			# Post Configuration (nochroot)
-			f = open('/tmp/stig-fix-post-nochroot','w')
-			f.write('')
-			f.close()
-			# Post Configuration
-			f = open('/tmp/stig-fix-post','w')
-			# Run Hardening Script
-			f.write('/sbin/stig-fix -q &> /dev/null')
-			f.close()
-			# Package Selection
-			f = open('/tmp/stig-fix-packages','w')
-			f.write('tomcat6\n')
-			f.close()
-
-
-		################################################################################################################
-		# PostgreSQL Database
-		################################################################################################################
-		if int(self.system_profile.get_active()) == 9:
-			# Partitioning
-			if self.disk_total < 16:
-				self.MessageBox(self.window,"<b>Recommended minimum of 16Gb disk space for a PostgreSQL Database Server!</b>\n\n You have "+str(self.disk_total)+"Gb available.",gtk.MESSAGE_WARNING)
-			self.opt_partition.set_value(0)
-			self.www_partition.set_value(0)
-			self.swap_partition.set_value(0)
-			self.tmp_partition.set_value(10)
-			self.var_partition.set_value(10)
-			self.log_partition.set_value(10)
-			self.audit_partition.set_value(10)
-			self.home_partition.set_value(25)
-			self.root_partition.set_value(30)
-			# Post Configuration (nochroot)
-			f = open('/tmp/stig-fix-post-nochroot','w')
-			f.write('')
-			f.close()
-			# Post Configuration
-			f = open('/tmp/stig-fix-post','w')
-			# Run Hardening Script
-			f.write('/sbin/stig-fix -q &> /dev/null')
-			f.close()
-			# Package Selection
-			f = open('/tmp/stig-fix-packages','w')
-			f.write('postgresql\n')
-			f.close()
-
-
-		################################################################################################################
-		# MySQL Database
-		################################################################################################################
-		if int(self.system_profile.get_active()) == 10:
-			# Partitioning
-			if self.disk_total < 16:
-				self.MessageBox(self.window,"<b>Recommended minimum of 16Gb disk space for a MariaDB Database Server!</b>\n\n You have "+str(self.disk_total)+"Gb available.",gtk.MESSAGE_WARNING)
-			self.opt_partition.set_value(0)
-			self.www_partition.set_value(0)
-			self.swap_partition.set_value(0)
-			self.tmp_partition.set_value(10)
-			self.var_partition.set_value(10)
-			self.log_partition.set_value(10)
-			self.audit_partition.set_value(10)
-			self.home_partition.set_value(25)
-			self.root_partition.set_value(30)
-			# Post Configuration (nochroot)
-			f = open('/tmp/stig-fix-post-nochroot','w')
-			f.write('')
-			f.close()
-			# Post Configuration
-			f = open('/tmp/stig-fix-post','w')
-			# Run Hardening Script
-			f.write('/sbin/stig-fix -q &> /dev/null')
-			f.close()
-			# Package Selection
-			f = open('/tmp/stig-fix-packages','w')
-			f.write('mysql-server\n')
-			f.close()
-
-	# Check LVM Partitioning
+		for lv in profiles.LOGVOLS:
+			getattr(self,lv+'_partition').set_value(0)
+
+		# Profile Warning (e.g. hardening script not run)
+		if profile['notice']:
+			self.MessageBox(self.window,profile['notice'],gtk.MESSAGE_WARNING)
+
+		# Partitioning
+		self.disk_check(profile)
+		for lv in profiles.LOGVOLS:
+			getattr(self,lv+'_partition').set_value(profile['partitions'][lv])
+
+		# Post Configuration and Package Selection
+		self.set_profile(profile_id)
+
+	# Hardware Probe (fills in the CPU, memory and disk panels)
+	def probe_hardware(self):
+		if self.probed:
+			return False
+		self.probed = True
+
+		cpu_model,cpu_threads,cpu_arch = sysinfo.cpu_info()
+		self.cpu_model_label.set_text(" %s "%(cpu_model))
+		self.cpu_threads_label.set_text(" %d "%(cpu_threads))
+		self.cpu_arch_label.set_text(" %s "%(cpu_arch))
+		self.system_memory = sysinfo.memory_info()
+		self.memory_total_label.set_text(" %s "%(self.system_memory.get('MemTotal','')))
+		self.memory_free_label.set_text(" %s "%(self.system_memory.get('MemFree','')))
+
+		self.disks = disks.list_disks()
+		if len(self.disks) == 0:
+			self.disk_status.set_text("No Drives Available.")
+		else:
+			self.disk_list.remove(self.disk_status)
+			# Drives are laid out in rows of four so large storage nodes still fit
+			self.disk_table = gtk.Table((len(self.disks)+3)/4,4)
+			for i, disk in enumerate(self.disks):
+				label = '%s (%dGb'%(disk.name,disk.size/1024)
+				if disk.member:
+					label += ', '+disk.member.upper()
+				button = gtk.CheckButton(label+')')
+				button.set_active(True)
+				button.connect('toggled',self.disk_changed)
+				self.disk_table.attach(button,i%4,i%4+1,i/4,i/4+1)
+				self.disk_buttons.append(button)
+				self.disk_total += disk.size/1024
+			self.disk_list.pack_start(self.disk_table,False,True,0)
+			self.disk_list.show_all()
+
+		# Size the volume group and check the selected profile against the disks
+		self.disk_changed(None)
+		self.disk_check(profiles.PROFILES[self.profile_ids[self.system_profile.get_active()]])
+		return False
+
+	# Warn if the available disk space is below the profile's recommended minimum
+	def disk_check(self,profile):
+		if self.probed and self.disk_total < profile['min_disk']:
+			self.MessageBox(self.window,"<b>Recommended minimum of %dGb disk space for %s!</b>\n\n You have %dGb available."%(profile['min_disk'],profile['label'],self.disk_total),gtk.MESSAGE_WARNING)
+
+	# Stage Profile Post Configuration and Package Selection
+	def set_profile(self,profile_id):
+		config = kickstart.default_config(profile_id)
+		self.fragments.set(kickstart.POST_NOCHROOT,kickstart.render_post_nochroot(config))
+		self.fragments.set(kickstart.POST,kickstart.render_post(config))
+		self.fragments.set(kickstart.PACKAGES,kickstart.render_packages(config))
+
+	# Write Pending Fragments and Exit
+	def quit(self,*args):
+		self.fragments.flush()
+		gtk.main_quit()
+
+	# Volume Group Size (MB) of the Selected Disks
+	def volume_group(self):
+		sizes = [disk.size for disk, button in zip(self.disks,self.disk_buttons) if button.get_active()]
+		return lvm.volume_group(sizes,self.encrypt_disk.get_active())
+
+	# Disk Selection or Encryption Changed
+	def disk_changed(self,args):
+		self.sizer.resize(self.volume_group())
+		self.lvm_check(args)
+
+	# Check LVM Partitioning (and preview the resulting sizes)
 	def lvm_check(self,args):
-		self.lvm = self.root_partition.get_value_as_int()+self.home_partition.get_value_as_int()+self.tmp_partition.get_value_as_int()+self.var_partition.get_value_as_int()+self.log_partition.get_value_as_int()+self.audit_partition.get_value_as_int()+self.swap_partition.get_value_as_int()+self.www_partition.get_value_as_int()+self.opt_partition.get_value_as_int()
-		self.partition_used.set_label(str(self.lvm)+'%')
+		if args in self.spin_logvols:
+			self.sizer.set(self.spin_logvols[args],args.get_value_as_int())
+		self.lvm = self.sizer.used
+		for spin, lv in self.spin_logvols.items():
+			spin.set_tooltip_text('%s: %.1fGb'%(kickstart.LOGVOLS[lv][0],self.sizer.size(lv)/1024.0))
+		self.partition_used.set_label('%d%%   (%.1fGb volume group, %.1fGb unallocated)'%(self.lvm,self.sizer.vg/1024.0,max(self.sizer.unallocated(),0)/1024.0))
 		if int(self.lvm) > 100:
 			self.MessageBox(self.window,"<b>Verify that LVM configuration is not over 100%!</b>",gtk.MESSAGE_ERROR)
 			return False
@@ -1060,6 +518,9 @@ class Display_Menu:
         # Appply Configurations to Kickstart File
         def apply_configuration(self,args):
 
+		# Finish the hardware probe if the main loop has not run it yet
+		self.probe_hardware()
+
 		# Set system password
 		while True:
 			self.get_password(self.window)
@@ -1083,11 +544,11 @@ class Display_Menu:
 		# Check Install Disks	
 		self.install_disks = ""
 		self.ignore_disks = ""
-		for i in range(len(self.disk_info)):
-			if eval("self.disk%d.get_active()"%(i)) == True:
-				self.install_disks += self.disk_info[i][0]+","
+		for disk, button in zip(self.disks,self.disk_buttons):
+			if button.get_active() == True:
+				self.install_disks += disk.name+","
 			else:
-				self.ignore_disks += self.disk_info[i][0]+","
+				self.ignore_disks += disk.name+","
 		self.data["INSTALL_DRIVES"] = self.install_disks[:-1]
 		self.data["IGNORE_DRIVES"] = self.ignore_disks[:-1]
 		if self.install_disks == "":
@@ -1097,91 +558,33 @@ class Display_Menu:
 		# Check LVM Partitioning
 		if self.lvm_check(args) == False:
 			self.error = 1
+		elif self.sizer.errors():
+			self.MessageBox(self.window,"<b>%s!</b>"%self.sizer.errors()[0],gtk.MESSAGE_ERROR)
+			self.error = 1
 
 		# Write Kickstart File
 		if self.error == 0:
 
-			# Generate Salt
-			self.salt = ''
-			self.alphabet = '.abcdefghijklmnopqrstuvwxyz0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
-			for self.i in range(16):
-    				self.index = random.randrange(len(self.alphabet))
-    				self.salt = self.salt+self.alphabet[self.index]
-
-			# Encrypt Password
-			self.salt = '$6$'+self.salt
-			self.password = crypt.crypt(self.passwd,self.salt)
-
-			# Write Classification Banner Settings
-			if int(self.system_profile.get_active()) == 1 or int(self.system_profile.get_active()) == 2:
-				f = open('/tmp/classification-banner','w')
-				f.write('message = "'+str(self.system_classification.get_active_text())+'"\n')
-				if int(self.system_classification.get_active()) == 0 or int(self.system_classification.get_active()) == 1:
-					f.write('fgcolor = "#000000"\n')
-					f.write('bgcolor = "#00CC00"\n')
-				elif int(self.system_classification.get_active()) == 2:
-					f.write('fgcolor = "#000000"\n')
-					f.write('bgcolor = "#33FFFF"\n')
-				elif int(self.system_classification.get_active()) == 3:
-					f.write('fgcolor = "#FFFFFF"\n')
-					f.write('bgcolor = "#FF0000"\n')
-				elif int(self.system_classification.get_active()) == 4:
-					f.write('fgcolor = "#FFFFFF"\n')
-					f.write('bgcolor = "#FF9900"\n')
-				elif int(self.system_classification.get_active()) == 5:
-					f.write('fgcolor = "#000000"\n')
-					f.write('bgcolor = "#FFFF00"\n')
-				elif int(self.system_classification.get_active()) == 6:
-					f.write('fgcolor = "#000000"\n')
-					f.write('bgcolor = "#FFFF00"\n')
-				else:
-					f.write('fgcolor = "#000000"\n')
-					f.write('bgcolor = "#FFFFFF"\n')
-				f.close()
-
-			# Write Kickstart Configuration
-			f = open('/tmp/stig-fix','w')
-			if int(self.system_profile.get_active()) > 0:
-				f.write('network --device eth0 --bootproto dhcp --noipv6 --hostname '+self.hostname.get_text()+'\n')
-			else:
-				f.write('network --device eth0 --bootproto static --ip=192.168.1.101 --netmask=255.255.255.0 --onboot=on --noipv6 --hostname '+self.hostname.get_text()+'\n')
-			f.write('rootpw --iscrypted '+str(self.password)+'\n')
-			f.write('bootloader --location=mbr --driveorder='+str(self.data["INSTALL_DRIVES"])+' --append="crashkernel=auto rhgb quiet audit=1" --password='+str(self.password)+'\n')
-			#f.close()
-			# Write Kickstart Configuration (Hostname/Passwords)
-			#f = open('/tmp/partitioning','w')
-			if self.data["IGNORE_DRIVES"] != "":
-				f.write('ignoredisk --drives='+str(self.data["IGNORE_DRIVES"])+'\n')
-			f.write('zerombr\n')
-			f.write('clearpart --all --drives='+str(self.data["INSTALL_DRIVES"])+'\n')
-			if self.encrypt_disk.get_active() == True:
-				f.write('part pv.01 --grow --size=200 --encrypted --cipher=\'aes-xts-plain64\' --passphrase='+str(self.passwd)+'\n')
-			else:
-				f.write('part pv.01 --grow --size=200\n')
-			f.write('part /boot --fstype=ext4 --size=300\n')
-			f.write('volgroup vg1 --pesize=4096 pv.01\n')
-			f.write('logvol / --fstype=ext4 --name=lv_root --vgname=vg1 --size=2048 --grow --percent='+str(self.root_partition.get_value_as_int())+'\n')
-			f.write('logvol /home --fstype=ext4 --name=lv_home --vgname=vg1 --size=1024 --grow --percent='+str(self.home_partition.get_value_as_int())+'\n')
-			f.write('logvol /tmp --fstype=ext4 --name=lv_tmp --vgname=vg1 --size=512 --grow --percent='+str(self.tmp_partition.get_value_as_int())+'\n')
-			f.write('logvol /var --fstype=ext4 --name=lv_var --vgname=vg1 --size=512 --grow --percent='+str(self.var_partition.get_value_as_int())+'\n')
-			f.write('logvol /var/log --fstype=ext4 --name=lv_log --vgname=vg1 --size=512 --grow --percent='+str(self.log_partition.get_value_as_int())+'\n')
-			f.write('logvol /var/log/audit --fstype=ext4 --name=lv_audit --vgname=vg1 --size=512 --grow --percent='+str(self.audit_partition.get_value_as_int())+'\n')
-			if self.swap_partition.get_value_as_int() >= 1:
-				f.write('logvol swap --fstype=swap --name=lv_swap --vgname=vg1 --size=256 --maxsize=4096 --percent='+str(self.swap_partition.get_value_as_int())+'\n')
-			if self.opt_partition.get_value_as_int() >= 1:
-				f.write('logvol /opt --fstype=ext4 --name=lv_opt --vgname=vg1 --size=512 --grow --percent='+str(self.opt_partition.get_value_as_int())+'\n')
-			if self.www_partition.get_value_as_int() >= 1:
-				f.write('logvol /var/www --fstype=ext4 --name=lv_www --vgname=vg1 --size=512 --grow --percent='+str(self.www_partition.get_value_as_int())+'\n')
-			f.close()
-			f = open('/tmp/system-choice','w')
-			if self.tim_install.get_active() == True:
-				f.write('echo Installing tim config')
-				f.write('/opt/tim_config/install\n')
-			if self.core_install.get_active() == True:
-				f.write('echo Installing core config')
-				f.write('/opt/core_config/install\n')
-			f.close()
-			gtk.main_quit()
+			# Encrypt Password (highest SHA-512 rounds within the latency budget)
+			self.password = pwhash.crypt_password(self.passwd,pwhash.pick_rounds())
+
+			# Kickstart Configuration
+			self.config = kickstart.default_config(self.profile_ids[self.system_profile.get_active()])
+			self.config['hostname'] = self.hostname.get_text()
+			self.config['classification'] = int(self.system_classification.get_active())
+			self.config['password'] = str(self.password)
+			self.config['passphrase'] = str(self.passwd)
+			self.config['install_drives'] = self.data["INSTALL_DRIVES"].split(',')
+			self.config['ignore_drives'] = [d for d in self.data["IGNORE_DRIVES"].split(',') if d]
+			self.config['encrypt'] = self.encrypt_disk.get_active()
+			self.config['tim'] = self.tim_install.get_active()
+			self.config['core'] = self.core_install.get_active()
+			for lv in profiles.LOGVOLS:
+				self.config['partitions'][lv] = getattr(self,lv+'_partition').get_value_as_int()
+
+			# Write Kickstart Configuration and Classification Banner Settings
+			self.fragments.update(kickstart.render_fragments(self.config))
+			self.quit()
 			
 		
 # Executes Window Display
@@ -0,0 +1,491 @@
+#!/usr/bin/python
+# System Profiles
+#
+# Declarative table of the DISA STIG installation profiles presented by
+# menu.py. Kept free of any GTK imports so the batch kickstart tooling can
+# share the exact same definitions as the graphical installer.
+#
+# License: GPLv2
+
+import os
+
+# Profiles carried by a minimal ISO (written by 'createiso.sh -m', one
+# profile id or name per line); every enabled profile is offered without it
+MEDIA_PROFILES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'media-profiles')
+
+# Menu defaults baked into a site variant ISO (written by tools/variants.py,
+# 'profile=', 'classification=' and 'hostname=' lines)
+MEDIA_DEFAULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'media-defaults')
+
+# Hardening script run at the end of %post
+HARDENING = '/sbin/stig-fix -q &> /dev/null'
+
+# Copy the classification banner to the installed system (%post --nochroot)
+BANNER_INSTALL = [
+    'cp /mnt/source/stig-fix/classification-banner.py /mnt/sysimage/usr/local/bin/',
+    'chmod a+rx /mnt/sysimage/usr/local/bin/classification-banner.py',
+]
+
+# Banner plus its session client and the banner daemon service, for the
+# profiles that show the banner (%post --nochroot)
+BANNER_SERVICE_INSTALL = BANNER_INSTALL + [
+    'cp /mnt/source/stig-fix/classification-banner-client.py /mnt/sysimage/usr/local/bin/',
+    'chmod a+rx /mnt/sysimage/usr/local/bin/classification-banner-client.py',
+    'cp /mnt/source/stig-fix/classification-banner.init /mnt/sysimage/etc/rc.d/init.d/classification-banner',
+    'chmod 755 /mnt/sysimage/etc/rc.d/init.d/classification-banner',
+    'chroot /mnt/sysimage /sbin/chkconfig --add classification-banner',
+]
+
+# Logical volumes in the order they are written to the kickstart
+LOGVOLS = ('root', 'home', 'tmp', 'var', 'log', 'audit', 'swap', 'opt', 'www')
+
+# Packages removed from every graphical desktop profile
+DESKTOP_REMOVE = [
+    '-samba-winbind',
+    '-certmonger',
+    '-gnome-applets',
+    '-vino',
+    '-ypbind',
+    '-cheese',
+    '-gnome-backgrounds',
+    '-compiz-gnome',
+    '-gnome-bluetooth',
+    '-gnome-user-share',
+    '-sound-juicer',
+    '-rhythmbox',
+    '-brasero',
+    '-brasero-nautilus',
+    '-brasero-libs',
+    '-NetworkManager',
+    '-NetworkManager-gnome',
+    '-evolution-data-server',
+]
+
+# Input methods removed from every graphical desktop profile
+INPUT_METHODS_REMOVE = [
+    '-NetworkManager-glib',
+    '-m17n-contrib-bengali',
+    '-m17n-contrib-punjabi',
+    '-ibus-sayura',
+    '-m17n-contrib-assamese',
+    '-m17n-contrib-oriya',
+    '-m17n-contrib-kannada',
+    '-m17n-contrib-telugu',
+    '-m17n-contrib-hindi',
+    '-m17n-contrib-maithili',
+    '-m17n-db-sinhala',
+    '-m17n-contrib-marathi',
+    '-m17n-db-thai',
+    '-ibus-pinyin',
+    '-m17n-contrib-urdu',
+    '-m17n-contrib-tamil',
+    '-ibus-chewing',
+    '-ibus-hangul',
+    '-ibus-anthy',
+    '-m17n-contrib-malayalam',
+    '-m17n-contrib-gujarati',
+]
+
+
+# Build a partitioning table (percent of the LVM volume group per logvol)
+def partitions(root, home, tmp, var, log, audit, swap=0, opt=0, www=0):
+    return {'root': root, 'home': home, 'tmp': tmp, 'var': var, 'log': log,
+            'audit': audit, 'swap': swap, 'opt': opt, 'www': www}
+
+
+# Profile table - the list index is the profile id (System Profile combo box)
+#
+#   name          -- Label shown in the System Profile combo box
+#   label         -- Used in the minimum disk space warning
+#   min_disk      -- Recommended minimum disk space (Gb)
+#   enabled       -- Offered by the installer menu (see offered())
+#   network       -- 'static' or 'dhcp' network configuration
+#   banner        -- Write /etc/classification-banner for the system
+#   notice        -- Warning shown when the profile is selected
+#   partitions    -- Default LVM partitioning percentages
+#   post_nochroot -- Lines for /tmp/stig-fix-post-nochroot
+#   post          -- Lines for /tmp/stig-fix-post
+#   packages      -- Lines for /tmp/stig-fix-packages
+PROFILES = [
+    # Minimal (Defaults to Kickstart)
+    {
+        'name': 'Minimal Installation',
+        'label': 'a Minimal Install',
+        'min_disk': 8,
+        'enabled': True,
+        'network': 'static',
+        'banner': False,
+        'notice': None,
+        'partitions': partitions(45, 15, 10, 10, 10, 10),
+        'post_nochroot': [],
+        'post': [HARDENING],
+        'packages': [
+            '-telnet-server',
+            '-java-1.7.0-openjdk-devel',
+            '-java-1.6.0-openjdk-devel',
+            'gcc-c++',
+            'dos2unix',
+            'kernel-devel',
+            'gcc',
+            'dialog',
+            'dmidecode',
+            'aide',
+        ],
+    },
+    # User Workstation
+    {
+        'name': 'User Workstation',
+        'label': 'a User Workstation',
+        'min_disk': 12,
+        'enabled': True,
+        'network': 'dhcp',
+        'banner': True,
+        'notice': None,
+        'partitions': partitions(45, 10, 10, 10, 10, 10, swap=5),
+        'post_nochroot': BANNER_SERVICE_INSTALL,
+        'post': [HARDENING],
+        'packages': [
+            '@additional-devel',
+            '@basic-desktop',
+            '@desktop-platform',
+            '@directory-client',
+            '@general-desktop',
+            '@graphical-admin-tools',
+            '@input-methods',
+            '@internet-browser',
+            '@legacy-x',
+            '@x11',
+            'pcsc*',
+            'aide',
+            'coolkey',
+            'liberation-*',
+            'dejavu-*',
+            'krb5-auth-dialog',
+            'seahorse-plugins',
+            'vim-X11',
+            'gcc-c++',
+            'dos2unix',
+            'kernel-devel',
+            'gcc',
+            'dialog',
+            'dmidecode',
+            'policycoreutils-gui',
+            'system-config-lvm',
+            'audit-viewer',
+            'openmotif',
+            'libXmu',
+            'libXp',
+            'openmotif22',
+        ] + DESKTOP_REMOVE + INPUT_METHODS_REMOVE + [
+            '-telnet-server',
+            '-java-1.7.0-openjdk-devel',
+            '-java-1.6.0-openjdk-devel',
+        ],
+    },
+    # Developer Workstation
+    {
+        'name': 'Developer Workstation',
+        'label': 'a Developer Workstation',
+        'min_disk': 16,
+        'enabled': True,
+        'network': 'dhcp',
+        'banner': True,
+        'notice': None,
+        'partitions': partitions(30, 25, 10, 10, 10, 10),
+        'post_nochroot': BANNER_SERVICE_INSTALL,
+        'post': [HARDENING],
+        'packages': [
+            '@additional-devel',
+            '@basic-desktop',
+            '@desktop-platform',
+            '@desktop-platform-devel',
+            '@development',
+            '@directory-client',
+            '@eclipse',
+            '@general-desktop',
+            '@graphical-admin-tools',
+            '@input-methods',
+            '@internet-browser',
+            '@legacy-x',
+            '@server-platform-devel',
+            '@x11',
+            'pcsc*',
+            'coolkey',
+            'liberation-*',
+            'dejavu-*',
+            'libXinerama-devel',
+            'openmotif-devel',
+            'libXmu-devel',
+            'xorg-x11-proto-devel',
+            'startup-notification-devel',
+            'libgnomeui-devel',
+            'libbonobo-devel',
+            'junit',
+            'libXau-devel',
+            'libgcrypt-devel',
+            'popt-devel',
+            'gnome-python2-desktop',
+            'libdrm-devel',
+            'libXrandr-devel',
+            'libxslt-devel',
+            'libglade2-devel',
+            'gnutls-devel',
+            'desktop-file-utils',
+            'ant',
+            'rpmdevtools',
+            'jpackage-utils',
+            'rpmlint',
+            'krb5-auth-dialog',
+            'seahorse-plugins',
+            'vim-X11',
+            'system-config-lvm',
+            'audit-viewer',
+            'openmotif',
+            'libXmu',
+            'libXp',
+            'openmotif22',
+        ] + DESKTOP_REMOVE + ['-evolution-data-server-devel'] + INPUT_METHODS_REMOVE,
+    },
+    # RHN Satellite Install
+    {
+        'name': 'RHN Satellite Server',
+        'label': 'a RHN Satellite Server',
+        'min_disk': 120,
+        'enabled': True,
+        'network': 'dhcp',
+        'banner': False,
+        'notice': None,
+        'partitions': partitions(5, 3, 2, 80, 3, 3, www=3),
+        'post_nochroot': [],
+        'post': [
+            HARDENING,
+            # RHN Satellite requires umask of 022 for installation
+            'sed -i "/umask/ c\\umask 022" /etc/profile',
+        ],
+        'packages': [],
+    },
+    # Proprietary Database
+    {
+        'name': 'Proprietary Database Server',
+        'label': 'a Proprietary Database Server',
+        'min_disk': 60,
+        'enabled': True,
+        'network': 'dhcp',
+        'banner': False,
+        'notice': None,
+        'partitions': partitions(18, 5, 15, 7, 10, 10, opt=30),
+        'post_nochroot': BANNER_INSTALL,
+        'post': [HARDENING],
+        'packages': [
+            'xorg-x11-server-Xorg',
+            'xorg-x11-xinit',
+            'xterm',
+            'twm',
+            'liberation-*',
+            'dejavu-*',
+            'openmotif',
+            'libXmu',
+            'libXp',
+            'openmotif22',
+            'kernel-devel',
+            'kernel-headers',
+            'gcc',
+            'gcc-c++',
+            'libgcc',
+            'autoconf',
+            'make',
+            'libstdc++',
+            'compat-libstdc++',
+            'libaio',
+            'libaio-devel',
+            'unixODBC',
+            'unixODBC-devel',
+            'sysstat',
+            'ksh',
+        ],
+    },
+    # RHEV-Attached KVM Server (HARDENING SCRIPT NOT RUN UNTIL AFTER CONNECTION TO RHEVM SERVER)
+    {
+        'name': 'RHEV-Attached KVM Server',
+        'label': 'a RHEV-Attached KVM Server Install',
+        'min_disk': 60,
+        'enabled': True,
+        'network': 'dhcp',
+        'banner': False,
+        'notice': "<b>THIS PROFILE WILL NOT RUN THE HARDENING SCRIPT!</b>\n\nPlease run the system hardening script after system has been attached to the RHEV-M server using the following command:\n\n   # stig-fix",
+        'partitions': partitions(30, 25, 10, 10, 10, 10),
+        'post_nochroot': [],
+        # Allow 'root' to login via SSH - Required by RHEV-M
+        'post': ['sed -i "/^PermitRootLogin/ c\\PermitRootLogin yes" /etc/ssh/sshd_config'],
+        'packages': [],
+    },
+    # Standalone KVM Installation
+    {
+        'name': 'Standalone KVM Server',
+        'label': 'a RHEL/KVM Server',
+        'min_disk': 60,
+        'enabled': False,
+        'network': 'dhcp',
+        'banner': False,
+        'notice': None,
+        'partitions': partitions(15, 5, 3, 65, 5, 5),
+        'post_nochroot': [],
+        'post': [HARDENING],
+        'packages': [
+            '@storage-client-iscsi',
+            '@virtualization',
+            '@virtualization-client',
+            '@virtualization-platform',
+            '@virtualization-tools',
+            'perl-Sys-Virt',
+            'qemu-kvm-tools',
+            'fence-virtd-libvirt',
+            'virt-v2v',
+            'libguestfs-tools',
+        ],
+    },
+    # Apache HTTP (Web Server)
+    {
+        'name': 'Apache Web Server',
+        'label': 'a Web Server',
+        'min_disk': 10,
+        'enabled': False,
+        'network': 'dhcp',
+        'banner': False,
+        'notice': None,
+        'partitions': partitions(30, 25, 10, 10, 10, 10),
+        'post_nochroot': [],
+        'post': [HARDENING],
+        'packages': ['httpd'],
+    },
+    # Apache Tomcat
+    {
+        'name': 'Tomcat Web Server',
+        'label': 'an Apache Tomcat Web Server',
+        'min_disk': 10,
+        'enabled': False,
+        'network': 'dhcp',
+        'banner': False,
+        'notice': None,
+        'partitions': partitions(30, 25, 10, 10, 10, 10),
+        'post_nochroot': [],
+        'post': [HARDENING],
+        'packages': ['tomcat6'],
+    },
+    # PostgreSQL Database
+    {
+        'name': 'PostgreSQL Database Server',
+        'label': 'a PostgreSQL Database Server',
+        'min_disk': 16,
+        'enabled': False,
+        'network': 'dhcp',
+        'banner': False,
+        'notice': None,
+        'partitions': partitions(30, 25, 10, 10, 10, 10),
+        'post_nochroot': [],
+        'post': [HARDENING],
+        'packages': ['postgresql'],
+    },
+    # MySQL Database
+    {
+        'name': 'MySQL Database Server',
+        'label': 'a MariaDB Database Server',
+        'min_disk': 16,
+        'enabled': False,
+        'network': 'dhcp',
+        'banner': False,
+        'notice': None,
+        'partitions': partitions(30, 25, 10, 10, 10, 10),
+        'post_nochroot': [],
+        'post': [HARDENING],
+        'packages': ['mysql-server'],
+    },
+]
+
+# System Classifications (System Classification combo box order)
+CLASSIFICATIONS = [
+    # (message, fgcolor, bgcolor)
+    ('UNCLASSIFIED', '#000000', '#00CC00'),
+    ('UNCLASSIFIED//FOUO', '#000000', '#00CC00'),
+    ('CONFIDENTIAL', '#000000', '#33FFFF'),
+    ('SECRET', '#FFFFFF', '#FF0000'),
+    ('TOP SECRET', '#FFFFFF', '#FF9900'),
+    ('TOP SECRET//SCI', '#000000', '#FFFF00'),
+    ('TOP SECRET//SCI//NOFORN', '#000000', '#FFFF00'),
+]
+
+# Profile/classification lookup by (lower case) name
+PROFILE_IDS = dict([(p['name'].lower(), i) for i, p in enumerate(PROFILES)])
+CLASSIFICATION_IDS = dict([(c[0].lower(), i) for i, c in enumerate(CLASSIFICATIONS)])
+
+
+# Resolve a profile id, name or numeric string to a profile id
+def profile_id(value):
+    try:
+        index = int(value)
+    except (TypeError, ValueError):
+        index = PROFILE_IDS.get(str(value).strip().lower())
+        if index is None:
+            raise ValueError("unknown system profile '%s'" % value)
+    if index < 0 or index >= len(PROFILES):
+        raise ValueError("unknown system profile '%s'" % value)
+    return index
+
+
+# Resolve a classification id, message or numeric string to a classification id
+def classification_id(value):
+    try:
+        index = int(value)
+    except (TypeError, ValueError):
+        index = CLASSIFICATION_IDS.get(str(value).strip().lower())
+        if index is None:
+            raise ValueError("unknown classification '%s'" % value)
+    if index < 0 or index >= len(CLASSIFICATIONS):
+        raise ValueError("unknown classification '%s'" % value)
+    return index
+
+
+# Ids of the profiles offered by the installer menu, in combo box order
+def offered(path=MEDIA_PROFILES):
+    ids = [i for i, p in enumerate(PROFILES) if p['enabled']]
+    try:
+        f = open(path)
+    except IOError:
+        return ids
+    try:
+        listed = set([profile_id(line) for line in f if line.strip()])
+    finally:
+        f.close()
+    return [i for i in ids if i in listed]
+
+
+# Menu defaults of the media as {'profile': id, 'classification': id,
+# 'hostname': name}, with only the fields the media sets
+def media_defaults(path=MEDIA_DEFAULTS):
+    defaults = {}
+    try:
+        f = open(path)
+    except IOError:
+        return defaults
+    try:
+        for line in f:
+            key, sep, value = line.partition('=')
+            key = key.strip()
+            value = value.strip()
+            if not sep or not value:
+                continue
+            if key == 'profile':
+                defaults[key] = profile_id(value)
+            elif key == 'classification':
+                defaults[key] = classification_id(value)
+            elif key == 'hostname':
+                defaults[key] = value
+    finally:
+        f.close()
+    return defaults
+
+
+# Hostname the menus offer: the media default, else $HOSTNAME, else
+# localhost.localdomain
+def default_hostname(defaults):
+    return defaults.get('hostname') or os.environ.get('HOSTNAME') or 'localhost.localdomain'
@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# Password Hashing
+#
+# SHA-512 crypt ($6$rounds=N$salt$) for the rootpw and bootloader
+# passwords with a salt from os.urandom. The rounds can be fixed or picked
+# by a short benchmark as the highest cost that still hashes within a
+# latency budget on the machine doing the install.
+#
+#   pwhash.py --benchmark [--budget 0.5]
+#
+# License: GPLv2
+
+import os
+import sys
+import time
+import crypt
+import optparse
+
+SALT_CHARS = './0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+SALT_LENGTH = 16
+
+# glibc limits and default for SHA-512 crypt rounds
+MIN_ROUNDS = 1000
+MAX_ROUNDS = 999999999
+ROUNDS = 5000
+
+# Longest acceptable time (seconds) to hash a password at the menu dialog
+BUDGET = 0.5
+
+# Rounds hashed per benchmark sample
+SAMPLE_ROUNDS = 20000
+
+
+# Random salt (64 characters, so each urandom byte maps without bias)
+def make_salt(length=SALT_LENGTH):
+    return ''.join([SALT_CHARS[byte & 63] for byte in bytearray(os.urandom(length))])
+
+
+# Encrypt a password for rootpw/bootloader (SHA-512 crypt)
+def crypt_password(passwd, rounds=ROUNDS):
+    rounds = max(MIN_ROUNDS, min(MAX_ROUNDS, int(rounds)))
+    hashed = crypt.crypt(passwd, '$6$rounds=%d$%s$' % (rounds, make_salt()))
+    if not hashed or not hashed.startswith('$6$'):
+        raise ValueError('SHA-512 crypt is not supported by this system')
+    return hashed
+
+
+# Hashes per second at the given rounds
+def benchmark(rounds=SAMPLE_ROUNDS, seconds=0.2):
+    count = 0
+    start = time.time()
+    elapsed = 0
+    while elapsed < seconds or count == 0:
+        crypt_password('benchmark', rounds)
+        count += 1
+        elapsed = time.time() - start
+    return count / elapsed
+
+
+# Highest rounds (in steps of 1000) that hash within the latency budget
+def pick_rounds(budget=BUDGET, seconds=0.2):
+    per_round = 1.0 / (benchmark(SAMPLE_ROUNDS, seconds) * SAMPLE_ROUNDS)
+    rounds = int(budget / per_round) // 1000 * 1000
+    return max(ROUNDS, min(MAX_ROUNDS, rounds))
+
+
+# Resolve a rounds setting: a number, or 'auto' to benchmark
+def rounds_setting(value, budget=BUDGET):
+    if value is None or str(value).strip().lower() == 'auto':
+        return pick_rounds(budget)
+    rounds = int(value)
+    if rounds < MIN_ROUNDS or rounds > MAX_ROUNDS:
+        raise ValueError('rounds must be between %d and %d' % (MIN_ROUNDS, MAX_ROUNDS))
+    return rounds
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog --benchmark [--budget seconds]")
+    parser.add_option("--benchmark", action="store_true", default=False,
+        help="Measure hashing speed and suggest rounds")
+    parser.add_option("--budget", type="float", default=BUDGET,
+        help="Latency budget per hash in seconds (default: %s)" % BUDGET)
+    options, args = parser.parse_args()
+    if not options.benchmark:
+        parser.error("nothing to do")
+
+    rate = benchmark(ROUNDS, 0.5)
+    rounds = pick_rounds(options.budget, 0.5)
+    print("%.0f hashes/s at %d rounds" % (rate, ROUNDS))
+    print("rounds=%d (%.0f ms per hash, budget %.0f ms)" %
+        (rounds, rounds * 1000.0 / (rate * ROUNDS), options.budget * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/python
+# SCAP Results Digest
+#
+# Reduces the XCCDF (or ARF) results left in /root by each install to a
+# compact rule id -> result record, reading the file as a stream so memory
+# use does not grow with the report size, and merges the records of many
+# hosts into one SQLite index.
+#
+#   ssg-digest.py host-ssg-results.xml                 (print the record)
+#   ssg-digest.py -d fleet.db add *-ssg-results.xml
+#   ssg-digest.py -d fleet.db failing <rule id>
+#   ssg-digest.py -d fleet.db host <hostname>
+#   ssg-digest.py -d fleet.db summary
+#
+# License: GPLv2
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import optparse
+
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+# XCCDF rule results, stored by index
+RESULTS = ('pass', 'fail', 'error', 'unknown', 'notapplicable', 'notchecked',
+    'notselected', 'informational', 'fixed')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    profile TEXT,
+    scanned TEXT,
+    score REAL,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS rules (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    rule INTEGER NOT NULL,
+    result INTEGER NOT NULL,
+    host INTEGER NOT NULL,
+    PRIMARY KEY (rule, result, host)
+);
+CREATE INDEX IF NOT EXISTS results_host ON results (host);
+"""
+
+
+# Element name without its namespace
+def local(tag):
+    return tag[tag.rfind('}') + 1:]
+
+
+# Stream-parse a results file into a host record
+#
+# Only the (last) TestResult is kept; every other element is discarded as
+# soon as it has been parsed.
+def digest(path):
+    record = None
+    stack = []
+    context = ElementTree.iterparse(path, events=('start', 'end'))
+    for event, element in context:
+        if event == 'start':
+            stack.append(element)
+            if local(element.tag) == 'TestResult':
+                record = {'host': None, 'profile': None, 'scanned': element.get('end-time'),
+                    'score': None, 'source': path, 'results': {}}
+            continue
+        stack.pop()
+        name = local(element.tag)
+        if record is not None and name == 'rule-result':
+            for child in element:
+                if local(child.tag) == 'result':
+                    record['results'][element.get('idref')] = child.text
+        elif record is not None and name == 'target' and record['host'] is None:
+            record['host'] = element.text
+        elif record is not None and name == 'profile' and local(stack[-1].tag) == 'TestResult':
+            record['profile'] = element.get('idref')
+        elif record is not None and name == 'score' and record['score'] is None:
+            record['score'] = float(element.text)
+        if name not in ('result', 'target', 'profile', 'score') and stack:
+            # Drop finished subtrees (children of the parent are no longer needed)
+            stack[-1].remove(element)
+    if record is None:
+        raise ValueError('no TestResult found')
+    if not record['host']:
+        record['host'] = os.path.basename(path).split('-ssg-results')[0]
+    return record
+
+
+class Index:
+    """SQLite index of host records."""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.rules = dict(self.db.execute('SELECT name, id FROM rules').fetchall())
+
+    # Id of a rule, registering it if needed
+    def rule_id(self, name):
+        if name not in self.rules:
+            cursor = self.db.execute('INSERT INTO rules (name) VALUES (?)', (name,))
+            self.rules[name] = cursor.lastrowid
+        return self.rules[name]
+
+    # Add or replace a host record
+    def add(self, record):
+        db = self.db
+        row = db.execute('SELECT id FROM hosts WHERE name = ?', (record['host'],)).fetchone()
+        if row:
+            host = row[0]
+            db.execute('DELETE FROM results WHERE host = ?', (host,))
+            db.execute('UPDATE hosts SET profile = ?, scanned = ?, score = ?, source = ? WHERE id = ?',
+                (record['profile'], record['scanned'], record['score'], record['source'], host))
+        else:
+            host = db.execute('INSERT INTO hosts (name, profile, scanned, score, source) VALUES (?, ?, ?, ?, ?)',
+                (record['host'], record['profile'], record['scanned'], record['score'], record['source'])).lastrowid
+        rows = []
+        for rule, result in record['results'].items():
+            if result in RESULTS:
+                rows.append((self.rule_id(rule), RESULTS.index(result), host))
+        db.executemany('INSERT INTO results (rule, result, host) VALUES (?, ?, ?)', rows)
+
+    def commit(self):
+        self.db.commit()
+
+    # Hosts with the given result for a rule
+    def hosts(self, rule, result='fail'):
+        return [row[0] for row in self.db.execute(
+            'SELECT hosts.name FROM results JOIN rules ON rules.id = results.rule '
+            'JOIN hosts ON hosts.id = results.host WHERE rules.name = ? AND results.result = ? '
+            'ORDER BY hosts.name', (rule, RESULTS.index(result)))]
+
+    # Rule results of one host
+    def host(self, name):
+        return dict([(rule, RESULTS[result]) for rule, result in self.db.execute(
+            'SELECT rules.name, results.result FROM results JOIN rules ON rules.id = results.rule '
+            'JOIN hosts ON hosts.id = results.host WHERE hosts.name = ?', (name,))])
+
+    # Number of hosts per rule with the given result, most frequent first
+    def summary(self, result='fail'):
+        return self.db.execute(
+            'SELECT rules.name, COUNT(*) AS hosts FROM results JOIN rules ON rules.id = results.rule '
+            'WHERE results.result = ? GROUP BY results.rule ORDER BY hosts DESC, rules.name',
+            (RESULTS.index(result),)).fetchall()
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog results.xml\n"
+        "       %prog -d index.db add results.xml...\n"
+        "       %prog -d index.db failing|host|summary [rule id|hostname]")
+    parser.add_option("-d", "--database", help="SQLite fleet index")
+    parser.add_option("-r", "--result", default="fail", choices=RESULTS,
+        help="Result to query for (default: fail)")
+    options, args = parser.parse_args()
+    if not args:
+        parser.error("nothing to do")
+
+    if not options.database:
+        for path in args:
+            print(json.dumps(digest(path), sort_keys=True))
+        return
+
+    index = Index(options.database)
+    command = args[0]
+    start = time.time()
+    if command == 'add':
+        errors = 0
+        for path in args[1:]:
+            try:
+                index.add(digest(path))
+            except (ValueError, SyntaxError) as e:
+                errors += 1
+                sys.stderr.write("ERROR: %s: %s\n" % (path, e))
+        index.commit()
+        print("Indexed %d of %d results in %.2fs" % (len(args) - 1 - errors, len(args) - 1, time.time() - start))
+        if errors:
+            sys.exit(1)
+    elif command == 'failing' and len(args) == 2:
+        for host in index.hosts(args[1], options.result):
+            print(host)
+    elif command == 'host' and len(args) == 2:
+        for rule, result in sorted(index.host(args[1]).items()):
+            print("%-14s %s" % (result, rule))
+    elif command == 'summary':
+        for rule, hosts in index.summary(options.result):
+            print("%6d %s" % (hosts, rule))
+    else:
+        parser.error("unknown command '%s'" % ' '.join(args))
+
+
+if __name__ == "__main__":
+    main()
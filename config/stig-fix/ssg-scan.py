@@ -0,0 +1,378 @@
+#!/usr/bin/python
+# Parallel SCAP Baseline Scan
+#
+# Runs the SCAP Security Guide benchmark at the end of %post. The rules of
+# the benchmark are split (by rule group) into one shard profile per CPU,
+# each extending the STIG profile and deselecting the rules of the other
+# shards. The shards are evaluated by concurrent oscap processes and their
+# results merged into the single <hostname>-ssg-results.xml and .html
+# report a serial 'oscap xccdf eval' would produce.
+#
+#   ssg-scan.py [-j jobs] [-p profile] [-o /root]
+#
+# License: GPLv2
+
+import os
+import sys
+import time
+import shutil
+import socket
+import tempfile
+import optparse
+import subprocess
+import multiprocessing
+
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+# The Python tree builder, which can be made to keep comments
+import xml.etree.ElementTree as PythonElementTree
+
+OSCAP = '/usr/bin/oscap'
+CONTENT = '/usr/share/xml/scap/ssg/content'
+XCCDF = 'ssg-rhel6-xccdf.xml'
+CPE = 'ssg-rhel6-cpe-dictionary.xml'
+PROFILE = 'stig-rhel6-server-upstream'
+SHARD_PREFIX = 'stig-fix-shard-'
+SHARD = SHARD_PREFIX + '%d'
+
+# Default scoring model: results that count, and their score
+SCORES = {'pass': 100.0, 'fixed': 100.0, 'fail': 0.0, 'error': 0.0, 'unknown': 0.0}
+
+# Prefixes of the namespaces used next to XCCDF (ElementTree otherwise
+# writes ns0:, ns1:...)
+NAMESPACES = {
+    'xhtml': 'http://www.w3.org/1999/xhtml',
+    'dc': 'http://purl.org/dc/elements/1.1/',
+    'xsi': 'http://www.w3.org/2001/XMLSchema-instance',
+    'xlink': 'http://www.w3.org/1999/xlink',
+    'cpe-lang': 'http://cpe.mitre.org/language/2.0',
+}
+
+
+class CommentTreeBuilder(PythonElementTree.TreeBuilder):
+    """Tree builder that keeps the comments inside the root element."""
+
+    def __init__(self):
+        PythonElementTree.TreeBuilder.__init__(self)
+        self.depth = 0
+
+    def start(self, tag, attrib):
+        self.depth += 1
+        return PythonElementTree.TreeBuilder.start(self, tag, attrib)
+
+    def end(self, tag):
+        self.depth -= 1
+        return PythonElementTree.TreeBuilder.end(self, tag)
+
+    def comment(self, text):
+        if self.depth:
+            self.start(PythonElementTree.Comment, {})
+            self.data(text)
+            self.end(PythonElementTree.Comment)
+
+
+# Iterate over all descendants with a tag (Element.iter is Python 2.7+)
+def iterate(element, tag):
+    if hasattr(element, 'iter'):
+        return element.iter(tag)
+    return element.getiterator(tag)
+
+
+# Parse a document keeping its comments (the Python 2.6 parser does not
+# pass them on to the tree builder by itself)
+def parse_commented(path):
+    builder = CommentTreeBuilder()
+    parser = PythonElementTree.XMLParser(target=builder)
+    if sys.version_info < (2, 7):
+        parser._parser.CommentHandler = builder.comment
+    tree = PythonElementTree.ElementTree()
+    tree.parse(path, parser)
+    return tree
+
+
+# Register the namespace prefixes before writing a document whose root is
+# in the XCCDF namespace 'ns', which is written as the default namespace
+# (ElementTree 1.2 on Python 2.6 cannot write one and prefixes it 'xccdf')
+def register_namespaces(ns):
+    prefixes = sorted(NAMESPACES.items())
+    if ns:
+        prefixes.append(('', ns[1:-1]))
+    for prefix, uri in prefixes:
+        if hasattr(PythonElementTree, 'register_namespace'):
+            PythonElementTree.register_namespace(prefix, uri)
+        else:
+            PythonElementTree._namespace_map[uri] = prefix or 'xccdf'
+
+
+# XCCDF namespace of a benchmark root ('{uri}')
+def namespace(root):
+    if root.tag.startswith('{'):
+        return root.tag[:root.tag.index('}') + 1]
+    return ''
+
+
+# Rule ids selected by a profile (following 'extends')
+def profile_rules(root, ns, profile, rules):
+    profiles = dict([(p.get('id'), p) for p in root.findall(ns + 'Profile')])
+    chain = []
+    while profile in profiles and profile not in chain:
+        chain.insert(0, profile)
+        profile = profiles[profile].get('extends')
+    selected = set([rule for rule, default in rules if default])
+    for profile in chain:
+        for select in profiles[profile].findall(ns + 'select'):
+            if select.get('selected') in ('1', 'true'):
+                selected.add(select.get('idref'))
+            else:
+                selected.discard(select.get('idref'))
+    return selected
+
+
+# Split the benchmark rules into at most 'count' shards of similar size
+#
+# Rules are kept together with the other rules of their group (they tend to
+# share OVAL objects) and groups are dealt largest first to the lightest
+# shard.
+def shard_rules(root, ns, profile, count):
+    units = []
+    rules = []
+    for parent in [root] + list(iterate(root, ns + 'Group')):
+        unit = [(r.get('id'), r.get('selected', 'true') in ('1', 'true')) for r in parent.findall(ns + 'Rule')]
+        if unit:
+            units.append([rule for rule, default in unit])
+            rules.extend(unit)
+    selected = profile_rules(root, ns, profile, rules)
+    weighted = [(len([r for r in unit if r in selected]), unit) for unit in units]
+    weighted.sort(key=lambda item: -item[0])
+    shards = [[0, []] for i in range(max(1, min(count, len(units))))]
+    for weight, unit in weighted:
+        lightest = min(shards, key=lambda shard: shard[0])
+        lightest[0] += weight
+        lightest[1].extend(unit)
+    return [shard[1] for shard in shards if shard[0]], [rule for rule, default in rules]
+
+
+# Add one profile per shard that deselects every rule outside the shard
+def add_shard_profiles(root, ns, profile, shards, rules):
+    children = list(root)
+    position = len(children)
+    for i, child in enumerate(children):
+        if child.tag == ns + 'Profile':
+            position = i + 1
+        elif child.tag in (ns + 'Value', ns + 'Group', ns + 'Rule') and position == len(children):
+            position = i
+    for n, shard in enumerate(shards):
+        # Elements are made by the root, whichever ElementTree parsed it
+        element = root.makeelement(ns + 'Profile', {'id': SHARD % n, 'extends': profile})
+        title = element.makeelement(ns + 'title', {})
+        title.text = 'STIG FIX scan shard %d' % n
+        element.append(title)
+        keep = set(shard)
+        for rule in rules:
+            if rule not in keep:
+                element.append(element.makeelement(ns + 'select', {'idref': rule, 'selected': 'false'}))
+        root.insert(position + n, element)
+
+
+# Stage the benchmark with the shard profiles next to links to the rest of
+# the content (OVAL, OCIL and CPE files are referenced relatively)
+def stage_content(content, xccdf, profile, count, workdir):
+    tree = parse_commented(os.path.join(content, xccdf))
+    root = tree.getroot()
+    ns = namespace(root)
+    shards, rules = shard_rules(root, ns, profile, count)
+    add_shard_profiles(root, ns, profile, shards, rules)
+    for name in os.listdir(content):
+        if name != xccdf:
+            os.symlink(os.path.join(content, name), os.path.join(workdir, name))
+    register_namespaces(ns)
+    tree.write(os.path.join(workdir, xccdf), 'UTF-8')
+    return shards
+
+
+# Start an oscap evaluation of a profile of the staged benchmark
+def evaluate(workdir, xccdf, cpe, profile, results, log):
+    command = [OSCAP, 'xccdf', 'eval', '--profile', profile, '--results', results,
+        '--cpe', os.path.join(workdir, cpe), os.path.join(workdir, xccdf)]
+    return subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)
+
+
+# Evaluate the shards with up to 'jobs' concurrent oscap processes
+#
+# oscap exits 2 when rules fail; only other non-zero codes are errors.
+def run_shards(workdir, xccdf, cpe, count, jobs):
+    pending = list(range(count))
+    running = {}
+    failed = []
+    while pending or running:
+        while pending and len(running) < jobs:
+            n = pending.pop(0)
+            log = open(os.path.join(workdir, 'shard-%d.log' % n), 'w')
+            process = evaluate(workdir, xccdf, cpe, SHARD % n, os.path.join(workdir, 'shard-%d.xml' % n), log)
+            running[process] = (n, log)
+        pid, status = os.wait()
+        for process in list(running):
+            if process.pid == pid:
+                n, log = running.pop(process)
+                log.close()
+                code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -1
+                if code not in (0, 2):
+                    failed.append(n)
+    return failed
+
+
+# Default model score of a benchmark or group (None if nothing counted)
+def score(parent, ns, results):
+    total = 0.0
+    weights = 0.0
+    counted = False
+    for child in parent:
+        if child.tag == ns + 'Rule':
+            result = results.get(child.get('id'))
+            if result not in SCORES:
+                continue
+            value = SCORES[result]
+        elif child.tag == ns + 'Group':
+            value = score(child, ns, results)
+            if value is None:
+                continue
+        else:
+            continue
+        weight = float(child.get('weight', '1.0'))
+        total += value * weight
+        weights += weight
+        counted = True
+    if not counted:
+        return None
+    if weights == 0:
+        return 0.0
+    return total / weights
+
+
+# Results per rule of an XCCDF results document
+def read_results(path):
+    root = ElementTree.parse(path).getroot()
+    ns = namespace(root)
+    results = {}
+    for result in iterate(root, ns + 'rule-result'):
+        results[result.get('idref')] = result.findtext(ns + 'result')
+    return results
+
+
+# Merge the shard results (at least one) into one XCCDF results document
+def merge_results(workdir, shards, profile, output):
+    owner = {}
+    for n, shard in enumerate(shards):
+        for rule in shard:
+            owner[rule] = n
+    documents = []
+    for n in range(len(shards)):
+        documents.append(ElementTree.parse(os.path.join(workdir, 'shard-%d.xml' % n)))
+    root = documents[0].getroot()
+    ns = namespace(root)
+
+    # Per rule, the result of the shard that evaluated it
+    merged = {}
+    starts = []
+    ends = []
+    for n, document in enumerate(documents):
+        testresult = document.getroot().find(ns + 'TestResult')
+        if testresult.get('start-time'):
+            starts.append(testresult.get('start-time'))
+        if testresult.get('end-time'):
+            ends.append(testresult.get('end-time'))
+        for result in testresult.findall(ns + 'rule-result'):
+            rule = result.get('idref')
+            if owner.get(rule, n) == n or rule not in merged:
+                merged[rule] = result
+
+    # Rebuild the first shard's TestResult in benchmark rule order
+    for element in root.findall(ns + 'Profile'):
+        if element.get('id', '').startswith(SHARD_PREFIX):
+            root.remove(element)
+    testresult = root.find(ns + 'TestResult')
+    children = list(testresult)
+    first = None
+    for i, child in enumerate(children):
+        if child.tag in (ns + 'rule-result', ns + 'score'):
+            if first is None:
+                first = i
+            testresult.remove(child)
+    if first is None:
+        first = len(list(testresult))
+    rules = [rule.get('id') for rule in iterate(root, ns + 'Rule')]
+    position = first
+    results = {}
+    for rule in rules:
+        if rule in merged:
+            testresult.insert(position, merged[rule])
+            results[rule] = merged[rule].findtext(ns + 'result')
+            position += 1
+    value = score(root, ns, results)
+    element = ElementTree.Element(ns + 'score', {'system': 'urn:xccdf:scoring:default', 'maximum': '100'})
+    element.text = '%f' % (value or 0.0)
+    testresult.insert(position, element)
+    testresult.find(ns + 'profile').set('idref', profile)
+    if starts:
+        testresult.set('start-time', min(starts))
+    if ends:
+        testresult.set('end-time', max(ends))
+    register_namespaces(ns)
+    documents[0].write(output, 'UTF-8')
+    return results
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [options]")
+    parser.add_option("-j", "--jobs", type="int", default=multiprocessing.cpu_count(),
+        help="Concurrent oscap processes (default: number of CPUs)")
+    parser.add_option("-p", "--profile", default=PROFILE,
+        help="XCCDF profile (default: %s)" % PROFILE)
+    parser.add_option("-c", "--content", default=CONTENT,
+        help="SSG content directory (default: %s)" % CONTENT)
+    parser.add_option("-o", "--output", default="/root",
+        help="Directory for the results and report (default: /root)")
+    options, args = parser.parse_args()
+
+    prefix = os.path.join(options.output, socket.gethostname() + '-ssg-results')
+    start = time.time()
+    workdir = tempfile.mkdtemp(prefix='ssg-scan.')
+    try:
+        shards = stage_content(options.content, XCCDF, options.profile, options.jobs, workdir)
+        if not shards:
+            # The profile selects no rules: nothing to split or merge, one
+            # oscap run writes the results
+            log = open(os.path.join(workdir, 'eval.log'), 'w')
+            try:
+                code = evaluate(workdir, XCCDF, CPE, options.profile, prefix + '.xml', log).wait()
+            finally:
+                log.close()
+            if code not in (0, 2):
+                sys.stderr.write("ERROR: oscap failed:\n")
+                sys.stderr.write(open(os.path.join(workdir, 'eval.log')).read())
+                sys.exit(1)
+            results = read_results(prefix + '.xml')
+        else:
+            failed = run_shards(workdir, XCCDF, CPE, len(shards), options.jobs)
+            if failed:
+                for n in failed:
+                    sys.stderr.write("ERROR: oscap failed for shard %d:\n" % n)
+                    sys.stderr.write(open(os.path.join(workdir, 'shard-%d.log' % n)).read())
+                sys.exit(1)
+            results = merge_results(workdir, shards, options.profile, prefix + '.xml')
+    finally:
+        shutil.rmtree(workdir)
+    subprocess.call([OSCAP, 'xccdf', 'generate', 'report', '--output', prefix + '.html', prefix + '.xml'])
+
+    counts = {}
+    for result in results.values():
+        counts[result] = counts.get(result, 0) + 1
+    print("%s: %d rules in %d shards, %.0fs (%s)" % (prefix + '.xml', len(results), len(shards),
+        time.time() - start, ', '.join(['%s %d' % item for item in sorted(counts.items())])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# System Information
+#
+# Reads the CPU and memory summary shown by menu.py from /proc, in a single
+# pass over each file. Only the first 'flags' line is split: on hosts with
+# hundreds of threads it repeats, with hundreds of words, for every CPU.
+#
+# License: GPLv2
+
+
+# CPU model, thread count and architecture ('64-bit' or '32-bit')
+def cpu_info(path='/proc/cpuinfo'):
+    model = ''
+    threads = 0
+    arch = ''
+    f = open(path)
+    try:
+        for line in f:
+            key, sep, value = line.partition(':')
+            if not sep:
+                continue
+            key = key.strip()
+            if key == 'processor':
+                threads += 1
+            elif key == 'model name' and not model:
+                model = value.strip()
+            elif key in ('flags', 'Features') and not arch:
+                if 'lm' in value.split():
+                    arch = '64-bit'
+                else:
+                    arch = '32-bit'
+    finally:
+        f.close()
+    return model, threads, arch
+
+
+# /proc/meminfo as {field: 'value unit'}
+def memory_info(path='/proc/meminfo'):
+    memory = {}
+    f = open(path)
+    try:
+        for line in f:
+            key, sep, value = line.partition(':')
+            if sep:
+                memory[key] = value.strip()
+    finally:
+        f.close()
+    return memory
@@ -0,0 +1,280 @@
+#!/usr/bin/python
+# Text Mode Kickstart Menu
+#
+# newt (snack) front-end for serial console and IPMI SOL installs. It
+# offers the same profiles, disks, LVM percentages and passwords as the
+# graphical menu.py and writes the same kickstart fragments, without an X
+# server: stig-fix.cfg runs it instead of Xorg and menu.py when the
+# installer is booted with 'stigmenu=text'.
+#
+# Validation is shared with the batch tools (inventory.host_config), so a
+# layout the text menu accepts is one anaconda installs.
+#
+# License: GPLv2
+
+import sys
+
+try:
+    import snack
+except ImportError:
+    print("Error: the newt (snack) Python module is not available.")
+    sys.exit(1)
+
+import disks
+import fragments
+import inventory
+import kickstart
+import lvm
+import profiles
+import pwhash
+import sysinfo
+
+HELP = ("All LVM partitions need to take less than or equal to 100% of the "
+    "LVM Volume Group. Preview shows the size each volume will get.\n\n"
+    "The password is used for the root account and the disk encryption "
+    "(LUKS) passphrase. GRUB is installed with a randomly generated "
+    "password; use 'grubby' and 'grub-crypt' to change it.\n\n"
+    "To access root remotely via ssh create a user and add them to the "
+    "wheel and sshusers groups.\n\n"
+    "Minimum password length is 15 characters.")
+
+# Partition entries per row
+LOGVOL_COLUMNS = 3
+
+
+class TextMenu:
+    """Text mode STIG installation menu."""
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.fragments = fragments.FragmentWriter()
+        self.profile_ids = profiles.offered()
+        self.disks = disks.list_disks()
+        self.disk_total = sum([disk.size // 1024 for disk in self.disks])
+
+        self.form = snack.GridForm(screen, "Red Hat Enterprise Linux 6 - DISA STIG Installation", 1, 7)
+
+        # System information
+        model, threads, arch = sysinfo.cpu_info()
+        memory = sysinfo.memory_info()
+        self.form.add(snack.Label("%s (%d threads, %s), %s memory" %
+            (model[:36], threads, arch, memory.get('MemTotal', '?'))), 0, 0)
+
+        # Hostname and password
+        grid = snack.Grid(4, 2)
+        self.defaults = profiles.media_defaults()
+        self.hostname = snack.Entry(24, profiles.default_hostname(self.defaults))
+        self.password1 = snack.Entry(24, password=1)
+        self.password2 = snack.Entry(24, password=1)
+        grid.setField(snack.Label("Hostname: "), 0, 0, anchorLeft=1)
+        grid.setField(self.hostname, 1, 0, anchorLeft=1)
+        grid.setField(snack.Label("  Password: "), 2, 0, anchorLeft=1)
+        grid.setField(self.password1, 3, 0, anchorLeft=1)
+        grid.setField(snack.Label("  Verify: "), 2, 1, anchorLeft=1)
+        grid.setField(self.password2, 3, 1, anchorLeft=1)
+        self.form.add(grid, 0, 1, (0, 0, 0, 1), anchorLeft=1)
+
+        # Profile and classification
+        grid = snack.Grid(2, 2)
+        self.profile = snack.Listbox(3, scroll=1, width=30, border=1)
+        for profile_id in self.profile_ids:
+            self.profile.append(profiles.PROFILES[profile_id]['name'], profile_id)
+        if self.defaults.get('profile') in self.profile_ids:
+            self.profile.setCurrent(self.defaults['profile'])
+        self.profile.setCallback(self.profile_changed)
+        self.classification = snack.Listbox(3, scroll=1, width=28, border=1)
+        for i, classification in enumerate(profiles.CLASSIFICATIONS):
+            self.classification.append(classification[0], i)
+        self.classification.setCurrent(self.defaults.get('classification', 0))
+        grid.setField(snack.Label("System Profile"), 0, 0, anchorLeft=1)
+        grid.setField(snack.Label("System Classification"), 1, 0, (2, 0, 0, 0), anchorLeft=1)
+        grid.setField(self.profile, 0, 1, anchorLeft=1)
+        grid.setField(self.classification, 1, 1, (2, 0, 0, 0), anchorLeft=1)
+        self.form.add(grid, 0, 2, anchorLeft=1)
+
+        # Disks and options
+        grid = snack.Grid(2, 1)
+        if self.disks:
+            self.disk_tree = snack.CheckboxTree(min(len(self.disks), 3), scroll=len(self.disks) > 3, width=30)
+            for disk in self.disks:
+                label = '%s (%dGb' % (disk.name, disk.size // 1024)
+                if disk.member:
+                    label += ', ' + disk.member.upper()
+                self.disk_tree.append(label + ')', disk.name, selected=1)
+            grid.setField(self.disk_tree, 0, 0, anchorLeft=1, anchorTop=1)
+        else:
+            self.disk_tree = None
+            grid.setField(snack.Label("No Drives Available."), 0, 0, anchorLeft=1, anchorTop=1)
+        options = snack.Grid(1, 3)
+        self.encrypt = snack.Checkbox("Encrypt Drives with LUKS", 1)
+        self.core = snack.Checkbox("CORE")
+        self.tim = snack.Checkbox("TIM")
+        options.setField(self.encrypt, 0, 0, anchorLeft=1)
+        options.setField(self.core, 0, 1, anchorLeft=1)
+        options.setField(self.tim, 0, 2, anchorLeft=1)
+        grid.setField(options, 1, 0, (2, 0, 0, 0), anchorLeft=1, anchorTop=1)
+        self.form.add(grid, 0, 3, (0, 1, 0, 0), anchorLeft=1)
+
+        # LVM percentages
+        rows = (len(profiles.LOGVOLS) + LOGVOL_COLUMNS - 1) // LOGVOL_COLUMNS
+        grid = snack.Grid(LOGVOL_COLUMNS * 2, rows)
+        self.logvols = {}
+        for i, lv in enumerate(profiles.LOGVOLS):
+            self.logvols[lv] = snack.Entry(4)
+            column = i % LOGVOL_COLUMNS * 2
+            grid.setField(snack.Label("%14s %% " % kickstart.LOGVOLS[lv][0]), column, i // LOGVOL_COLUMNS, anchorLeft=1)
+            grid.setField(self.logvols[lv], column + 1, i // LOGVOL_COLUMNS, anchorLeft=1)
+        self.form.add(grid, 0, 4, (0, 1, 0, 0), anchorLeft=1)
+        self.usage = snack.Label(" " * 60)
+        self.form.add(self.usage, 0, 5, anchorLeft=1)
+
+        self.buttons = snack.ButtonBar(screen, (("Install", "install", "F12"),
+            ("Preview", "preview"), ("Help", "help", "F1")), compact=1)
+        self.form.add(self.buttons, 0, 6, (0, 1, 0, 0), growx=1)
+
+        # Stock configuration (default profile of the media, else the first
+        # offered)
+        self.profile_changed()
+
+    # Load the partitioning of the selected profile
+    def profile_changed(self):
+        profile = profiles.PROFILES[self.profile.current()]
+        for lv in profiles.LOGVOLS:
+            self.logvols[lv].set(str(profile['partitions'][lv]))
+        self.preview()
+
+    # Selected disk names
+    def selected_disks(self):
+        if self.disk_tree is None:
+            return []
+        return self.disk_tree.getSelection()
+
+    # Entered LVM percentages (None for entries that are not numbers)
+    def partitions(self):
+        partitions = {}
+        for lv in profiles.LOGVOLS:
+            try:
+                partitions[lv] = int(self.logvols[lv].value().strip() or 0)
+            except ValueError:
+                partitions[lv] = None
+        return partitions
+
+    # Sizer for the entered layout (None if a percentage is not a number)
+    def sizer(self):
+        partitions = self.partitions()
+        if None in partitions.values():
+            return None
+        selected = self.selected_disks()
+        sizes = [disk.size for disk in self.disks if disk.name in selected]
+        return lvm.Sizer(lvm.volume_group(sizes, self.encrypt.selected()), partitions)
+
+    # Update the usage line
+    def preview(self):
+        sizer = self.sizer()
+        if sizer is None:
+            self.usage.setText("Currently Used: invalid percentage")
+        else:
+            self.usage.setText("Currently Used: %d%%   (%.1fGb volume group, %.1fGb unallocated)" %
+                (sizer.used, sizer.vg / 1024.0, max(sizer.unallocated(), 0) / 1024.0))
+        return sizer
+
+    # Show the size of each logical volume
+    def show_sizes(self):
+        sizer = self.preview()
+        if sizer is None:
+            self.message("Error", "LVM percentages must be numbers.")
+            return
+        text = ''
+        for lv in profiles.LOGVOLS:
+            size = sizer.size(lv)
+            if size:
+                text += "%-16s %8.1fGb\n" % (kickstart.LOGVOLS[lv][0], size / 1024.0)
+        for error in sizer.errors():
+            text += "\n%s!" % error
+        self.message("Logical Volumes", text)
+
+    # Message window
+    def message(self, title, text):
+        snack.ButtonChoiceWindow(self.screen, title, text, ["Ok"], width=60)
+
+    # Profile notice and minimum disk warnings (False to go back)
+    def confirm(self, profile):
+        warnings = []
+        if profile['notice']:
+            warnings.append(profile['notice'])
+        if self.disk_total < profile['min_disk']:
+            warnings.append("Recommended minimum of %dGb disk space for %s! You have %dGb available." %
+                (profile['min_disk'], profile['label'], self.disk_total))
+        for warning in warnings:
+            warning = warning.replace('<b>', '').replace('</b>', '')
+            if snack.ButtonChoiceWindow(self.screen, "Warning", warning, ["Continue", "Back"], width=60) == "back":
+                return False
+        return True
+
+    # Validate the form and render the kickstart configuration (None if
+    # the form needs changes)
+    def configure(self):
+        if self.password1.value() != self.password2.value():
+            self.message("Error", "Passwords Don't Match!")
+            return None
+        partitions = self.partitions()
+        if None in partitions.values():
+            self.message("Error", "LVM percentages must be numbers.")
+            return None
+        profile_id = self.profile.current()
+        if not self.confirm(profiles.PROFILES[profile_id]):
+            return None
+
+        selected = self.selected_disks()
+        record = {
+            'hostname': self.hostname.value().strip(),
+            'profile': profile_id,
+            'classification': self.classification.current(),
+            'disks': [disk.name for disk in self.disks if disk.name in selected],
+            'ignore_disks': [disk.name for disk in self.disks if disk.name not in selected],
+            'disk_sizes': ['%.4f' % (disk.size / 1024.0) for disk in self.disks if disk.name in selected],
+            'luks': self.encrypt.selected(),
+            'tim': self.tim.selected(),
+            'core': self.core.selected(),
+        }
+        record.update(partitions)
+        passwd = self.password1.value()
+        try:
+            config = inventory.host_config(record, passwd, pwhash.pick_rounds())
+        except inventory.InventoryError as e:
+            self.message("Error", str(e).replace(record['hostname'] + ': ', '', 1))
+            return None
+        config['passphrase'] = passwd
+        return config
+
+    # Run the form until a valid configuration is entered, then write the
+    # kickstart fragments
+    def run(self):
+        while True:
+            button = self.buttons.buttonPressed(self.form.run())
+            self.preview()
+            if button == "help":
+                self.message("Install Help", HELP)
+            elif button == "preview":
+                self.show_sizes()
+            elif button == "install":
+                config = self.configure()
+                if config is not None:
+                    break
+        self.screen.popWindow()
+        self.fragments.update(kickstart.render_fragments(config))
+        return self.fragments.flush()
+
+
+# Main Program
+def main():
+    screen = snack.SnackScreen()
+    screen.pushHelpLine(" <Tab>/<Alt-Tab> between elements | <Space> selects | <F1> help | <F12> install")
+    try:
+        TextMenu(screen).run()
+    finally:
+        screen.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -16,14 +16,24 @@
 
 # GLOBAL VARIABLES
 DIR=`pwd`
+STAGE=$DIR/.staging
 
 # USAGE STATEMENT
 function usage() {
 cat << EOF
-usage: $0 rhel-server-6.5-x86_64-dvd.iso
+usage: $0 [-s staging-dir] [-c] [-u] [-m [-p profiles]] [-V variants [-j jobs]] rhel-server-6.5-x86_64-dvd.iso
 
 DISA STIG Installer Kickstart RHEL 6.4+
 
+  -s dir  Staging cache directory (default: .staging)
+  -c      Clear the staging cache before building
+  -u      Extract the DVD instead of loop mounting it (default when not root;
+          needs the DVD size free in the staging directory, less with -m)
+  -m      Minimal ISO: only carry the packages the profiles need
+  -p ids  Comma separated profile ids for -m (default: all enabled)
+  -V file Build one ISO per site variant (CSV/JSON, see tools/variants.py)
+  -j jobs Concurrent variant builds (default: sized to the CPUs and disk)
+
 Customizes a RHEL 6.4+ x86_64 Server or Workstation DVD to install
 with the following hardening:
 
@@ -34,12 +44,33 @@ with the following hardening:
 EOF
 }
 
-while getopts ":vhq" OPTION; do
+while getopts ":vhqcums:p:V:j:" OPTION; do
 	case $OPTION in
 		h)
 			usage
 			exit 0
 			;;
+		c)
+			CLEAN=1
+			;;
+		u)
+			EXTRACT=1
+			;;
+		s)
+			STAGE=`readlink -f $OPTARG`
+			;;
+		m)
+			MINIMAL=1
+			;;
+		p)
+			PROFILES=$OPTARG
+			;;
+		V)
+			VARIANTS=`readlink -f $OPTARG`
+			;;
+		j)
+			JOBS=$OPTARG
+			;;
 		?)
 			echo "ERROR: Invalid Option Provided!"
 			echo
@@ -48,64 +79,209 @@ while getopts ":vhq" OPTION; do
 			;;
 	esac
 done
+shift $((OPTIND-1))
 
-# Check for root user
-if [[ $EUID -ne 0 ]]; then
-	if [ -z "$QUIET" ]; then
-		echo
-		tput setaf 1;echo -e "\033[1mPlease re-run this script as root!\033[0m";tput sgr0
-	fi
+# Determine if DVD is Bootable
+#
+# The El Torito boot record and the RHEL 6.4+ release in .discinfo are read
+# straight from the image (tools/isoread.py), no mount is needed
+/usr/bin/python $DIR/tools/isoread.py -c 6.4 $1
+if [[ $? -ne 0 ]]; then
 	exit 1
 fi
 
-# Determine if DVD is Bootable
-`file $1 | grep 9660 | grep -q bootable`
-if [[ $? -eq 0 ]]; then
+# Build Cache
+#
+# Every layer below (staged isolinux tree, profile package check, minimal
+# repository, final image) is keyed by the SHA-256 of its inputs: the
+# source DVD, config/ (kickstart, RPMs, Firefox configuration, isolinux and
+# GRUB menus), the build tools and the options. A layer is only rebuilt when
+# its key changes, and an unchanged input set links the previous image back
+# out without remastering (see tools/buildcache.py).
+#
+# Only the isolinux directory is staged: mkisofs patches isolinux.bin in
+# place (-boot-info-table) and the kickstart menus are overlaid on it. The
+# rest of the DVD is grafted straight from the source tree (mounted, or
+# extracted once), so a rebuild never copies the package tree.
+if [[ -n "$CLEAN" ]]; then
+	rm -rf $STAGE
+fi
+mkdir -p $STAGE
+CACHE="/usr/bin/python $DIR/tools/buildcache.py -d $STAGE"
+$CACHE begin
+echo -n "Hashing Build Inputs..."
+SOURCE=`$CACHE key source $1` || exit 1
+SELECTION="minimal=$MINIMAL profiles=$PROFILES"
+ISOKEY=`$CACHE key iso -s $SOURCE -s "$SELECTION" $DIR/config $DIR/createiso.sh $DIR/tools/pkgresolve.py $DIR/tools/isomd5.py $DIR/tools/isoread.py` || exit 1
+echo " Done."
+if [[ -z "$VARIANTS" ]] && $CACHE check iso $ISOKEY -o $DIR; then
+	$CACHE report
+	echo "DVD Unchanged. [rhel-stig-fix.iso]"
+	exit 0
+fi
+
+# Source Tree
+#
+# As root the DVD is loop mounted on a private mount point (so builds can
+# run side by side). Otherwise, or with -u, it is extracted into the
+# staging directory without privileges; files kept from earlier runs of the
+# same DVD are not written again, and a minimal ISO only extracts the
+# packages it carries. mkisofs reads every grafted file, so a full ISO
+# needs the whole tree (about the DVD size) in the staging directory;
+# isoread.py checks the free space first and reports what it wrote.
+if [[ $EUID -eq 0 && -z "$EXTRACT" ]]; then
 	echo "Mounting RHEL DVD Image..."
-	mkdir -p /rhel
-	mkdir $DIR/rhel-dvd
-	mount -o loop $1 /rhel
+	MNT=`mktemp -d /tmp/rhel-dvd.XXXXXX`
+	if ! mount -o loop $1 $MNT; then
+		echo "ERROR: Mounting RHEL DVD Image failed."
+		rmdir $MNT
+		exit 1
+	fi
+	trap "umount $MNT; rmdir $MNT" EXIT
 	echo "Done."
-	# Tests DVD for RHEL 6.4+
-	if [[ $(grep "Red Hat" /rhel/.discinfo | awk '{ print $5 }' | awk -F '.' '{ print $1 }') -ne 6 ]]; then
-		echo "ERROR: Image is not RHEL 6.4+"
-		umount /rhel
-		rm -rf /rhel
+else
+	echo "Extracting RHEL DVD Image..."
+	MNT=$STAGE/dvd
+	if ! $CACHE check dvd $SOURCE; then
+		rm -rf $MNT
+	fi
+	if [[ -n "$MINIMAL" ]]; then
+		/usr/bin/python $DIR/tools/isoread.py -x $MNT -e Packages $1
+	else
+		/usr/bin/python $DIR/tools/isoread.py -x $MNT $1
+	fi
+	if [[ $? -ne 0 ]]; then
+		echo "ERROR: Extracting RHEL DVD Image failed."
 		exit 1
 	fi
-	if [[ $(grep "Red Hat" /rhel/.discinfo | awk '{ print $5 }' | awk -F '.' '{ print $2 }') -lt 4 ]]; then
-		echo "ERROR: Image is not RHEL 6.4+"
-		umount /rhel
-		rm -rf /rhel
+	$CACHE store dvd $SOURCE
+	echo "Done."
+fi
+
+KEY=`$CACHE key isolinux -s $SOURCE $DIR/config/isolinux` || exit 1
+if ! $CACHE check isolinux $KEY || [[ ! -d $STAGE/isolinux ]]; then
+	echo -n "Staging RHEL DVD Boot Image..."
+	rm -rf $STAGE/isolinux
+	cp -a $MNT/isolinux $STAGE/
+	cp -a $DIR/config/isolinux/* $STAGE/isolinux/
+	chmod -R u+w $STAGE/isolinux
+	$CACHE store isolinux $KEY
+	echo " Done."
+fi
+
+# Resolve every enabled profile's package selection against the DVD
+# repodata so typos and missing packages show up now, not during install
+KEY=`$CACHE key resolve -s $SOURCE -s "$SELECTION" $DIR/config/stig-fix/stig-fix.cfg $DIR/config/stig-fix/profiles.py $DIR/tools/pkgresolve.py` || exit 1
+if ! $CACHE check resolve $KEY || [[ -n "$MINIMAL" && ! -f $STAGE/minimal.list ]]; then
+	echo "Checking Profile Package Selections..."
+	RESOLVE="-r $MNT -i $STAGE/pkgindex"
+	if [[ -n "$MINIMAL" ]]; then
+		for PROFILE in `echo $PROFILES | tr ',' ' '`; do
+			RESOLVE="$RESOLVE -p $PROFILE"
+		done
+		RESOLVE="$RESOLVE --strict -c $STAGE/minimal.list"
+	fi
+	/usr/bin/python $DIR/tools/pkgresolve.py $RESOLVE
+	if [[ $? -ne 0 ]]; then
+		echo "ERROR: Resolving profile packages failed."
+		exit 1
+	fi
+	$CACHE store resolve $KEY
+fi
+if [[ -n "$MINIMAL" && $MNT == $STAGE/dvd ]]; then
+	echo "Extracting Minimal Package Set..."
+	/usr/bin/python $DIR/tools/isoread.py -x $MNT -L $STAGE/minimal.list $1
+	if [[ $? -ne 0 ]]; then
+		echo "ERROR: Extracting RHEL DVD Image failed."
 		exit 1
 	fi
-	echo -n "Copying RHEL DVD Image..."
-	cp -a /rhel/* $DIR/rhel-dvd/
-	cp -a /rhel/.discinfo $DIR/rhel-dvd/
+	echo "Done."
+fi
+
+# Minimal ISO
+#
+# Only the package closure of the selected profiles is grafted (straight
+# from the mounted DVD, nothing is copied) and the repodata is regenerated
+# for it. The installer menu only offers the selected profiles.
+if [[ -n "$MINIMAL" ]]; then
+	KEY=`$CACHE key minimal -s $SOURCE -s "$PROFILES" $STAGE/minimal.list` || exit 1
+fi
+if [[ -n "$MINIMAL" ]] && ! $CACHE check minimal $KEY; then
+	echo -n "Generating Minimal Repository..."
+	rm -rf $STAGE/minimal
+	mkdir -p $STAGE/minimal
+	COMPS=`ls $MNT/repodata/*comps*.xml | head -n 1`
+	/usr/bin/createrepo -q -g $COMPS -i $STAGE/minimal.list -o $STAGE/minimal $MNT
+	if [[ $? -ne 0 ]]; then
+		echo "ERROR: Generating minimal repository failed."
+		exit 1
+	fi
+	echo $PROFILES | tr ',' '\n' > $STAGE/minimal/media-profiles
+	$CACHE store minimal $KEY
 	echo " Done."
-	umount /rhel
-	rm -rf /rhel
-else
-	echo "ERROR: ISO image is not bootable."
-	exit 1
+fi
+if [[ -n "$MINIMAL" ]]; then
+	# Graft list for this run's mount point
+	sed "s|.*|&=$MNT/&|" $STAGE/minimal.list > $STAGE/minimal/grafts
 fi
 
-echo -n "Modifying RHEL DVD Image..."
-cp -a $DIR/config/* $DIR/rhel-dvd/
-echo " Done."
+echo "Remastering and Signing RHEL DVD Image..."
+GRAFTS=""
+for ENTRY in `ls -A $MNT`; do
+	case $ENTRY in
+		isolinux|stig-fix|TRANS.TBL)
+			;;
+		Packages|repodata)
+			if [[ -z "$MINIMAL" ]]; then
+				GRAFTS="$GRAFTS $ENTRY/=$MNT/$ENTRY"
+			fi
+			;;
+		*)
+			if [[ -d $MNT/$ENTRY ]]; then
+				GRAFTS="$GRAFTS $ENTRY/=$MNT/$ENTRY"
+			else
+				GRAFTS="$GRAFTS $ENTRY=$MNT/$ENTRY"
+			fi
+			;;
+	esac
+done
+if [[ -n "$MINIMAL" ]]; then
+	GRAFTS="$GRAFTS -path-list $STAGE/minimal/grafts repodata/=$STAGE/minimal/repodata"
+	# Variants write their own media-profiles
+	if [[ -n "$PROFILES" && -z "$VARIANTS" ]]; then
+		GRAFTS="$GRAFTS stig-fix/media-profiles=$STAGE/minimal/media-profiles"
+	fi
+fi
+MKISOFS=(/usr/bin/mkisofs -J -T -b isolinux/isolinux.bin -c isolinux/boot.cat -no-emul-boot -boot-load-size 4 -boot-info-table -R -m TRANS.TBL -m "*.pyc" -graft-points $GRAFTS stig-fix/=$DIR/config/stig-fix)
 
-echo "Remastering RHEL DVD Image..."
-cd $DIR/rhel-dvd
-chmod a+w isolinux/isolinux.bin
-find . -name TRANS.TBL -exec rm '{}' \; 
-/usr/bin/mkisofs -J -T -o $DIR/rhel-stig-fix.iso -b isolinux/isolinux.bin -c isolinux/boot.cat -no-emul-boot -boot-load-size 4 -boot-info-table -R -m TRANS.TBL .
-cd $DIR
-rm -rf $DIR/rhel-dvd
-echo "Done."
+# Site Variants
+#
+# Every variant is mastered from this mount with its own isolinux copy and
+# menu defaults (tools/variants.py), several at a time.
+if [[ -n "$VARIANTS" ]]; then
+	/usr/bin/python $DIR/tools/variants.py -s $STAGE -o $DIR -p "$PROFILES" ${MINIMAL:+-m} -k $ISOKEY ${JOBS:+-j $JOBS} $VARIANTS -- "${MKISOFS[@]}"
+	if [[ $? -ne 0 ]]; then
+		echo "ERROR: Remastering RHEL DVD Image variants failed."
+		exit 1
+	fi
+	$CACHE report
+	exit 0
+fi
 
-echo "Signing RHEL DVD Image..."
-/usr/bin/implantisomd5 $DIR/rhel-stig-fix.iso
+# The image is streamed through isomd5.py, which writes it to disk and
+# implants the media check sums (implantisomd5 format) in the same pass.
+# The previous image is unlinked first: it may be a hard link to a cached
+# one.
+rm -f $DIR/rhel-stig-fix.iso $DIR/rhel-stig-fix.iso.sha256
+"${MKISOFS[@]}" isolinux/=$STAGE/isolinux | /usr/bin/python $DIR/tools/isomd5.py -o $DIR/rhel-stig-fix.iso
+STATUS=(${PIPESTATUS[@]})
+if [[ ${STATUS[0]} -ne 0 || ${STATUS[1]} -ne 0 ]]; then
+	echo "ERROR: Remastering RHEL DVD Image failed."
+	exit 1
+fi
+$CACHE store iso $ISOKEY $DIR/rhel-stig-fix.iso $DIR/rhel-stig-fix.iso.sha256
 echo "Done."
+$CACHE report
 
 echo "DVD Created. [rhel-stig-fix.iso]"
 
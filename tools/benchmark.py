@@ -0,0 +1,403 @@
+#!/usr/bin/python
+# Installer UI Benchmark
+#
+# Times the Python side of the installer menu (menu.py) and the
+# classification banner without a person at the console: menu cold start to
+# window shown and to the hardware probe done, profile switches,
+# apply_configuration, banner start-up and banner resize/hotplug handling.
+# Each iteration is a fresh worker process (so start-up is really cold)
+# running against a virtual X server (Xvfb) or, when there is none, the stub
+# gtk in tools/gtkstub. Modal dialogs are answered by the harness; nothing
+# is written to /tmp.
+#
+# The banner must not start external processes (xrandr pipelines and the
+# like): any fork during its start-up or resize handling is reported and
+# makes the run fail.
+#
+#   tools/benchmark.py [-n 5] [-b stub|xvfb] [-o results.json]
+#   tools/benchmark.py -c baseline.json      (fail on regressions)
+#
+# menu.py is Python 2 code, so run the harness with a Python 2 interpreter
+# (or point -P at one).
+#
+# License: GPLv2
+
+import os
+import sys
+import json
+import time
+import types
+import socket
+import shutil
+import platform
+import tempfile
+import optparse
+import subprocess
+
+DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG = os.path.join(DIR, 'config', 'stig-fix')
+STUB = os.path.join(DIR, 'tools', 'gtkstub')
+
+SCENARIOS = ('menu', 'banner')
+
+# Install disks the menu is benchmarked with (name, size in MB), so results
+# from different build hosts compare
+DISKS = (('sda', 102400), ('sdb', 512000))
+
+# Password answered to the menu's password dialog
+PASSWORD = 'benchmark-password-0123456789'
+
+# Process creating calls counted as forks
+FORK_CALLS = ('fork', 'forkpty', 'system', 'popen', 'popen2', 'popen3', 'popen4',
+    'spawnv', 'spawnve', 'spawnvp', 'spawnvpe', 'posix_spawn', 'posix_spawnp')
+
+
+class BenchmarkError(Exception):
+    """A scenario could not be run."""
+
+
+# Record every call that would start a process in 'calls'
+def count_forks(calls):
+    def wrap(owner, name):
+        original = getattr(owner, name)
+
+        def wrapper(*args, **kwargs):
+            calls.append(name)
+            return original(*args, **kwargs)
+        setattr(owner, name, wrapper)
+    for name in FORK_CALLS:
+        if hasattr(os, name):
+            wrap(os, name)
+    wrap(subprocess, 'Popen')
+
+
+# Load a script (file names with dashes are not importable) as a module
+def load_script(name, path):
+    module = types.ModuleType(name)
+    module.__file__ = path
+    sys.modules[name] = module
+    code = compile(open(path).read(), path, 'exec')
+    exec(code, module.__dict__)
+    return module
+
+
+# Process pending GTK events and idle callbacks (window mapped and drawn)
+def flush_events(gtk):
+    while gtk.events_pending():
+        gtk.main_iteration(False)
+
+
+# Time one call in seconds
+def timed(function, *args):
+    start = time.time()
+    function(*args)
+    return time.time() - start
+
+
+# One cold start of the menu, then profile switches and applies
+def bench_menu(options):
+    forks = []
+    count_forks(forks)
+    sys.path.insert(0, CONFIG)
+    messages = []
+
+    start = time.time()
+    menu = load_script('menu', os.path.join(CONFIG, 'menu.py'))
+    imported = time.time()
+    import gtk
+    import disks
+    import pwhash
+    disks.list_disks = lambda *args: [disks.Disk(name, size, True, 'Benchmark', 'sata', False, None)
+        for name, size in DISKS]
+
+    # Answer the modal dialogs
+    def message_box(self, parent, text, type=None):
+        messages.append(text)
+
+    def get_password(self, parent):
+        self.a = self.b = PASSWORD
+    menu.Display_Menu.MessageBox = message_box
+    menu.Display_Menu.get_password = get_password
+    menu.Display_Menu.quit = lambda self, *args: None
+    pwhash.pick_rounds = lambda *args: options.rounds
+
+    window = menu.Display_Menu()
+    shown = time.time()
+    # The hardware probe runs from the main loop after the window is shown
+    flush_events(gtk)
+    ready = time.time()
+    result = {
+        'menu_import': [imported - start],
+        'menu_startup': [shown - start],
+        'menu_ready': [ready - start],
+        'menu_forks': len(forks),
+        'menu_messages': len(messages),
+    }
+
+    # Cycle through the offered profiles (each set_active is a change)
+    switches = []
+    profiles = len(window.profile_ids)
+    del messages[:]
+    for i in range(options.switches):
+        index = (window.system_profile.get_active() + 1) % profiles
+        if profiles > 1:
+            switches.append(timed(lambda: (window.system_profile.set_active(index), flush_events(gtk))))
+        else:
+            switches.append(timed(lambda: (window.configure_system_profile(None), flush_events(gtk))))
+    result['menu_profile_switch'] = switches
+
+    # Apply the configuration of the first profile
+    window.system_profile.set_active(0)
+    window.hostname.set_text('benchmark.example.com')
+    del messages[:]
+    applies = []
+    for i in range(options.applies):
+        window.fragments.pending = {}
+        applies.append(timed(window.apply_configuration, None))
+        if messages or not window.fragments.pending:
+            raise BenchmarkError('apply_configuration was rejected: %s' % (messages and messages[0] or 'nothing rendered'))
+    result['menu_apply'] = applies
+    result['menu_forks'] = len(forks)
+    return result
+
+
+# One cold start of the banner, then resize and hotplug handling
+def bench_banner(options):
+    forks = []
+    count_forks(forks)
+    workdir = tempfile.mkdtemp(prefix='benchmark.')
+    try:
+        config = os.path.join(workdir, 'classification-banner')
+        f = open(config, 'w')
+        f.write('message = "UNCLASSIFIED//FOR OFFICIAL USE ONLY"\nbgcolor = "#00CC00"\n')
+        f.close()
+        # No banner daemon: the banner reads the file itself
+        sys.argv = ['classification-banner.py', '--socket', os.path.join(workdir, 'none.sock')]
+
+        start = time.time()
+        banner = load_script('classification_banner', os.path.join(CONFIG, 'classification-banner.py'))
+        import gtk
+        banner.CONFIG_FILE = config
+        display = banner.Display_Banner()
+        flush_events(gtk)
+        result = {
+            'banner_startup': [time.time() - start],
+            'banner_startup_forks': len(forks),
+            'banner_windows': len(display.banners),
+        }
+
+        del forks[:]
+        screen = display.screen
+        resizes = []
+        for i in range(options.resizes):
+            resizes.append(timed(lambda: (screen.emit('size-changed'), flush_events(gtk))))
+        result['banner_resize'] = resizes
+
+        # Monitor hotplug (only the stub screen can change its monitors)
+        if hasattr(screen, 'set_monitors'):
+            layouts = (((0, 0, 1920, 1080), (1920, 0, 1280, 1024)), ((0, 0, 1920, 1080),))
+            hotplugs = []
+            for i in range(options.resizes):
+                screen.set_monitors(layouts[i % 2])
+                hotplugs.append(timed(lambda: (screen.emit('monitors-changed'), flush_events(gtk))))
+            result['banner_hotplug'] = hotplugs
+        result['banner_resize_forks'] = len(forks)
+        return result
+    finally:
+        shutil.rmtree(workdir)
+
+
+# Worker: run one scenario and print its samples as a JSON line
+def worker(scenario, options):
+    try:
+        if scenario == 'menu':
+            result = bench_menu(options)
+        else:
+            result = bench_banner(options)
+    except (BenchmarkError, IOError, OSError) as e:
+        result = {'error': str(e)}
+    sys.stdout.write('\n' + json.dumps(result) + '\n')
+    sys.stdout.flush()
+
+
+# Start Xvfb on a free display, returning (process, display)
+def start_xvfb():
+    number = 99
+    while os.path.exists('/tmp/.X%d-lock' % number):
+        number += 1
+    display = ':%d' % number
+    null = open(os.devnull, 'w')
+    try:
+        process = subprocess.Popen(['Xvfb', display, '-screen', '0', '1024x768x24', '-nolisten', 'tcp'],
+            stdout=null, stderr=null)
+    except OSError as e:
+        raise BenchmarkError('cannot start Xvfb: %s' % e)
+    for i in range(50):
+        if os.path.exists('/tmp/.X11-unix/X%d' % number):
+            return process, display
+        if process.poll() is not None:
+            break
+        time.sleep(0.1)
+    process.kill()
+    raise BenchmarkError('Xvfb did not start on %s' % display)
+
+
+# Whether an executable is on the PATH
+def which(name):
+    for path in os.environ.get('PATH', '').split(os.pathsep):
+        if os.access(os.path.join(path, name), os.X_OK):
+            return True
+    return False
+
+
+# Run one worker process for a scenario and return its samples
+def run_worker(options, scenario, env):
+    command = [options.python, os.path.abspath(__file__), '--worker', scenario,
+        '--switches', str(options.switches), '--applies', str(options.applies),
+        '--resizes', str(options.resizes), '--rounds', str(options.rounds)]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = process.communicate()
+    lines = out.decode('utf-8', 'replace').strip().splitlines()
+    try:
+        result = json.loads(lines[-1])
+    except (IndexError, ValueError):
+        raise BenchmarkError('%s worker failed:\n%s' % (scenario, err.decode('utf-8', 'replace').strip()))
+    if 'error' in result:
+        raise BenchmarkError('%s: %s' % (scenario, result['error']))
+    return result
+
+
+# min/median/mean/max in milliseconds
+def statistics(samples):
+    samples = sorted(samples)
+    middle = len(samples) // 2
+    if len(samples) % 2:
+        median = samples[middle]
+    else:
+        median = (samples[middle - 1] + samples[middle]) / 2.0
+    return {
+        'samples': len(samples),
+        'min': round(samples[0] * 1000, 3),
+        'median': round(median * 1000, 3),
+        'mean': round(sum(samples) * 1000 / len(samples), 3),
+        'max': round(samples[-1] * 1000, 3),
+    }
+
+
+# Run the scenarios and build the report
+def run(options):
+    env = dict(os.environ)
+    xvfb = None
+    backend = options.backend
+    if backend == 'auto':
+        backend = which('Xvfb') and 'xvfb' or 'stub'
+    if backend == 'xvfb':
+        xvfb, env['DISPLAY'] = start_xvfb()
+    else:
+        env['DISPLAY'] = env.get('DISPLAY', ':0')
+        env['PYTHONPATH'] = os.pathsep.join([STUB] + [p for p in [env.get('PYTHONPATH')] if p])
+    try:
+        samples = {}
+        counts = {}
+        for scenario in options.scenarios:
+            for i in range(options.iterations):
+                for name, value in run_worker(options, scenario, env).items():
+                    if isinstance(value, list):
+                        samples.setdefault(name, []).extend(value)
+                    else:
+                        counts[name] = max(counts.get(name, 0), value)
+    finally:
+        if xvfb:
+            xvfb.kill()
+            xvfb.wait()
+
+    python = subprocess.Popen([options.python, '-c', 'import platform; print(platform.python_version())'],
+        stdout=subprocess.PIPE).communicate()[0].decode('utf-8').strip()
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'hostname': socket.gethostname(),
+        'backend': backend,
+        'python': python,
+        'platform': platform.platform(),
+        'iterations': options.iterations,
+        'rounds': options.rounds,
+        'results': {},
+        'counts': counts,
+    }
+    for name, values in samples.items():
+        report['results'][name] = statistics(values)
+    return report
+
+
+# Metrics whose median grew by more than the tolerance over a baseline
+def regressions(report, baseline, tolerance, floor=1.0):
+    found = []
+    for name, result in sorted(report['results'].items()):
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            continue
+        # Sub-millisecond medians are noise
+        if result['median'] > max(before['median'], floor) * (1 + tolerance):
+            found.append((name, before['median'], result['median']))
+    return found
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [options] [menu|banner ...]")
+    parser.add_option("-n", "--iterations", type="int", default=5,
+        help="Cold starts per scenario (default: 5)")
+    parser.add_option("-b", "--backend", default="auto", choices=('auto', 'xvfb', 'stub'),
+        help="Xvfb or the stub gtk (default: Xvfb if installed)")
+    parser.add_option("-P", "--python", default=sys.executable,
+        help="Interpreter for the scenarios (default: %s)" % sys.executable)
+    parser.add_option("-o", "--output", help="Write the JSON report to a file")
+    parser.add_option("-c", "--compare", metavar="BASELINE",
+        help="Exit non-zero if a median regressed against a previous report")
+    parser.add_option("-t", "--tolerance", type="float", default=0.25,
+        help="Allowed median growth over the baseline (default: 0.25)")
+    parser.add_option("--switches", type="int", default=20, help="Profile switches per cold start")
+    parser.add_option("--applies", type="int", default=3, help="apply_configuration calls per cold start")
+    parser.add_option("--resizes", type="int", default=20, help="Banner resizes per cold start")
+    parser.add_option("--rounds", type="int", default=5000,
+        help="SHA-512 crypt rounds used by apply_configuration (default: 5000)")
+    parser.add_option("--worker", choices=SCENARIOS, help=optparse.SUPPRESS_HELP)
+    options, args = parser.parse_args()
+
+    if options.worker:
+        worker(options.worker, options)
+        return
+    for scenario in args:
+        if scenario not in SCENARIOS:
+            parser.error("unknown scenario '%s'" % scenario)
+    options.scenarios = args or SCENARIOS
+
+    try:
+        report = run(options)
+    except BenchmarkError as e:
+        sys.stderr.write("ERROR: %s\n" % e)
+        sys.exit(1)
+    text = json.dumps(report, indent=2, sort_keys=True, separators=(',', ': ')) + '\n'
+    if options.output:
+        f = open(options.output, 'w')
+        f.write(text)
+        f.close()
+    else:
+        sys.stdout.write(text)
+
+    failed = False
+    for name in ('banner_startup_forks', 'banner_resize_forks'):
+        if report['counts'].get(name):
+            sys.stderr.write("ERROR: %s: the banner started %d processes\n" % (name, report['counts'][name]))
+            failed = True
+    if options.compare:
+        baseline = json.load(open(options.compare))
+        for name, before, after in regressions(report, baseline, options.tolerance):
+            sys.stderr.write("REGRESSION: %s median %.3fms -> %.3fms\n" % (name, before, after))
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/python
+# ISO Build Cache
+#
+# Content-addressed cache for createiso.sh. Each build layer (the staged
+# isolinux tree, the profile package check, the minimal repository and the
+# final ISO) is keyed by the SHA-256 of its inputs: files, whole trees and
+# option strings. A layer whose key is unchanged is reused; the final ISO
+# is kept as an object and hard linked back out, so an unchanged input set
+# returns the previous image without mastering it again.
+#
+# File hashes are remembered by (size, mtime, inode), so only changed files
+# (the DVD image included) are read again.
+#
+#   KEY=`buildcache.py -d .staging key iso -s "$OPTIONS" $1 config`
+#   buildcache.py -d .staging check iso $KEY -o . || ...build...
+#   buildcache.py -d .staging store iso $KEY rhel-stig-fix.iso
+#   buildcache.py -d .staging report
+#
+# License: GPLv2
+
+import os
+import sys
+import stat
+import json
+import shutil
+import hashlib
+import optparse
+
+# Read size for hashing
+BLOCK_SIZE = 1024 * 1024
+
+# Tree entries that do not reach the ISO (mkisofs -m TRANS.TBL -m "*.pyc")
+IGNORED = ('TRANS.TBL',)
+IGNORED_SUFFIXES = ('.pyc', '.pyo')
+
+
+class CacheError(Exception):
+    """Build cache failure."""
+
+
+class BuildCache:
+    """Layer keys, stored objects and run statistics under <stage>/cache."""
+
+    def __init__(self, stage, keep=2):
+        self.root = os.path.join(stage, 'cache')
+        self.keep = keep
+        self.hashes_path = os.path.join(self.root, 'hashes.json')
+        self.hashes = None
+        self.changed = False
+        for name in ('layers', 'objects'):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+    # SHA-256 of a file, reused while its size, mtime and inode are unchanged
+    def file_hash(self, path):
+        if self.hashes is None:
+            self.hashes = {}
+            if os.path.exists(self.hashes_path):
+                try:
+                    f = open(self.hashes_path)
+                    try:
+                        self.hashes = json.load(f)
+                    finally:
+                        f.close()
+                except ValueError:
+                    self.hashes = {}
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        signature = [st.st_size, st.st_mtime, st.st_ino]
+        entry = self.hashes.get(path)
+        if entry and entry[:3] == signature:
+            return entry[3]
+        digest = hashlib.sha256()
+        f = open(path, 'rb')
+        try:
+            while True:
+                data = f.read(BLOCK_SIZE)
+                if not data:
+                    break
+                digest.update(data)
+        finally:
+            f.close()
+        self.hashes[path] = signature + [digest.hexdigest()]
+        self.changed = True
+        return digest.hexdigest()
+
+    # Feed a file or tree into a digest (relative paths, types and contents)
+    def update(self, digest, path):
+        st = os.lstat(path)
+        if stat.S_ISLNK(st.st_mode):
+            digest.update(('L %s\n' % os.readlink(path)).encode('utf-8'))
+        elif stat.S_ISDIR(st.st_mode):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                relative = os.path.relpath(root, path)
+                digest.update(('D %s\n' % relative).encode('utf-8'))
+                for name in sorted(files):
+                    if name in IGNORED or name.endswith(IGNORED_SUFFIXES):
+                        continue
+                    full = os.path.join(root, name)
+                    if os.path.islink(full):
+                        digest.update(('L %s %s\n' % (name, os.readlink(full))).encode('utf-8'))
+                    else:
+                        mode = os.stat(full).st_mode & 0o111 and 'x' or '-'
+                        digest.update(('F %s %s %s\n' % (name, mode, self.file_hash(full))).encode('utf-8'))
+        else:
+            digest.update(('F %s\n' % self.file_hash(path)).encode('utf-8'))
+
+    # Key of a layer from its option strings and input paths
+    def key(self, layer, strings, paths):
+        digest = hashlib.sha256(('layer %s\n' % layer).encode('utf-8'))
+        for value in strings:
+            digest.update(('S %s\n' % value).encode('utf-8'))
+        for path in paths:
+            if not os.path.exists(path):
+                raise CacheError("input '%s' does not exist" % path)
+            digest.update(('P %s\n' % os.path.basename(os.path.normpath(path))).encode('utf-8'))
+            self.update(digest, path)
+        self.save()
+        return digest.hexdigest()
+
+    # Write the file hash memo back
+    def save(self):
+        if not self.changed:
+            return
+        tmp = self.hashes_path + '.tmp'
+        f = open(tmp, 'w')
+        try:
+            json.dump(self.hashes, f)
+        finally:
+            f.close()
+        os.rename(tmp, self.hashes_path)
+        self.changed = False
+
+    # Key stored for a layer (None if the layer was never built)
+    def stored(self, layer):
+        path = os.path.join(self.root, 'layers', layer)
+        if not os.path.exists(path):
+            return None
+        f = open(path)
+        try:
+            return f.read().strip()
+        finally:
+            f.close()
+
+    # Reuse a layer: True if its key is unchanged (and, with an output
+    # directory, its stored objects were linked there)
+    def check(self, layer, key, output=None):
+        hit = self.stored(layer) == key
+        if hit and output:
+            objects = os.path.join(self.root, 'objects', layer, key)
+            hit = os.path.isdir(objects) and bool(os.listdir(objects))
+            if hit:
+                for name in sorted(os.listdir(objects)):
+                    link(os.path.join(objects, name), os.path.join(output, name))
+                os.utime(objects, None)
+        self.record(layer, hit and 'hit' or 'miss')
+        return hit
+
+    # Record a built layer and keep its output files as objects (under
+    # objects/<layer>/<key>)
+    def store(self, layer, key, files=()):
+        if files:
+            objects = os.path.join(self.root, 'objects', layer, key)
+            tmp = objects + '.tmp'
+            if os.path.exists(tmp):
+                shutil.rmtree(tmp)
+            os.makedirs(tmp)
+            for path in files:
+                link(path, os.path.join(tmp, os.path.basename(path)))
+            if os.path.exists(objects):
+                shutil.rmtree(objects)
+            os.rename(tmp, objects)
+            self.prune(layer)
+        tmp = os.path.join(self.root, 'layers', layer + '.tmp')
+        f = open(tmp, 'w')
+        try:
+            f.write(key + '\n')
+        finally:
+            f.close()
+        os.rename(tmp, os.path.join(self.root, 'layers', layer))
+
+    # Drop all but a layer's most recently used objects (the objects of the
+    # other layers are left alone)
+    def prune(self, layer):
+        objects = os.path.join(self.root, 'objects', layer)
+        entries = []
+        for name in os.listdir(objects):
+            path = os.path.join(objects, name)
+            if os.path.isdir(path) and not name.endswith('.tmp'):
+                entries.append((os.stat(path).st_mtime, path))
+        entries.sort(reverse=True)
+        for mtime, path in entries[self.keep:]:
+            shutil.rmtree(path)
+
+    # Append a hit or miss to this run's statistics
+    def record(self, layer, result):
+        f = open(os.path.join(self.root, 'run'), 'a')
+        try:
+            f.write('%s %s\n' % (layer, result))
+        finally:
+            f.close()
+
+    # Start a new run
+    def begin(self):
+        path = os.path.join(self.root, 'run')
+        if os.path.exists(path):
+            os.remove(path)
+
+    # Hits and misses of this run as [(layer, result)]
+    def results(self):
+        path = os.path.join(self.root, 'run')
+        if not os.path.exists(path):
+            return []
+        f = open(path)
+        try:
+            return [tuple(line.split()) for line in f if line.strip()]
+        finally:
+            f.close()
+
+
+# Hard link a file (copy it across file systems)
+def link(source, destination):
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog -d stage begin|key|check|store|report [args]\n\n"
+        "  begin                        start a run (resets the statistics)\n"
+        "  key LAYER [-s STRING] PATH.. print the key of a layer's inputs\n"
+        "  check LAYER KEY [-o DIR]     exit 0 if the layer can be reused\n"
+        "  store LAYER KEY [FILE..]     record a built layer (and its files)\n"
+        "  report                       print this run's hits and misses")
+    parser.add_option("-d", "--stage", default=".staging",
+        help="Staging directory holding the cache (default: .staging)")
+    parser.add_option("-s", "--string", action="append", default=[],
+        help="Option string that is part of the key (key)")
+    parser.add_option("-o", "--output",
+        help="Directory to link the stored files into (check)")
+    parser.add_option("-k", "--keep", type="int", default=2,
+        help="Number of stored images to keep per layer (default: 2)")
+    options, args = parser.parse_args()
+    if not args:
+        parser.error("a command is required")
+    command = args.pop(0)
+    counts = {'begin': (0, 0), 'key': (1, None), 'check': (2, 2), 'store': (2, None), 'report': (0, 0)}
+    if command not in counts:
+        parser.error("unknown command '%s'" % command)
+    least, most = counts[command]
+    if len(args) < least or (most is not None and len(args) > most):
+        parser.error("wrong number of arguments for '%s'" % command)
+
+    try:
+        cache = BuildCache(options.stage, options.keep)
+        if command == 'begin':
+            cache.begin()
+        elif command == 'key':
+            print(cache.key(args[0], options.string, args[1:]))
+        elif command == 'check':
+            if not cache.check(args[0], args[1], options.output):
+                sys.exit(1)
+        elif command == 'store':
+            cache.store(args[0], args[1], args[2:])
+        elif command == 'report':
+            results = cache.results()
+            hits = len([r for r in results if r[1] == 'hit'])
+            print("Build cache: %d hits, %d misses (%s)" % (hits, len(results) - hits,
+                ', '.join(['%s %s' % r for r in results]) or 'nothing checked'))
+    except (CacheError, IOError, OSError) as e:
+        sys.stderr.write("ERROR: %s\n" % e)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
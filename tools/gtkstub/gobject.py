@@ -0,0 +1,96 @@
+#!/usr/bin/python
+# GObject Stub
+#
+# Minimal stand-in for the PyGTK gobject module used by tools/benchmark.py
+# when no X server is available. Signals are dispatched synchronously and
+# idle callbacks run from gtk.main_iteration(); timeouts and I/O watches are
+# recorded but never fire.
+#
+# License: GPLv2
+
+IO_IN = 1
+IO_OUT = 4
+IO_PRI = 2
+IO_ERR = 8
+IO_HUP = 16
+
+# Pending main loop sources: id -> (kind, callback, args)
+SOURCES = {}
+_next_source = [0]
+
+
+# Register a main loop source
+def _add_source(kind, callback, args):
+    _next_source[0] += 1
+    SOURCES[_next_source[0]] = (kind, callback, args)
+    return _next_source[0]
+
+
+def idle_add(callback, *args):
+    return _add_source('idle', callback, args)
+
+
+def timeout_add(interval, callback, *args):
+    return _add_source('timeout', callback, args)
+
+
+def timeout_add_seconds(interval, callback, *args):
+    return _add_source('timeout', callback, args)
+
+
+def io_add_watch(fd, condition, callback, *args):
+    return _add_source('io', callback, args)
+
+
+def source_remove(source):
+    return SOURCES.pop(source, None) is not None
+
+
+def threads_init():
+    pass
+
+
+# Run the first pending idle callback (returns False if there was none)
+def run_idle():
+    idle = [source for source, (kind, callback, args) in SOURCES.items() if kind == 'idle']
+    if not idle:
+        return False
+    source = min(idle)
+    kind, callback, args = SOURCES[source]
+    if not callback(*args):
+        SOURCES.pop(source, None)
+    return True
+
+
+# Whether an idle callback is waiting
+def idle_pending():
+    for kind, callback, args in SOURCES.values():
+        if kind == 'idle':
+            return True
+    return False
+
+
+class GObject(object):
+    """Object with synchronously dispatched signals."""
+
+    def __init__(self, *args, **kwargs):
+        self.handlers = {}
+        self.properties = {}
+
+    # Connect a handler, called as handler(object, *signal args, *data)
+    def connect(self, signal, handler, *data):
+        self.handlers.setdefault(signal, []).append((handler, data))
+        return len(self.handlers[signal])
+
+    # Call the handlers of a signal, returning the last result
+    def emit(self, signal, *args):
+        result = None
+        for handler, data in self.handlers.get(signal, []):
+            result = handler(self, *(args + data))
+        return result
+
+    def set_property(self, name, value):
+        self.properties[name] = value
+
+    def get_property(self, name):
+        return self.properties.get(name)
@@ -0,0 +1,353 @@
+#!/usr/bin/python
+# GTK Stub
+#
+# Minimal stand-in for the PyGTK 2 gtk module, covering what menu.py and
+# classification-banner.py use, so tools/benchmark.py can time their Python
+# code without an X server. Widgets keep the state the scripts read back
+# (values, text, active flags, window sizes) and emit the same signals as
+# GTK when that state changes; every other method is accepted and ignored.
+# The screen's monitors can be changed with gdk.screen_get_default()
+# .set_monitors() to simulate a hotplug.
+#
+# License: GPLv2
+
+import gobject
+
+WIN_POS_CENTER = 1
+STATE_NORMAL = 0
+JUSTIFY_CENTER = 2
+
+MESSAGE_INFO = 0
+MESSAGE_WARNING = 1
+MESSAGE_QUESTION = 2
+MESSAGE_ERROR = 3
+BUTTONS_OK = 1
+
+DIALOG_MODAL = 1
+DIALOG_DESTROY_WITH_PARENT = 2
+
+RESPONSE_REJECT = -2
+RESPONSE_ACCEPT = -3
+RESPONSE_OK = -5
+RESPONSE_CANCEL = -6
+
+STOCK_OK = 'gtk-ok'
+STOCK_CANCEL = 'gtk-cancel'
+STOCK_HELP = 'gtk-help'
+
+
+class Namespace(object):
+    """Attribute namespace standing in for a submodule."""
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class Rectangle(object):
+    """Monitor geometry."""
+
+    def __init__(self, x=0, y=0, width=0, height=0):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+
+class Widget(gobject.GObject):
+    """Widget accepting (and ignoring) any method call."""
+
+    def __init__(self, *args, **kwargs):
+        gobject.GObject.__init__(self)
+        self.children = []
+        self.visible = False
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: None
+
+    def add(self, child):
+        self.children.append(child)
+
+    def pack_start(self, child, *args):
+        self.children.append(child)
+
+    def pack_end(self, child, *args):
+        self.children.append(child)
+
+    def attach(self, child, *args):
+        self.children.append(child)
+
+    def show_all(self):
+        self.visible = True
+        for child in self.children:
+            child.show_all()
+
+    def show(self):
+        self.visible = True
+
+    def hide(self):
+        self.visible = False
+        self.emit('hide')
+
+    def destroy(self):
+        self.visible = False
+        self.children = []
+
+
+class Window(Widget):
+
+    def __init__(self, *args, **kwargs):
+        Widget.__init__(self)
+        self.size = (200, 200)
+        self.position = (0, 0)
+
+    def set_default_size(self, width, height):
+        self.size = (width, height)
+
+    def resize(self, width, height):
+        self.size = (width, height)
+
+    def get_size(self):
+        return self.size
+
+    def move(self, x, y):
+        self.position = (x, y)
+
+    def get_position(self):
+        return self.position
+
+
+class VBox(Widget):
+    pass
+
+
+class HBox(Widget):
+    pass
+
+
+class Table(Widget):
+    pass
+
+
+class Image(Widget):
+    pass
+
+
+class Label(Widget):
+
+    def __init__(self, text=''):
+        Widget.__init__(self)
+        self.text = text
+
+    def set_label(self, text):
+        self.text = text
+
+    def get_label(self):
+        return self.text
+
+    def set_text(self, text):
+        self.text = text
+
+    def get_text(self):
+        return self.text
+
+    def set_markup(self, text):
+        self.text = text
+
+
+class Entry(Widget):
+
+    def __init__(self, max=0):
+        Widget.__init__(self)
+        self.text = ''
+
+    def set_text(self, text):
+        self.text = text
+        self.emit('changed')
+
+    def get_text(self):
+        return self.text
+
+
+class Button(Widget):
+
+    def __init__(self, label=None, stock=None, *args):
+        Widget.__init__(self)
+        self.label = label
+
+    def clicked(self):
+        self.emit('clicked')
+
+
+class CheckButton(Button):
+
+    def __init__(self, label=None, *args):
+        Button.__init__(self, label)
+        self.active = False
+
+    def get_active(self):
+        return self.active
+
+    def set_active(self, active):
+        active = bool(active)
+        if active != self.active:
+            self.active = active
+            self.emit('clicked')
+            self.emit('toggled')
+
+
+class ComboBox(Widget):
+
+    def __init__(self):
+        Widget.__init__(self)
+        self.items = []
+        self.active = -1
+
+    def append_text(self, text):
+        self.items.append(text)
+
+    def get_active(self):
+        return self.active
+
+    def set_active(self, index):
+        if index != self.active:
+            self.active = index
+            self.emit('changed')
+
+    def get_active_text(self):
+        if 0 <= self.active < len(self.items):
+            return self.items[self.active]
+        return None
+
+
+def combo_box_new_text():
+    return ComboBox()
+
+
+class Adjustment(gobject.GObject):
+
+    def __init__(self, value=0, lower=0, upper=0, step_incr=0, page_incr=0, page_size=0):
+        gobject.GObject.__init__(self)
+        self.value = value
+        self.lower = lower
+        self.upper = upper
+
+
+class SpinButton(Widget):
+
+    def __init__(self, adjustment=None, climb_rate=0.0, digits=0):
+        Widget.__init__(self)
+        self.adjustment = adjustment or Adjustment()
+        self.tooltip = None
+
+    def get_value(self):
+        return float(self.adjustment.value)
+
+    def get_value_as_int(self):
+        return int(round(self.adjustment.value))
+
+    def set_value(self, value):
+        value = max(self.adjustment.lower, min(self.adjustment.upper, value))
+        if value != self.adjustment.value:
+            self.adjustment.value = value
+            self.emit('value-changed')
+
+    def set_tooltip_text(self, text):
+        self.tooltip = text
+
+
+class Dialog(Window):
+
+    def __init__(self, title=None, parent=None, flags=0, buttons=None):
+        Window.__init__(self)
+        self.vbox = VBox()
+
+    def run(self):
+        return RESPONSE_ACCEPT
+
+
+class MessageDialog(Dialog):
+
+    def __init__(self, parent=None, flags=0, type=MESSAGE_INFO, buttons=BUTTONS_OK, message_format=None):
+        Dialog.__init__(self)
+
+    def run(self):
+        return RESPONSE_OK
+
+
+class Screen(gobject.GObject):
+    """Screen with a configurable set of monitors."""
+
+    def __init__(self):
+        gobject.GObject.__init__(self)
+        self.monitors = [Rectangle(0, 0, 1024, 768)]
+
+    # Replace the monitor geometries ((x, y, width, height) tuples)
+    def set_monitors(self, geometries):
+        self.monitors = [Rectangle(*geometry) for geometry in geometries]
+
+    def get_n_monitors(self):
+        return len(self.monitors)
+
+    def get_monitor_geometry(self, monitor):
+        return self.monitors[monitor]
+
+    def get_primary_monitor(self):
+        return 0
+
+    def get_width(self):
+        return max([m.x + m.width for m in self.monitors])
+
+    def get_height(self):
+        return max([m.y + m.height for m in self.monitors])
+
+
+class Display(gobject.GObject):
+
+    def __init__(self, screen):
+        gobject.GObject.__init__(self)
+        self.screen = screen
+
+    def get_default_screen(self):
+        return self.screen
+
+
+_screen = Screen()
+_display = Display(_screen)
+
+
+def _color_parse(spec):
+    return spec
+
+
+gdk = Namespace(
+    Rectangle=Rectangle,
+    screen_get_default=lambda: _screen,
+    display_get_default=lambda: _display,
+    color_parse=_color_parse,
+    threads_init=lambda: None,
+    threads_enter=lambda: None,
+    threads_leave=lambda: None,
+)
+
+keysyms = Namespace(F1=0xffbe, F12=0xffc9, Escape=0xff1b, Return=0xff0d)
+
+
+# Main loop: idle callbacks run one per iteration
+def events_pending():
+    return gobject.idle_pending()
+
+
+def main_iteration(block=True):
+    gobject.run_idle()
+    return False
+
+
+def main():
+    while gobject.run_idle():
+        pass
+
+
+def main_quit():
+    pass
@@ -0,0 +1,10 @@
+#!/usr/bin/python
+# PyGTK Stub
+#
+# Stand-in for the pygtk version selector (see gtk.py in this directory).
+#
+# License: GPLv2
+
+
+def require(version):
+    pass
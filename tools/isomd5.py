@@ -0,0 +1,333 @@
+#!/usr/bin/python
+# Streaming ISO Checksum Implanter
+#
+# Reads an ISO image from mkisofs on standard input, writes it to disk and
+# computes the anaconda media check sums (the same format as
+# /usr/bin/implantisomd5) while the image streams through, then implants
+# them into the primary volume descriptor. A chunked SHA-256 manifest is
+# written next to the image. The image is never read back from disk.
+#
+#   mkisofs ... | isomd5.py -o rhel-stig-fix.iso
+#
+# License: GPLv2
+
+import os
+import sys
+import time
+import hashlib
+import optparse
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+SECTOR_SIZE = 2048
+SYSTEM_AREA = 16 * SECTOR_SIZE
+APPDATA_OFFSET = 883
+APPDATA_SIZE = 512
+SIZE_OFFSET = 84
+FRAGMENT_SUM_LENGTH = 60
+
+# implantisomd5 hashes the image in 32k reads and samples fragment sums at
+# read boundaries, so the stream is hashed in the same block size
+MD5_BLOCK = 32768
+
+# Size of the leading manifest chunk held in memory until the implant
+HEAD_CHUNK = 64 * 1024
+# Size of the remaining SHA-256 manifest chunks
+MANIFEST_CHUNK = 64 * 1024 * 1024
+
+
+class ISOError(Exception):
+    """Invalid or truncated ISO image."""
+
+
+# Locate the primary volume descriptor in the leading bytes of an image
+#
+# Returns (pvd_offset, isosize) or None if more data is needed.
+def parse_pvd(data):
+    offset = SYSTEM_AREA
+    while offset + SECTOR_SIZE <= len(data):
+        kind = ord(data[offset:offset + 1])
+        if kind == 1:
+            size = data[offset + SIZE_OFFSET:offset + SIZE_OFFSET + 4]
+            sectors = 0
+            for i in range(4):
+                sectors = sectors * 256 + ord(size[i:i + 1])
+            return offset, sectors * SECTOR_SIZE
+        if kind == 255:
+            raise ISOError('no primary volume descriptor found')
+        offset += SECTOR_SIZE
+    return None
+
+
+# Fragment sum characters for one fragment (implantisomd5 keeps only the
+# first printed hex digit of each of the leading digest bytes)
+def fragment_chars(digest, count):
+    chars = ''
+    for byte in bytearray(digest[:FRAGMENT_SUM_LENGTH // count]):
+        chars += ('%x' % byte)[0]
+    return chars
+
+
+# Build the 512 byte application data block
+def appdata(md5sum, fragsums, skipsectors, fragmentcount, supported):
+    data = 'ISO MD5SUM = %s;SKIPSECTORS = %d;RHLISOSTATUS=%d;' % (md5sum, skipsectors, int(supported))
+    data += 'FRAGMENT SUMS = %s;FRAGMENT COUNT = %d;' % (fragsums, fragmentcount)
+    data += 'THIS IS NOT THE SAME AS RUNNING MD5SUM ON THIS ISO!!'
+    return data[:APPDATA_SIZE].ljust(APPDATA_SIZE).encode('ascii')
+
+
+class Sha256Manifest(threading.Thread):
+    """Hash manifest chunks in a background thread (hashlib drops the GIL)."""
+
+    def __init__(self):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.queue = queue.Queue(8)
+        self.chunks = []
+        self.sha = None
+        self.offset = 0
+        self.length = 0
+
+    def run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            if self.sha is None:
+                self.sha = hashlib.sha256()
+            self.sha.update(data)
+            self.length += len(data)
+            if self.length >= MANIFEST_CHUNK:
+                self.close_chunk()
+        if self.sha is not None:
+            self.close_chunk()
+
+    def close_chunk(self):
+        self.chunks.append((self.sha.hexdigest(), self.offset, self.length))
+        self.offset += self.length
+        self.length = 0
+        self.sha = None
+
+    # Queue data for hashing (slices never straddle a chunk boundary)
+    def feed(self, data):
+        while data:
+            room = MANIFEST_CHUNK - self.pending
+            self.queue.put(data[:room])
+            self.pending = (self.pending + min(room, len(data))) % MANIFEST_CHUNK
+            data = data[room:]
+
+    def start_at(self, offset):
+        self.offset = offset
+        self.pending = 0
+        self.start()
+
+    def finish(self):
+        self.queue.put(None)
+        self.join()
+        return self.chunks
+
+
+class Implanter:
+    """Write an ISO stream to disk while computing its media check sums."""
+
+    def __init__(self, path, skipsectors=15, fragmentcount=20, supported=False, manifest=True):
+        self.path = path
+        self.skipsectors = skipsectors
+        self.fragmentcount = fragmentcount
+        self.supported = supported
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        self.md5 = hashlib.md5()
+        self.fragsums = ''
+        self.previous_fragment = 0
+        self.head = b''
+        self.block = b''
+        self.pvd_offset = None
+        self.isosize = None
+        self.limit = None
+        self.hashed = 0
+        self.streamed = 0
+        if manifest:
+            self.manifest = Sha256Manifest()
+        else:
+            self.manifest = None
+
+    # Write data to the image file
+    def write(self, data):
+        while data:
+            n = os.write(self.fd, data)
+            data = data[n:]
+
+    # MD5 over the image up to the skipped trailing sectors, in 32k blocks
+    def hash_blocks(self, data, final=False):
+        if self.block:
+            need = MD5_BLOCK - len(self.block)
+            self.block += data[:need]
+            data = data[need:]
+            if len(self.block) < MD5_BLOCK and not final:
+                return
+            self.hash_block(self.block)
+            self.block = b''
+        pos = 0
+        while len(data) - pos >= MD5_BLOCK:
+            self.hash_block(data[pos:pos + MD5_BLOCK])
+            pos += MD5_BLOCK
+        if final and pos < len(data):
+            self.hash_block(data[pos:])
+        else:
+            self.block = data[pos:]
+
+    def hash_block(self, block):
+        if self.hashed >= self.limit:
+            return
+        block = block[:self.limit - self.hashed]
+        self.md5.update(block)
+        if self.fragmentcount:
+            current = self.hashed * (self.fragmentcount + 1) // self.limit
+            if current != self.previous_fragment:
+                self.fragsums += fragment_chars(self.md5.copy().digest(), self.fragmentcount)
+                self.previous_fragment = current
+        self.hashed += len(block)
+
+    # Consume the next piece of the image stream
+    def feed(self, data):
+        self.streamed += len(data)
+        if self.pvd_offset is None:
+            self.head += data
+            if len(self.head) >= HEAD_CHUNK:
+                self.start()
+            return
+        if self.manifest:
+            self.manifest.feed(data)
+        self.write(data)
+        self.hash_blocks(data)
+
+    # Parse the volume descriptor from the buffered head and start streaming
+    def start(self):
+        found = parse_pvd(self.head)
+        if found is None:
+            raise ISOError('no primary volume descriptor found')
+        self.pvd_offset, self.isosize = found
+        self.limit = self.isosize - self.skipsectors * SECTOR_SIZE
+        # The application data must be blank while hashing (as checkisomd5 sees it)
+        start = self.pvd_offset + APPDATA_OFFSET
+        data = self.head[:start] + b' ' * APPDATA_SIZE + self.head[start + APPDATA_SIZE:]
+        self.head = data[:HEAD_CHUNK]
+        if self.manifest:
+            self.manifest.start_at(len(self.head))
+            self.manifest.feed(data[HEAD_CHUNK:])
+        self.write(data)
+        self.hash_blocks(data)
+
+    # Complete the sums, implant them and write the manifest
+    def finish(self):
+        if self.pvd_offset is None:
+            self.start()
+        self.hash_blocks(b'', final=True)
+        if self.streamed != self.isosize:
+            raise ISOError('stream is %d bytes, volume descriptor says %d' % (self.streamed, self.isosize))
+        md5sum = self.md5.hexdigest()
+        block = appdata(md5sum, self.fragsums, self.skipsectors, self.fragmentcount, self.supported)
+        start = self.pvd_offset + APPDATA_OFFSET
+        os.lseek(self.fd, start, 0)
+        self.write(block)
+        os.close(self.fd)
+        result = {'md5': md5sum, 'fragsums': self.fragsums, 'size': self.isosize}
+        if self.manifest:
+            head = self.head[:start] + block + self.head[start + APPDATA_SIZE:]
+            chunks = [(hashlib.sha256(head).hexdigest(), 0, len(head))] + self.manifest.finish()
+            write_manifest(self.path + '.sha256', chunks)
+            result['manifest'] = self.path + '.sha256'
+        return result
+
+
+# Write a chunked SHA-256 manifest ("sha256 offset length" per line)
+def write_manifest(path, chunks):
+    f = open(path, 'w')
+    for digest, offset, length in chunks:
+        f.write('%s %d %d\n' % (digest, offset, length))
+    f.close()
+
+
+# Verify an image against its chunked SHA-256 manifest
+def verify_manifest(path, manifest):
+    f = open(path, 'rb')
+    ok = True
+    for line in open(manifest):
+        digest, offset, length = line.split()
+        f.seek(int(offset))
+        sha = hashlib.sha256()
+        remaining = int(length)
+        while remaining:
+            data = f.read(min(remaining, 1024 * 1024))
+            if not data:
+                break
+            sha.update(data)
+            remaining -= len(data)
+        if remaining or sha.hexdigest() != digest:
+            ok = False
+    f.close()
+    return ok
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: mkisofs ... | %prog -o image.iso\n       %prog --verify image.iso")
+    parser.add_option("-o", "--output", help="ISO image to write")
+    parser.add_option("--skip-sectors", type="int", default=15,
+        help="Trailing sectors excluded from the checksum (default: 15)")
+    parser.add_option("--fragments", type="int", default=20,
+        help="Number of fragment checksums (default: 20)")
+    parser.add_option("--supported", action="store_true", default=False,
+        help="Set the supported flag")
+    parser.add_option("--no-manifest", dest="manifest", action="store_false", default=True,
+        help="Do not write the SHA-256 manifest")
+    parser.add_option("--verify", metavar="IMAGE",
+        help="Verify IMAGE against IMAGE.sha256 and exit")
+    parser.add_option("-q", "--quiet", action="store_true", default=False)
+    options, args = parser.parse_args()
+
+    if options.verify:
+        if verify_manifest(options.verify, options.verify + '.sha256'):
+            print("%s: OK" % options.verify)
+            sys.exit(0)
+        print("%s: FAILED" % options.verify)
+        sys.exit(1)
+    if not options.output:
+        parser.error("an output image is required")
+
+    stream = getattr(sys.stdin, 'buffer', sys.stdin)
+    implanter = Implanter(options.output, options.skip_sectors, options.fragments,
+        options.supported, options.manifest)
+    start = time.time()
+    try:
+        while True:
+            data = stream.read(1024 * 1024)
+            if not data:
+                break
+            implanter.feed(data)
+        streamed = time.time()
+        result = implanter.finish()
+    except ISOError as e:
+        sys.stderr.write("ERROR: %s\n" % e)
+        sys.exit(1)
+    done = time.time()
+
+    if not options.quiet:
+        mb = result['size'] / (1024.0 * 1024.0)
+        print("Inserting md5sum into iso image...")
+        print("md5 = %s" % result['md5'])
+        print("Inserting fragment md5sums into iso image...")
+        print("fragmd5 = %s" % result['fragsums'])
+        print("frags = %d" % options.fragments)
+        print("Setting supported flag to %d" % int(options.supported))
+        print("Write+hash: %.0f MB in %.1fs (%.1f MB/s)" %
+            (mb, streamed - start, mb / max(streamed - start, 0.001)))
+        print("Implant+manifest: %.2fs" % (done - streamed))
+
+
+if __name__ == "__main__":
+    main()
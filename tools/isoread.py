@@ -0,0 +1,522 @@
+#!/usr/bin/python
+# ISO9660 Image Reader
+#
+# Reads the RHEL DVD image directly, without a loop mount, so createiso.sh
+# runs unprivileged (CI containers). The image is memory mapped: directory
+# records and Rock Ridge entries (names, modes, symlinks, timestamps, deep
+# directory relocation) are parsed from the mapping and file extents are
+# written out as windows on it, never copied into Python strings.
+#
+# The boot record (El Torito) and the .discinfo release are checked while
+# the root directory is read, in the same pass as the listing/extraction:
+#
+#   isoread.py -c 6.4 rhel-server-6.5-x86_64-dvd.iso
+#   isoread.py -c 6.4 -x .staging/dvd [-e Packages] [-L list] rhel.iso
+#
+# Extraction is incremental: files whose size and mtime match are kept.
+# The space the remaining files need is checked before anything is written.
+#
+# License: GPLv2
+
+import os
+import re
+import sys
+import mmap
+import stat
+import struct
+import calendar
+import optparse
+
+SECTOR_SIZE = 2048
+MB = 1024 * 1024
+DESCRIPTORS = 16
+
+# Directory record: length, extended attribute length, extent, data length,
+# recording date, flags, file unit size, interleave gap, volume sequence
+# number and name length (both-endian fields read little-endian)
+RECORD = struct.Struct('<BBI4xI4x7sBBBH2xB')
+
+# File flags
+DIRECTORY = 0x02
+MULTI_EXTENT = 0x80
+
+# Rock Ridge NM/SL flags
+CONTINUE = 0x01
+CURRENT = 0x02
+PARENT = 0x04
+ROOT = 0x08
+
+# Rock Ridge TF flags (timestamps in this order)
+TF_LONG_FORM = 0x80
+TF_MODIFY = 0x02
+
+# Size of the windows file extents are written in
+WRITE_SIZE = 64 * 1024 * 1024
+
+try:
+    buffer
+except NameError:
+    # Python 3: memoryview slices of the mapping
+    def window(data, offset, length):
+        return memoryview(data)[offset:offset + length]
+else:
+    def window(data, offset, length):
+        return buffer(data, offset, length)
+
+
+class ISOError(Exception):
+    """Unreadable or unsupported image."""
+
+
+class Entry:
+    """File, directory or symlink of the image."""
+
+    def __init__(self, path, extents, size, mode, mtime, directory=False, target=None):
+        self.path = path
+        self.extents = extents
+        self.size = size
+        self.mode = mode
+        self.mtime = mtime
+        self.directory = directory
+        self.target = target
+
+
+# Seconds since the epoch of a 7 byte recording date
+def record_time(data):
+    year, month, day, hour, minute, second, offset = struct.unpack('<6Bb', data)
+    if not month or not day:
+        return 0
+    try:
+        return calendar.timegm((1900 + year, month, day, hour, minute, second)) - offset * 15 * 60
+    except (ValueError, OverflowError):
+        return 0
+
+
+# Release (major, minor) and product line of a .discinfo file
+def parse_discinfo(data):
+    for line in data.decode('utf-8', 'replace').splitlines():
+        if 'Red Hat' in line:
+            match = re.search(r'(\d+)\.(\d+)', line)
+            if match:
+                return (int(match.group(1)), int(match.group(2))), line.strip()
+    return None, None
+
+
+class ISOImage:
+    """Memory mapped ISO9660 image with Rock Ridge extensions."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < (DESCRIPTORS + 1) * SECTOR_SIZE:
+            self.file.close()
+            raise ISOError('%s: not an ISO9660 image' % path)
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = size
+        self.bootable = False
+        self.volume_id = ''
+        self.rock_ridge = False
+        self.skip = 0
+        self.discinfo = None
+        self.release = None
+        self.product = None
+        self.read_descriptors()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    # Volume descriptors: El Torito boot record and primary descriptor
+    def read_descriptors(self):
+        root = None
+        offset = DESCRIPTORS * SECTOR_SIZE
+        while offset + SECTOR_SIZE <= self.size:
+            kind = ord(self.map[offset:offset + 1])
+            if self.map[offset + 1:offset + 6] != b'CD001':
+                break
+            if kind == 0 and self.map[offset + 7:offset + 30] == b'EL TORITO SPECIFICATION':
+                self.bootable = True
+            elif kind == 1 and root is None:
+                self.block_size = struct.unpack('<H', self.map[offset + 128:offset + 130])[0]
+                self.volume_id = self.map[offset + 40:offset + 72].decode('ascii', 'replace').strip()
+                root = offset + 156
+            elif kind == 255:
+                break
+            offset += SECTOR_SIZE
+        if root is None:
+            raise ISOError('%s: no primary volume descriptor found' % self.path)
+        fields = RECORD.unpack(self.map[root:root + RECORD.size])
+        self.root = (fields[2], fields[3])
+
+        # SUSP/Rock Ridge is announced by an SP entry in the root '.' record
+        for offset, fields, name, system_use in self.directory_records(self.root[0], self.root[1]):
+            if system_use[:2] == b'SP' and system_use[4:6] == b'\xbe\xef':
+                self.rock_ridge = True
+                self.skip = ord(system_use[6:7])
+            break
+
+    # Raw records of a directory extent as (offset, fields, name, system use)
+    def directory_records(self, block, length):
+        start = block * self.block_size
+        end = start + length
+        if end > self.size:
+            raise ISOError('%s: directory extent beyond the end of the image' % self.path)
+        offset = start
+        while offset < end:
+            record_length = ord(self.map[offset:offset + 1])
+            if record_length == 0:
+                # Records never cross a sector boundary
+                offset = (offset // SECTOR_SIZE + 1) * SECTOR_SIZE
+                continue
+            fields = RECORD.unpack(self.map[offset:offset + RECORD.size])
+            name_length = fields[-1]
+            name = self.map[offset + 33:offset + 33 + name_length]
+            system_use = offset + 33 + name_length + (1 - name_length % 2)
+            yield offset, fields, name, self.map[system_use:offset + record_length]
+            offset += record_length
+
+    # Rock Ridge entries of a system use area, following continuation areas
+    def susp_entries(self, system_use, skip):
+        area = system_use[skip:]
+        while area:
+            continuation = None
+            position = 0
+            while position + 4 <= len(area):
+                signature = area[position:position + 2]
+                length = ord(area[position + 2:position + 3])
+                if length < 4:
+                    break
+                data = area[position + 4:position + length]
+                if signature == b'CE':
+                    block, offset, size = struct.unpack('<I4xI4xI', data[:20])
+                    continuation = (block * self.block_size + offset, size)
+                elif signature == b'ST':
+                    break
+                else:
+                    yield signature, data
+                position += length
+            area = b''
+            if continuation:
+                area = self.map[continuation[0]:continuation[0] + continuation[1]]
+
+    # Name, mode, mtime, symlink target, child link and relocation flag of a record
+    def rock_ridge_fields(self, system_use):
+        name = None
+        mode = None
+        mtime = None
+        target = None
+        continued = False
+        child = None
+        relocated = False
+        for signature, data in self.susp_entries(system_use, self.skip):
+            if signature == b'NM':
+                flags = ord(data[:1])
+                if not flags & (CURRENT | PARENT):
+                    name = (name or b'') + data[1:]
+            elif signature == b'PX':
+                mode = struct.unpack('<I', data[:4])[0]
+            elif signature == b'SL':
+                target, continued = self.symlink_target(data, target, continued)
+            elif signature == b'TF':
+                mtime = self.modify_time(data)
+            elif signature == b'CL':
+                child = struct.unpack('<I', data[:4])[0]
+            elif signature == b'RE':
+                relocated = True
+        return name, mode, mtime, target, child, relocated
+
+    # Symlink target of an SL entry appended to a previous one, and whether
+    # its last component continues in the next entry. A component flagged
+    # CONTINUE is joined to the following one without a '/'.
+    def symlink_target(self, data, target, continued=False):
+        position = 1
+        while position + 2 <= len(data):
+            flags = ord(data[position:position + 1])
+            length = ord(data[position + 1:position + 2])
+            if flags & ROOT:
+                component = b'/'
+            elif flags & PARENT:
+                component = b'..'
+            elif flags & CURRENT:
+                component = b'.'
+            else:
+                component = data[position + 2:position + 2 + length]
+            if target is None:
+                target = component
+            elif continued or target.endswith(b'/'):
+                target += component
+            else:
+                target += b'/' + component
+            continued = bool(flags & CONTINUE)
+            position += 2 + length
+        return target, continued
+
+    # Modification time of a TF entry
+    def modify_time(self, data):
+        flags = ord(data[:1])
+        size = flags & TF_LONG_FORM and 17 or 7
+        position = 1
+        for bit in (0x01, TF_MODIFY):
+            if flags & bit:
+                if bit == TF_MODIFY:
+                    stamp = data[position:position + size]
+                    if size == 7:
+                        return record_time(stamp)
+                    try:
+                        return calendar.timegm(tuple([int(stamp[i:j]) for i, j in
+                            ((0, 4), (4, 6), (6, 8), (8, 10), (10, 12), (12, 14))])) - \
+                            struct.unpack('<b', stamp[16:17])[0] * 15 * 60
+                    except ValueError:
+                        return None
+                position += size
+        return None
+
+    # Entries of a directory (without '.' and '..'), multi-extent files joined
+    def list_directory(self, block, length, parent):
+        pending = None
+        for offset, fields, name, system_use in self.directory_records(block, length):
+            if name in (b'\x00', b'\x01'):
+                continue
+            extent, size, date, flags = fields[2], fields[3], fields[4], fields[5]
+            mode = mtime = target = child = None
+            relocated = False
+            if self.rock_ridge:
+                rr_name, mode, mtime, target, child, relocated = self.rock_ridge_fields(system_use)
+                if rr_name is not None:
+                    name = rr_name
+            else:
+                # Plain ISO9660: drop the version and the dot of names
+                # without an extension ('README.;1')
+                name = name.split(b';')[0]
+                if name.endswith(b'.'):
+                    name = name[:-1]
+            if relocated:
+                # Listed where its CL record points
+                continue
+            name = name.decode('utf-8', 'replace')
+            if pending is not None:
+                pending.extents.append((extent, size))
+                pending.size += size
+                if not flags & MULTI_EXTENT:
+                    yield pending
+                    pending = None
+                continue
+            directory = bool(flags & DIRECTORY)
+            if child is not None:
+                # Deep directory relocated by Rock Ridge: the real extent
+                # is at the CL location
+                for dot in self.directory_records(child, self.block_size):
+                    extent, size = dot[1][2], dot[1][3]
+                    break
+                directory = True
+            if directory and parent == '' and name in ('rr_moved', '.rr_moved') and self.rock_ridge:
+                # Holder of relocated directories, empty once they are
+                # listed in place
+                if not [e for e in self.list_directory(extent, size, '')]:
+                    continue
+            if mode is None:
+                mode = directory and 0o40555 or 0o100444
+            if target is not None:
+                mode = stat.S_IFLNK | 0o777
+                target = target.decode('utf-8', 'replace')
+            entry = Entry(parent + name, [(extent, size)], size, mode,
+                mtime is None and record_time(date) or mtime, directory, target)
+            if flags & MULTI_EXTENT:
+                pending = entry
+                continue
+            yield entry
+
+    # Every entry of the image, parents before children; .discinfo is read
+    # as it is passed in the root directory
+    def walk(self):
+        stack = [(self.root[0], self.root[1], '')]
+        while stack:
+            block, length, parent = stack.pop()
+            children = []
+            for entry in self.list_directory(block, length, parent):
+                if parent == '' and entry.path == '.discinfo':
+                    self.read_discinfo(entry)
+                yield entry
+                if entry.directory:
+                    children.append((entry.extents[0][0], entry.extents[0][1], entry.path + '/'))
+            children.reverse()
+            stack.extend(children)
+
+    # Parse .discinfo straight from the mapping
+    def read_discinfo(self, entry):
+        self.discinfo = b''.join([bytes(view) for view in self.windows(entry)])
+        self.release, self.product = parse_discinfo(self.discinfo)
+
+    # Read the root directory only (boot record and release checks)
+    def scan_root(self):
+        for entry in self.list_directory(self.root[0], self.root[1], ''):
+            if entry.path == '.discinfo':
+                self.read_discinfo(entry)
+
+    # Windows on the mapping covering a file's data
+    def windows(self, entry, size=WRITE_SIZE):
+        for block, length in entry.extents:
+            offset = block * self.block_size
+            if offset + length > self.size:
+                raise ISOError('%s: %s extends beyond the end of the image' % (self.path, entry.path))
+            while length > 0:
+                chunk = min(length, size)
+                yield window(self.map, offset, chunk)
+                offset += chunk
+                length -= chunk
+
+    # True if a regular file below a directory is missing or differs in
+    # size or mtime
+    def outdated(self, entry, root):
+        if entry.directory or entry.target is not None:
+            return False
+        try:
+            st = os.lstat(os.path.join(root, entry.path))
+        except OSError:
+            return True
+        return not stat.S_ISREG(st.st_mode) or st.st_size != entry.size or int(st.st_mtime) != int(entry.mtime)
+
+    # Write an entry below a directory, returning True if it was written
+    # (files with the same size and mtime are kept)
+    def extract(self, entry, root):
+        path = os.path.join(root, entry.path)
+        if entry.directory:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            # Directories stay writable, so later runs can update them
+            os.chmod(path, (entry.mode & 0o7777) | 0o700)
+            return False
+        if entry.target is not None:
+            if os.path.islink(path) and os.readlink(path) == entry.target:
+                return False
+            if os.path.lexists(path):
+                os.remove(path)
+            os.symlink(entry.target, path)
+            return True
+        if not self.outdated(entry, root):
+            return False
+        if os.path.lexists(path):
+            os.remove(path)
+        tmp = path + '.part'
+        out = open(tmp, 'wb')
+        try:
+            for view in self.windows(entry):
+                out.write(view)
+        finally:
+            out.close()
+        os.chmod(tmp, (entry.mode & 0o7777) | 0o400)
+        os.utime(tmp, (entry.mtime, entry.mtime))
+        os.rename(tmp, path)
+        return True
+
+
+# True if a path is below one of the excluded paths
+def excluded(path, exclude):
+    for prefix in exclude:
+        if path == prefix or path.startswith(prefix + '/'):
+            return True
+    return False
+
+
+# Fail before extracting if a directory's file system lacks the space
+def check_space(root, needed):
+    st = os.statvfs(root)
+    free = st.f_bavail * st.f_frsize
+    if needed > free:
+        raise ISOError('extracting needs %d MB in %s, only %d MB free' % (needed // MB, root, free // MB))
+
+
+# Check the boot record and release, returning an error message or None
+def check_release(image, minimum):
+    if not image.bootable:
+        return "ISO image is not bootable."
+    if image.release is None:
+        return "Image is not RHEL %s+" % minimum
+    major, minor = [int(v) for v in minimum.split('.')]
+    if image.release[0] != major or image.release[1] < minor:
+        return "Image is not RHEL %s+" % minimum
+    return None
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [options] image.iso")
+    parser.add_option("-c", "--check", metavar="RELEASE",
+        help="Require a bootable image of RELEASE or a later minor release (e.g. 6.4)")
+    parser.add_option("-l", "--list", action="store_true", default=False,
+        help="List the files of the image")
+    parser.add_option("-x", "--extract", metavar="DIR",
+        help="Extract the image into DIR")
+    parser.add_option("-e", "--exclude", action="append", default=[], metavar="PATH",
+        help="Do not extract PATH (repeatable)")
+    parser.add_option("-L", "--file-list", metavar="FILE",
+        help="Only extract the files listed in FILE (one path per line)")
+    parser.add_option("-q", "--quiet", action="store_true", default=False)
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error("an ISO image is required")
+    if options.check and not re.match(r'^\d+\.\d+$', options.check):
+        parser.error("release must be MAJOR.MINOR")
+
+    listed = None
+    if options.file_list:
+        f = open(options.file_list)
+        listed = set()
+        for line in f:
+            line = line.strip()
+            if line.startswith('./'):
+                line = line[2:]
+            if line:
+                listed.add(line)
+        f.close()
+    exclude = [p.strip('/') for p in options.exclude]
+
+    try:
+        image = ISOImage(args[0])
+    except (ISOError, IOError, OSError) as e:
+        sys.stderr.write("ERROR: %s\n" % e)
+        sys.exit(1)
+    selected = []
+    written = 0
+    needed = 0
+    try:
+        if options.list or options.extract:
+            if options.extract and not os.path.isdir(options.extract):
+                os.makedirs(options.extract)
+            for entry in image.walk():
+                if options.list:
+                    print(entry.path + (entry.directory and '/' or ''))
+                if not options.extract or excluded(entry.path, exclude):
+                    continue
+                if listed is not None and not entry.directory and entry.path not in listed:
+                    continue
+                selected.append(entry)
+            if options.extract:
+                needed = sum([e.size for e in selected if image.outdated(e, options.extract)])
+                check_space(options.extract, needed)
+                for entry in selected:
+                    if image.extract(entry, options.extract):
+                        written += 1
+        else:
+            image.scan_root()
+    except (ISOError, IOError, OSError) as e:
+        sys.stderr.write("ERROR: %s\n" % e)
+        sys.exit(1)
+    finally:
+        image.close()
+
+    if options.check:
+        error = check_release(image, options.check)
+        if error:
+            print("ERROR: %s" % error)
+            sys.exit(1)
+        if not options.quiet:
+            print("%s [%s]" % (image.product, image.volume_id))
+    if options.extract and not options.quiet:
+        print("Extracted %d of %d entries, %d MB written [%s]" % (written, len(selected),
+            (needed + MB - 1) // MB, options.extract))
+
+
+if __name__ == "__main__":
+    main()
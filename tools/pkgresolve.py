@@ -0,0 +1,392 @@
+#!/usr/bin/python
+# Offline Package Set Resolver
+#
+# Stream-parses the DVD repodata (comps and primary.xml) once into a compact
+# index, then expands the %packages section of stig-fix.cfg plus each
+# system profile's package list (groups, globs and exclusions) into the
+# concrete package set anaconda will install, including dependencies.
+#
+#   pkgresolve.py -r /rhel [-i .staging/pkgindex] [--profile N] [--strict]
+#
+# With --closure the union of the resolved package sets is written as a
+# createrepo package list for profile-pruned (minimal) ISO builds.
+#
+# License: GPLv2
+
+import os
+import sys
+import gzip
+import time
+import bz2
+import hashlib
+import fnmatch
+import optparse
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(DIR, 'config', 'stig-fix'))
+import profiles
+
+REPO_NS = '{http://linux.duke.edu/metadata/repo}'
+COMMON_NS = '{http://linux.duke.edu/metadata/common}'
+RPM_NS = '{http://linux.duke.edu/metadata/rpm}'
+
+# Architecture preference on an x86_64 DVD (multilib i686 packages are
+# never selected by name)
+ARCHES = {'x86_64': 0, 'noarch': 1}
+
+# Packages anaconda adds to every installation on its own (bootloader,
+# kernel, storage and firstboot tooling); a minimal ISO must carry them
+INSTALLER = ('kernel', 'grub', 'authconfig', 'system-config-firewall-base',
+    'lvm2', 'cryptsetup-luks', 'e2fsprogs', 'dracut', 'efibootmgr', 'firstboot')
+
+# Index format version, bumped when the layout below changes
+INDEX_VERSION = 2
+
+
+class ResolveError(Exception):
+    """Missing or unreadable repodata."""
+
+
+# Open a (possibly compressed) metadata file
+def open_metadata(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.BZ2File(path, 'rb')
+    return open(path, 'rb')
+
+
+# Read repomd.xml, returning ({type: href}, checksum of repomd.xml)
+def read_repomd(root):
+    path = os.path.join(root, 'repodata', 'repomd.xml')
+    if not os.path.exists(path):
+        raise ResolveError('no repodata found under %s' % root)
+    data = {}
+    tree = ElementTree.parse(path)
+    for element in tree.getroot().findall(REPO_NS + 'data'):
+        location = element.find(REPO_NS + 'location')
+        data[element.get('type')] = location.get('href')
+    f = open(path, 'rb')
+    revision = hashlib.sha1(f.read()).hexdigest()
+    f.close()
+    return data, revision
+
+
+# Stream-parse primary.xml into {name: package}
+#
+# Each package is a tuple (arch, evr, installed size, location, requires,
+# provides, files, rpm size). Only the preferred architecture of each name is kept.
+def parse_primary(path):
+    packages = {}
+    f = open_metadata(path)
+    try:
+        for event, element in ElementTree.iterparse(f):
+            if element.tag != COMMON_NS + 'package':
+                continue
+            arch = element.findtext(COMMON_NS + 'arch')
+            if arch not in ARCHES:
+                element.clear()
+                continue
+            name = element.findtext(COMMON_NS + 'name')
+            version = element.find(COMMON_NS + 'version')
+            evr = '%s:%s-%s' % (version.get('epoch', '0'), version.get('ver'), version.get('rel'))
+            size = element.find(COMMON_NS + 'size')
+            href = element.find(COMMON_NS + 'location').get('href')
+            fmt = element.find(COMMON_NS + 'format')
+            requires = []
+            provides = []
+            files = []
+            if fmt is not None:
+                for entry in fmt.findall(RPM_NS + 'requires/' + RPM_NS + 'entry'):
+                    requires.append(entry.get('name'))
+                for entry in fmt.findall(RPM_NS + 'provides/' + RPM_NS + 'entry'):
+                    provides.append(entry.get('name'))
+                for entry in fmt.findall(COMMON_NS + 'file'):
+                    files.append(entry.text)
+            current = packages.get(name)
+            if current is None or ARCHES[arch] < ARCHES[current[0]]:
+                packages[name] = (arch, evr, int(size.get('installed', 0)), href,
+                    tuple(requires), tuple(provides), tuple(files), int(size.get('package', 0)))
+            element.clear()
+    finally:
+        f.close()
+    return packages
+
+
+# Parse comps into {group id: (installed packages, optional packages)}
+#
+# Anaconda installs the mandatory and default packages of a group.
+def parse_comps(path):
+    groups = {}
+    f = open_metadata(path)
+    try:
+        for event, element in ElementTree.iterparse(f):
+            if element.tag != 'group':
+                continue
+            installed = []
+            optional = []
+            for req in element.findall('packagelist/packagereq'):
+                if req.get('type', 'mandatory') in ('mandatory', 'default'):
+                    installed.append(req.text)
+                else:
+                    optional.append(req.text)
+            groups[element.findtext('id')] = (tuple(installed), tuple(optional))
+            element.clear()
+    finally:
+        f.close()
+    return groups
+
+
+# Build the index from a repository tree
+def build_index(root):
+    data, revision = read_repomd(root)
+    if 'primary' not in data:
+        raise ResolveError('repomd.xml lists no primary metadata')
+    packages = parse_primary(os.path.join(root, data['primary']))
+    groups = {}
+    comps = data.get('group') or data.get('group_gz')
+    if comps:
+        groups = parse_comps(os.path.join(root, comps))
+    provides = {}
+    for name, package in packages.items():
+        for item in package[5] + package[6]:
+            provides.setdefault(item, []).append(name)
+    return {
+        'version': INDEX_VERSION,
+        'revision': revision,
+        'packages': packages,
+        'groups': groups,
+        'provides': provides,
+    }
+
+
+# Load the index, rebuilding it if the repodata changed
+def load_index(root, path=None):
+    revision = read_repomd(root)[1]
+    if path and os.path.exists(path):
+        f = open(path, 'rb')
+        try:
+            index = pickle.load(f)
+        except Exception:
+            index = None
+        f.close()
+        if index and index.get('version') == INDEX_VERSION and index.get('revision') == revision:
+            return index
+    index = build_index(root)
+    if path:
+        tmp = path + '.tmp'
+        f = open(tmp, 'wb')
+        pickle.dump(index, f, 2)
+        f.close()
+        os.rename(tmp, path)
+    return index
+
+
+# Read the %packages section of the kickstart template
+#
+# Returns (entries, nobase); %include lines are skipped because the
+# profile package lists are resolved separately.
+def template_packages(path):
+    entries = []
+    nobase = False
+    section = False
+    for line in open(path):
+        line = line.strip()
+        if line.startswith('%packages'):
+            section = True
+            nobase = '--nobase' in line.split()
+            continue
+        if not section:
+            continue
+        if line == '%end':
+            break
+        if not line or line.startswith('#') or line.startswith('%'):
+            continue
+        entries.append(line)
+    return entries, nobase
+
+
+class Resolver:
+    """Expand kickstart package entries against an index."""
+
+    def __init__(self, index):
+        self.packages = index['packages']
+        self.groups = index['groups']
+        self.provides = index['provides']
+        self.names = sorted(self.packages)
+
+    # Match a package name or glob
+    def match(self, pattern):
+        if pattern in self.packages:
+            return [pattern]
+        if '*' in pattern or '?' in pattern or '[' in pattern:
+            return fnmatch.filter(self.names, pattern)
+        return []
+
+    # Choose the package satisfying a requirement (None if none does)
+    def provider(self, require, selected):
+        candidates = self.provides.get(require)
+        if not candidates:
+            return None
+        for name in candidates:
+            if name in selected:
+                return name
+        if require in candidates:
+            return require
+        return sorted(candidates, key=lambda n: (ARCHES[self.packages[n][0]], len(n), n))[0]
+
+    # Resolve kickstart entries into the installed package set
+    #
+    # Returns (packages, unresolved entries, unresolved requires)
+    def resolve(self, entries, nobase=False):
+        add = set()
+        remove = set()
+        unresolved = []
+        if not nobase and 'base' in self.groups:
+            add.update(self.groups['base'][0])
+        for entry in entries:
+            exclude = entry.startswith('-')
+            if exclude:
+                entry = entry[1:]
+            if entry.startswith('@'):
+                group = self.groups.get(entry[1:])
+                if group is None:
+                    unresolved.append(('-' if exclude else '') + entry)
+                    continue
+                names = [n for n in group[0] if n in self.packages]
+            else:
+                names = self.match(entry)
+                if not names and not exclude:
+                    unresolved.append(entry)
+                    continue
+            if exclude:
+                remove.update(names)
+            else:
+                add.update(names)
+        selected = set([n for n in add if n in self.packages]) - remove
+
+        # Dependency closure (packages excluded above may be pulled back in)
+        missing = set()
+        queue = list(selected)
+        while queue:
+            name = queue.pop()
+            for require in self.packages[name][4]:
+                if require.startswith('rpmlib('):
+                    continue
+                provider = self.provider(require, selected)
+                if provider is None:
+                    missing.add(require)
+                elif provider not in selected:
+                    selected.add(provider)
+                    queue.append(provider)
+        return selected, unresolved, sorted(missing)
+
+    # Total installed size of a package set in bytes
+    def size(self, selected):
+        return sum([self.packages[n][2] for n in selected])
+
+
+# Resolve every selected profile, returning {profile id: result}
+def resolve_profiles(resolver, template, profile_ids):
+    base, nobase = template_packages(template)
+    results = {}
+    for profile_id in profile_ids:
+        entries = base + profiles.PROFILES[profile_id]['packages']
+        selected, unresolved, missing = resolver.resolve(entries, nobase)
+        results[profile_id] = {
+            'packages': selected,
+            'size': resolver.size(selected),
+            'unresolved': unresolved,
+            'missing': missing,
+        }
+    return results
+
+
+# Package locations (and their total rpm size) needed to install any of
+# the resolved profiles
+def closure(resolver, results):
+    selected = set()
+    for result in results.values():
+        selected.update(result['packages'])
+    selected.update(resolver.resolve([n for n in INSTALLER if n in resolver.packages], True)[0])
+    locations = sorted([resolver.packages[n][3] for n in selected])
+    return locations, sum([resolver.packages[n][7] for n in selected])
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog -r repository [options]")
+    parser.add_option("-r", "--repo", help="Repository root (mounted DVD)")
+    parser.add_option("-i", "--index", help="Index cache file")
+    parser.add_option("-t", "--template",
+        default=os.path.join(DIR, 'config', 'stig-fix', 'stig-fix.cfg'),
+        help="Kickstart template (default: config/stig-fix/stig-fix.cfg)")
+    parser.add_option("-p", "--profile", action="append", default=[],
+        help="Profile id or name (default: all enabled profiles)")
+    parser.add_option("-l", "--list", action="store_true", default=False,
+        help="List the resolved packages")
+    parser.add_option("-c", "--closure", metavar="FILE",
+        help="Write the package locations the profiles need to FILE")
+    parser.add_option("--strict", action="store_true", default=False,
+        help="Exit non-zero if any entry is unresolvable")
+    options, args = parser.parse_args()
+    if not options.repo:
+        parser.error("a repository is required")
+
+    if options.profile:
+        try:
+            profile_ids = [profiles.profile_id(p) for p in options.profile]
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        profile_ids = [i for i, p in enumerate(profiles.PROFILES) if p['enabled']]
+
+    start = time.time()
+    try:
+        index = load_index(options.repo, options.index)
+    except ResolveError as e:
+        sys.stderr.write("ERROR: %s\n" % e)
+        sys.exit(1)
+    loaded = time.time()
+    resolver = Resolver(index)
+    results = resolve_profiles(resolver, options.template, profile_ids)
+    resolved = time.time()
+
+    problems = 0
+    for profile_id in profile_ids:
+        result = results[profile_id]
+        print("%-30s %5d packages %8.1f MB" % (profiles.PROFILES[profile_id]['name'],
+            len(result['packages']), result['size'] / (1024.0 * 1024.0)))
+        for entry in result['unresolved']:
+            print("  WARNING: unresolvable package entry '%s'" % entry)
+        for require in result['missing']:
+            print("  WARNING: unsatisfied dependency '%s'" % require)
+        problems += len(result['unresolved'])
+        if options.list:
+            for name in sorted(result['packages']):
+                print("  %s" % name)
+    if options.closure:
+        locations, size = closure(resolver, results)
+        f = open(options.closure, 'w')
+        f.write(''.join([l + '\n' for l in locations]))
+        f.close()
+        print("Closure: %d of %d packages, %.1f MB [%s]" % (len(locations),
+            len(resolver.packages), size / (1024.0 * 1024.0), options.closure))
+    print("Index loaded in %.0f ms, resolved in %.0f ms" %
+        ((loaded - start) * 1000, (resolved - loaded) * 1000))
+    if problems and options.strict:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
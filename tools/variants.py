@@ -0,0 +1,294 @@
+#!/usr/bin/python
+# Multi-Variant ISO Builder
+#
+# Masters several site variants of the DVD from one mounted source at the
+# same time. A variant differs only in the menu defaults baked into it
+# (stig-fix/media-defaults: profile, classification, hostname) and the
+# profiles it offers (stig-fix/media-profiles), so each one gets a small
+# overlay and its own copy of the staged isolinux tree (mkisofs patches
+# isolinux.bin in place) under <stage>/variants/<name>; everything else is
+# grafted from the shared mount.
+#
+# Called by 'createiso.sh -V variants.csv' with the mkisofs command after
+# '--'. Variants are read with inventory.load (CSV or JSON):
+#
+#   name,profile,classification,hostname,profiles
+#   site-a,1,UNCLASSIFIED,ws.site-a.example.com,
+#   site-b,Minimal Installation,2,,0 4
+#
+# License: GPLv2
+
+import os
+import re
+import sys
+import time
+import shutil
+import hashlib
+import optparse
+import threading
+import subprocess
+import multiprocessing
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(DIR, 'config', 'stig-fix'))
+import inventory
+import profiles
+
+import buildcache
+
+# Concurrent image writers on a rotational output disk (more only seeks)
+ROTATIONAL_JOBS = 2
+
+
+class VariantError(Exception):
+    """Invalid variant definition or failed build."""
+
+
+# Check a variant record, returning (name, defaults, offered profile ids);
+# variants listing no profiles offer the fallback ones. On a minimal ISO
+# only the profiles whose packages it carries (allowed) may be offered.
+def parse_variant(record, fallback=(), allowed=None):
+    name = str(record.get('name') or '').strip()
+    if not re.match(r'^[A-Za-z0-9][A-Za-z0-9_.-]*$', name):
+        raise VariantError("invalid variant name '%s'" % name)
+    defaults = {}
+    try:
+        offered = [profiles.profile_id(p) for p in inventory.to_list(record.get('profiles'))]
+        if str(record.get('profile') or '').strip():
+            defaults['profile'] = profiles.profile_id(record['profile'])
+        if str(record.get('classification') or '').strip():
+            defaults['classification'] = profiles.classification_id(record['classification'])
+    except ValueError as e:
+        raise VariantError('%s: %s' % (name, e))
+    offered = offered or list(fallback)
+    if allowed is not None:
+        missing = [p for p in offered or [defaults.get('profile')] if p is not None and p not in allowed]
+        if missing:
+            raise VariantError('%s: offers profiles %s, the minimal ISO only carries %s' % (name,
+                ', '.join([str(p) for p in missing]), ','.join([str(p) for p in allowed])))
+    hostname = str(record.get('hostname') or '').strip()
+    if hostname:
+        if not inventory.check_hostname(hostname):
+            raise VariantError("%s: invalid hostname '%s'" % (name, hostname))
+        defaults['hostname'] = hostname
+    if 'profile' in defaults and offered and defaults['profile'] not in offered:
+        raise VariantError('%s: default profile %d is not offered' % (name, defaults['profile']))
+    return name, defaults, offered
+
+
+# Load and check the variant definitions
+def load_variants(path, fallback=(), allowed=None):
+    variants = []
+    names = set()
+    for record in inventory.load(path):
+        variant = parse_variant(record, fallback, allowed)
+        if variant[0] in names:
+            raise VariantError("variant '%s' defined twice" % variant[0])
+        names.add(variant[0])
+        variants.append(variant)
+    if not variants:
+        raise VariantError('%s: no variants defined' % path)
+    return variants
+
+
+# True if a path lives on a rotational disk
+def rotational(path):
+    try:
+        st = os.stat(path)
+        device = os.path.realpath('/sys/dev/block/%d:%d' % (os.major(st.st_dev), os.minor(st.st_dev)))
+    except OSError:
+        return False
+    # Partitions keep their queue settings on the parent device
+    for candidate in (device, os.path.dirname(device)):
+        try:
+            f = open(os.path.join(candidate, 'queue', 'rotational'))
+        except IOError:
+            continue
+        try:
+            return f.read().strip() == '1'
+        finally:
+            f.close()
+    return False
+
+
+# Default pool size: one job per two CPUs (mkisofs and isomd5.py each keep
+# a core busy), capped for rotational output disks
+def default_jobs(count, output):
+    jobs = max(1, multiprocessing.cpu_count() // 2)
+    if rotational(output):
+        jobs = min(jobs, ROTATIONAL_JOBS)
+    return max(1, min(jobs, count))
+
+
+# Write a small text file
+def write_file(path, lines):
+    f = open(path, 'w')
+    try:
+        f.write(''.join([line + '\n' for line in lines]))
+    finally:
+        f.close()
+
+
+class VariantBuilder:
+    """Master variant ISOs from a pool of worker threads."""
+
+    def __init__(self, stage, output, mkisofs, key=None):
+        self.stage = stage
+        self.output = output
+        self.mkisofs = mkisofs
+        self.key = key
+        self.cache = buildcache.BuildCache(stage)
+        self.lock = threading.Lock()
+
+    # Image path of a variant
+    def image(self, name):
+        return os.path.join(self.output, 'rhel-stig-fix-%s.iso' % name)
+
+    # Cache key of a variant (the build inputs plus its overlay)
+    def variant_key(self, name, defaults, offered):
+        digest = hashlib.sha256(('%s\n%s\n' % (self.key, name)).encode('utf-8'))
+        for field in sorted(defaults):
+            digest.update(('%s=%s\n' % (field, defaults[field])).encode('utf-8'))
+        digest.update(('profiles=%s\n' % ' '.join([str(p) for p in offered])).encode('utf-8'))
+        return digest.hexdigest()
+
+    # Build one variant in its own scratch directory, returning a status
+    def build(self, variant):
+        name, defaults, offered = variant
+        key = None
+        if self.key:
+            key = self.variant_key(name, defaults, offered)
+            if self.cache.check('variant-' + name, key, self.output):
+                return 'unchanged'
+        scratch = os.path.join(self.stage, 'variants', name)
+        if os.path.exists(scratch):
+            shutil.rmtree(scratch)
+        os.makedirs(scratch)
+        shutil.copytree(os.path.join(self.stage, 'isolinux'), os.path.join(scratch, 'isolinux'), True)
+        lines = []
+        for field in ('profile', 'classification', 'hostname'):
+            if field in defaults:
+                lines.append('%s=%s' % (field, defaults[field]))
+        write_file(os.path.join(scratch, 'media-defaults'), lines)
+        grafts = ['isolinux/=' + os.path.join(scratch, 'isolinux'),
+            'stig-fix/media-defaults=' + os.path.join(scratch, 'media-defaults')]
+        if offered:
+            write_file(os.path.join(scratch, 'media-profiles'), [str(p) for p in offered])
+            grafts.append('stig-fix/media-profiles=' + os.path.join(scratch, 'media-profiles'))
+
+        # The previous image may be a hard link to a cached one
+        image = self.image(name)
+        for path in (image, image + '.sha256'):
+            if os.path.lexists(path):
+                os.remove(path)
+        log = open(os.path.join(scratch, 'build.log'), 'w')
+        try:
+            # close_fds: a pipe end inherited by another job's child would
+            # hold this stream open
+            master = subprocess.Popen(self.mkisofs + grafts, stdout=subprocess.PIPE, stderr=log,
+                close_fds=True)
+            implant = subprocess.Popen([sys.executable, os.path.join(DIR, 'tools', 'isomd5.py'), '-o', image],
+                stdin=master.stdout, stdout=log, stderr=subprocess.STDOUT, close_fds=True)
+            master.stdout.close()
+            implant.wait()
+            master.wait()
+        finally:
+            log.close()
+        if master.returncode != 0 or implant.returncode != 0:
+            raise VariantError('%s: mastering failed (see %s)' % (name, os.path.join(scratch, 'build.log')))
+        if key:
+            self.lock.acquire()
+            try:
+                self.cache.store('variant-' + name, key, [image, image + '.sha256'])
+            finally:
+                self.lock.release()
+        return 'built'
+
+    # Build every variant with a pool of jobs, returning [(name, status, seconds)]
+    def run(self, variants, jobs):
+        pending = queue.Queue()
+        for variant in variants:
+            pending.put(variant)
+        results = []
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                try:
+                    variant = pending.get_nowait()
+                except queue.Empty:
+                    return
+                start = time.time()
+                try:
+                    status = self.build(variant)
+                except (VariantError, buildcache.CacheError, IOError, OSError) as e:
+                    status = 'ERROR: %s' % e
+                lock.acquire()
+                try:
+                    results.append((variant[0], status, time.time() - start))
+                    print("%-20s %-10s %7.1fs" % (variant[0], status.split(':')[0], time.time() - start))
+                    sys.stdout.flush()
+                finally:
+                    lock.release()
+
+        threads = [threading.Thread(target=worker) for i in range(jobs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+
+# Main Program
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [options] variants.{csv,json} -- mkisofs [arguments]")
+    parser.add_option("-s", "--stage", default=os.path.join(DIR, '.staging'),
+        help="Staging directory with the staged isolinux tree (default: .staging)")
+    parser.add_option("-o", "--output", default=DIR,
+        help="Directory for the rhel-stig-fix-<name>.iso images")
+    parser.add_option("-j", "--jobs", type="int",
+        help="Concurrent builds (default: half the CPUs, at most %d on a rotational disk)" % ROTATIONAL_JOBS)
+    parser.add_option("-p", "--profiles", default="",
+        help="Comma separated profile ids offered by variants that list none")
+    parser.add_option("-m", "--minimal", action="store_true", default=False,
+        help="Minimal ISO: variants may only offer the -p profiles (default: all enabled)")
+    parser.add_option("-k", "--key",
+        help="Build cache key of the shared inputs (reuses unchanged variants)")
+    options, args = parser.parse_args()
+    if len(args) < 2:
+        parser.error("a variant file and the mkisofs command are required")
+
+    try:
+        try:
+            fallback = [profiles.profile_id(p) for p in inventory.to_list(options.profiles)]
+        except ValueError as e:
+            raise VariantError(str(e))
+        allowed = None
+        if options.minimal:
+            allowed = fallback or [i for i, p in enumerate(profiles.PROFILES) if p['enabled']]
+        variants = load_variants(args[0], fallback, allowed)
+    except (VariantError, IOError) as e:
+        sys.stderr.write("ERROR: %s\n" % e)
+        sys.exit(1)
+    jobs = options.jobs or default_jobs(len(variants), options.output)
+    builder = VariantBuilder(options.stage, options.output, args[1:], options.key)
+
+    print("Building %d variants, %d at a time..." % (len(variants), jobs))
+    start = time.time()
+    results = builder.run(variants, jobs)
+    errors = [r for r in results if r[1].startswith('ERROR')]
+    for name, status, seconds in errors:
+        sys.stderr.write("%s\n" % status)
+    print("Built %d of %d variants in %.1fs [%s]" % (len(results) - len(errors), len(variants),
+        time.time() - start, builder.image('*')))
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()